@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/extractcode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+"""
+Compare the decompression speed of the available gzip backends of
+extractcode.uncompress on some gzip files, or on a generated file if none is
+provided. For example::
+
+    python etc/scripts/benchmark_gzip.py --repeat 5 some.tar.gz other.gz
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from extractcode import uncompress
+
+
+def generate_gzip(size):
+    """
+    Return the location of a new temporary gzip file with about `size` bytes
+    of half-compressible content.
+    """
+    import gzip
+    fd, location = tempfile.mkstemp(suffix='.gz', prefix='extractcode-bench-')
+    os.close(fd)
+    chunk = 1024 * 1024
+    with gzip.open(location, 'wb') as out:
+        for _ in range(max(size // chunk, 1)):
+            out.write(os.urandom(chunk // 2) + bytes(chunk // 2))
+    return location
+
+
+def benchmark(backend, location, repeat):
+    """
+    Return the best time in seconds to decompress the gzip file at `location`
+    `repeat` times with the `backend` GzipBackend.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with backend.gzip_file(location, 'rb') as compressed:
+            while compressed.read(uncompress.CHUNK_SIZE):
+                pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def get_available_backends():
+    """
+    Return a list of the GzipBackend that can be imported.
+    """
+    backends = []
+    for name in uncompress.GZIP_BACKENDS:
+        try:
+            backends.append(uncompress.get_gzip_backend(name))
+        except Exception as e:
+            print(f'Skipping gzip backend: {name}: {e}')
+    return backends
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('locations', nargs='*', help='gzip files to decompress')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per file')
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=256,
+        help='size in MB of the generated gzip file used if no file is provided',
+    )
+    args = parser.parse_args()
+
+    locations = args.locations
+    generated = None
+    if not locations:
+        generated = generate_gzip(args.size * 1024 * 1024)
+        locations = [generated]
+
+    try:
+        backends = get_available_backends()
+        for location in locations:
+            size = os.path.getsize(location)
+            print(f'{location}: {size / 1024 / 1024:.1f} MB compressed')
+            for backend in backends:
+                elapsed = benchmark(backend, location, args.repeat)
+                rate = size / 1024 / 1024 / elapsed
+                print(f'  {backend.name:>10}: {elapsed:8.3f} s {rate:8.1f} MB/s')
+    finally:
+        if generated:
+            os.remove(generated)
+
+
+if __name__ == '__main__':
+    main()
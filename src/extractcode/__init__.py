@@ -7,6 +7,7 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+import fnmatch
 import logging
 import os
 import posixpath
@@ -19,7 +20,10 @@ from os.path import join
 from os.path import exists
 
 from commoncode.fileutils import as_posixpath
+from commoncode.fileutils import copyfile
+from commoncode.fileutils import copytree
 from commoncode.fileutils import create_dir
+from commoncode.fileutils import delete
 from commoncode.fileutils import file_name
 from commoncode.fileutils import parent_directory
 from commoncode.text import toascii
@@ -134,7 +138,69 @@ def remove_backslashes_and_dotdots(directory):
     return errors
 
 
-def new_name(location, is_dir=False):
+def is_selected(path, include=(), exclude=()):
+    """
+    Return True if an archive member `path` should be extracted given the
+    `include` and `exclude` lists of glob patterns.
+
+    A path is selected if it matches any `include` pattern (or if there are no
+    `include` patterns) and matches no `exclude` pattern. Patterns are matched
+    case-sensitively against the whole POSIX path stripped from any leading
+    "./" or "/" and trailing "/" using fnmatch such that "*" also matches a "/":
+    for instance "*/package.json", "META-INF/**" or "*.spec".
+    """
+    if not (include or exclude):
+        return True
+
+    path = as_posixpath(path).strip('/')
+    while path.startswith('./'):
+        path = path[2:].lstrip('/')
+
+    if include and not any(fnmatch.fnmatchcase(path, pat) for pat in include):
+        return False
+    if exclude and any(fnmatch.fnmatchcase(path, pat) for pat in exclude):
+        return False
+    return True
+
+
+def move_tree(source, target):
+    """
+    Move the ``source`` directory to the ``target`` directory. Rename
+    ``source`` as ``target`` if ``target`` does not exist. Otherwise, merge
+    ``source`` in ``target`` moving files and directories and overwriting
+    existing files. Files are copied only when they cannot be moved, such as
+    across devices. ``source`` is removed when done.
+    """
+    if not os.path.exists(target):
+        try:
+            os.rename(source, target)
+            return
+        except OSError:
+            # the target may have been created concurrently or may be on
+            # another device
+            pass
+
+    create_dir(target)
+    for entry in os.scandir(source):
+        target_loc = join(target, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            if os.path.isdir(target_loc):
+                move_tree(entry.path, target_loc)
+                continue
+            try:
+                os.rename(entry.path, target_loc)
+            except OSError:
+                copytree(entry.path, target_loc)
+        else:
+            try:
+                os.replace(entry.path, target_loc)
+            except OSError:
+                copyfile(entry.path, target_loc)
+
+    delete(source)
+
+
+def new_name(location, is_dir=False, registry=None):
     """
     Return a new non-existing location from a `location` usable to write a file
     or create directory without overwriting existing files or directories in the
@@ -147,6 +213,10 @@ def new_name(location, is_dir=False):
      * pad a directory name with _X where X is an incremented number.
      * pad a file base name with _X where X is an incremented number and keep
        the extension unchanged.
+
+    If a `registry` NameRegistry is provided, the existing names are looked up
+    in this registry rather than by listing the parent directory and the new
+    name is registered as existing.
     """
     assert location
     location = location.rstrip('\\/')
@@ -154,8 +224,12 @@ def new_name(location, is_dir=False):
 
     parent = parent_directory(location)
 
-    # all existing files or directory as lower case
-    siblings_lower = set(s.lower() for s in os.listdir(parent))
+    if registry is not None:
+        # all existing files or directory as lower case, listed once
+        siblings_lower = registry.get_names(parent)
+    else:
+        # all existing files or directory as lower case
+        siblings_lower = set(s.lower() for s in os.listdir(parent))
 
     filename = file_name(location)
 
@@ -165,6 +239,8 @@ def new_name(location, is_dir=False):
 
     # if unique, return this
     if filename.lower() not in siblings_lower:
+        if registry is not None:
+            siblings_lower.add(filename.lower())
         return join(parent, filename)
 
     # otherwise seek a unique name
@@ -182,14 +258,67 @@ def new_name(location, is_dir=False):
 
     # find a unique filename, adding a counter int to the base_name
     counter = 1
+    if registry is not None:
+        counter_key = parent, base_name.lower(), ext.lower()
+        counter = registry.counters.get(counter_key, counter)
+
     while 1:
         filename = f'{base_name}_{counter}{ext}'
         if filename.lower() not in siblings_lower:
             break
         counter += 1
+
+    if registry is not None:
+        siblings_lower.add(filename.lower())
+        registry.counters[counter_key] = counter + 1
     return join(parent, filename)
 
 
+class NameRegistry(object):
+    """
+    An in-memory registry of existing file and directory names, ignoring case,
+    used by new_name() to find unique names without listing the whole parent
+    directory for each new name. The names of a parent directory are listed
+    once, the first time this directory is looked up.
+
+    A registry is scoped to a single extraction run in a target directory: all
+    the files and directories created in this run must be created with a name
+    returned by new_name() or registered with add().
+    """
+
+    def __init__(self):
+        # {parent directory: set of lowercased names}
+        self.names_by_parent = {}
+        # {(parent directory, lowercased base name, extension): next counter}
+        self.counters = {}
+
+    def get_names(self, parent):
+        """
+        Return a set of lowercased names existing in the `parent` directory.
+        """
+        names = self.names_by_parent.get(parent)
+        if names is None:
+            names = set(s.lower() for s in os.listdir(parent))
+            self.names_by_parent[parent] = names
+        return names
+
+    def add(self, location):
+        """
+        Register the `location` file or directory and all its parent
+        directories as existing.
+        """
+        location = location.rstrip('\\/')
+        while location:
+            parent = parent_directory(location)
+            names = self.names_by_parent.get(parent)
+            if names is not None:
+                names.add(file_name(location).lower())
+            parent = parent.rstrip('\\/')
+            if parent == location:
+                break
+            location = parent
+
+
 class ExtractError(Exception):
     pass
 
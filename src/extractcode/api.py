@@ -18,6 +18,12 @@ def extract_archives(
     replace_originals=False,
     ignore_pattern=(),
     all_formats=False,
+    jobs=None,
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    journal=None,
+    incremental=False,
 ):
     """
     Yield ExtractEvent while extracting archive(s) and compressed files at
@@ -36,6 +42,29 @@ def extract_archives(
 
     ``ignore_pattern`` is a list of glob patterns to ignore.
 
+    If ``jobs`` is an integer greater than one, extract independent archives
+    concurrently using a pool of ``jobs`` processes.
+
+    If ``cache_dir`` is provided, cache the extracted archives in this directory
+    and reuse the cached extraction of identical archives.
+
+    ``include`` and ``exclude`` are lists of glob patterns matched against the
+    paths of the archive entries: only the entries that match an ``include``
+    pattern (if any) and do not match an ``exclude`` pattern are extracted.
+    For instance: "*/package.json", "META-INF/**" or "*.spec".
+
+    If ``journal`` is the location of a journal file, record the completed
+    extractions in this file and skip the archives already journaled as
+    completely extracted to resume an interrupted extraction. Use
+    extractcode.journal.get_journal_location(location) for a default journal
+    file created side-by-side with ``location``.
+
+    If ``incremental`` is True, only extract the archives that are new or that
+    changed since they were last extracted in incremental mode, and remove the
+    extracted targets of the archives that were deleted. The state of each
+    archive is kept in a manifest file stored in a directory side-by-side with
+    ``location``. This replaces any ``journal``.
+
     Note: this API is returning an iterable and NOT a sequence.
     """
 
@@ -51,6 +80,61 @@ def extract_archives(
         recurse=recurse,
         replace_originals=replace_originals,
         ignore_pattern=ignore_pattern,
+        jobs=jobs,
+        cache_dir=cache_dir,
+        include=include,
+        exclude=exclude,
+        journal=journal,
+        incremental=incremental,
+    ):
+        yield xevent
+
+
+async def extract_archives_async(
+    location,
+    recurse=True,
+    replace_originals=False,
+    ignore_pattern=(),
+    all_formats=False,
+    jobs=None,
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    journal=None,
+    incremental=False,
+):
+    """
+    Yield ExtractEvent as an asynchronous iterator while extracting archive(s)
+    and compressed files at ``location``. The arguments are the same as for
+    ``extract_archives``.
+
+    The extraction runs in a pool of ``jobs`` worker processes (one by default)
+    without blocking the event loop. Cancelling the iteration kills the worker
+    processes and their 7z or guestfish child processes, and deletes the
+    staging directories of the interrupted extractions. For instance::
+
+        async for xevent in extract_archives_async(location):
+            ...
+    """
+
+    from extractcode.extract import extract_async
+    from extractcode import default_kinds
+    from extractcode import all_kinds
+
+    kinds = all_kinds if all_formats else default_kinds
+
+    async for xevent in extract_async(
+        location=location,
+        kinds=kinds,
+        recurse=recurse,
+        replace_originals=replace_originals,
+        ignore_pattern=ignore_pattern,
+        jobs=jobs,
+        cache_dir=cache_dir,
+        include=include,
+        exclude=exclude,
+        journal=journal,
+        incremental=incremental,
     ):
         yield xevent
 
@@ -74,3 +158,41 @@ def extract_archive(location, target, verbose=False):
         kinds=all_kinds,
         verbose=verbose,
     )
+
+
+def list_archive(location, all_formats=True):
+    """
+    Yield ArchiveEntry for each entry of a single archive or compressed file at
+    ``location`` without extracting it. Yield nothing if this is not a file of
+    a supported archive format. Raise exceptions on errors. Note: this API is
+    returning an iterable and NOT a sequence and does not list recursively.
+
+    Each ArchiveEntry has a path relative to the directory where this archive
+    would be extracted, a size (None if not known without decompressing the
+    file) and its type.
+
+    If ``all_formats`` is True, list all supported archives formats. Otherwise
+    only list the common "extractcode.default_kinds".
+    """
+
+    from extractcode.archive import list_entries
+    from extractcode import default_kinds
+    from extractcode import all_kinds
+
+    kinds = all_kinds if all_formats else default_kinds
+    return list_entries(location=location, kinds=kinds)
+
+
+def open_member(location, path):
+    """
+    Return a binary file-like object to read the content of the single member
+    file with ``path`` in the archive at ``location`` without extracting the
+    whole archive. Raise an ExtractError if there is no such member or if this
+    is not an archive.
+
+    This is fastest for ZIP-based archives (such as jar, wheel, apk, nupkg or
+    docx) where only the requested member is decompressed.
+    """
+
+    from extractcode.archive import open_member as _open_member
+    return _open_member(location=location, path=path)
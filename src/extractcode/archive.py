@@ -7,9 +7,15 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+import io
 import logging
 import os
+import re
+import zipfile
 from collections import namedtuple
+from collections import OrderedDict
+from contextlib import closing
+from functools import lru_cache
 
 from commoncode import fileutils
 from commoncode import filetype
@@ -31,8 +37,17 @@ from extractcode import patch
 from extractcode import sevenzip
 from extractcode import vmimage
 
+from extractcode import EXTRACT_SUFFIX
+from extractcode import ExtractErrorFailedToExtract
+from extractcode import is_selected
+from extractcode import move_tree
+from extractcode.uncompress import get_gzip_uncompressed_name
+from extractcode.uncompress import get_uncompressed_name
 from extractcode.uncompress import uncompress_gzip
 from extractcode.uncompress import uncompress_bzip2
+from extractcode.uncompress import uncompress_lzma
+from extractcode.uncompress import uncompress_xz
+from extractcode.uncompress import uncompress_Z
 
 logger = logging.getLogger(__name__)
 TRACE = False
@@ -118,13 +133,17 @@ def should_extract(location, kinds, ignore_pattern=()):
         return True
 
 
-def get_extractor(location, kinds=all_kinds):
+def get_extractor(location, kinds=all_kinds, include=(), exclude=()):
     """
     Return an extraction callable that can extract the file at ``location`` or
     None if no extraction callable function is found.
     Limit the search for an extractor to the ``kinds`` list of archive kinds.
     See  extractcode.all_kinds for details.
 
+    If ``include`` or ``exclude`` lists of glob patterns are provided, the
+    extraction callable only extracts the archive entries selected by these
+    patterns. See extractcode.is_selected for details.
+
     An extraction callable should accept these arguments:
     - location of the file to extract
     - target_dir where to extract
@@ -132,6 +151,16 @@ def get_extractor(location, kinds=all_kinds):
     It must return a list of warning messages if any or an empty list.
     It must raise Exceptions on errors.
     """
+    extractor = _get_extractor(location, kinds=kinds)
+    if extractor and (include or exclude):
+        extractor = get_selective_extractor(extractor, include, exclude)
+    return extractor
+
+
+def _get_extractor(location, kinds=all_kinds):
+    """
+    Return an extraction callable for the file at ``location`` or None.
+    """
     assert location
     location = os.path.abspath(os.path.expanduser(location))
     extractors = get_extractors(location, kinds=kinds)
@@ -142,6 +171,22 @@ def get_extractor(location, kinds=all_kinds):
 
     if len(extractors) == 2:
         extractor1, extractor2 = extractors
+        if extractor1 in libarchive_filters and extractor2 is extract_tar:
+            # libarchive decompresses and extracts these tarballs in-process
+            return extract_compressed_tar
+
+        if extractor1 is libarchive2.extract and extractor2 is extract_tar:
+            # libarchive reads these compressed tarballs in a single pass
+            return extract_tar
+
+        if extractor1 in streamable_extractors and extractor2 is extract_tar:
+            # stream the payload of 7zip straight to libarchive
+            return extract_streamed
+
+        if extractor1 is extract_7z and extractor2 is extract_tar:
+            # streamed only if the 7zip archive contains a single tarball
+            return extract_tar_7z
+
         nested_extractor = functional.partial(
             extract_twice,
             extractor1=extractor1,
@@ -154,6 +199,60 @@ def get_extractor(location, kinds=all_kinds):
         return None
 
 
+def get_selective_extractor(extractor, include=(), exclude=()):
+    """
+    Return an extraction callable that extracts with the ``extractor`` callable
+    only the archive entries selected by the ``include`` and ``exclude`` lists
+    of glob patterns.
+
+    libarchive and sevenzip skip the entries that are not selected without
+    extracting them. The nested archive extractors select the entries of the
+    inner archive. Other extractors extract all entries to a temporary
+    directory first.
+    """
+    selectable = (
+        libarchive2.extract,
+        sevenzip.extract,
+        extract_streamed,
+        extract_tar_7z,
+    )
+    if extractor in selectable:
+        return functional.partial(extractor, include=include, exclude=exclude)
+
+    select = functional.partial(
+        get_selective_extractor,
+        include=include,
+        exclude=exclude,
+    )
+
+    # extractors that are partials of a wrapper extractor
+    func = getattr(extractor, 'func', None)
+    if func is extract_with_fallback:
+        return functional.partial(
+            extract_with_fallback,
+            extractor1=select(extractor.keywords['extractor1']),
+            extractor2=select(extractor.keywords['extractor2']),
+        )
+    if func is extract_twice:
+        return functional.partial(
+            extract_twice,
+            extractor1=extractor.keywords['extractor1'],
+            extractor2=select(extractor.keywords['extractor2']),
+        )
+    if func is try_to_extract:
+        return functional.partial(
+            try_to_extract,
+            extractor=select(extractor.keywords['extractor']),
+        )
+
+    return functional.partial(
+        extract_selected,
+        extractor=extractor,
+        include=include,
+        exclude=exclude,
+    )
+
+
 def get_extractors(location, kinds=all_kinds):
     """
     Return a list of extractors that can extract the file at
@@ -166,14 +265,50 @@ def get_extractors(location, kinds=all_kinds):
     return handler and handler.extractors or []
 
 
+# maximum number of files with a memoized file type and handler
+DETECTION_CACHE_SIZE = 10000
+
+
+def get_stat_key(location):
+    """
+    Return a (location, inode, mtime, size) tuple used to memoize the file type
+    detection of the file at `location`: a file that is modified or replaced
+    gets a new key.
+    """
+    stat = os.stat(location)
+    return location, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def get_type(location):
+    """
+    Return a typecode Type for the file at `location`. The Type is memoized such
+    that each file is scanned by libmagic once even if its type is checked
+    several times, such as when checking if it should be extracted, selecting
+    its extractor and checking if it is a RAR.
+    """
+    location = os.path.abspath(os.path.expanduser(location))
+    return _get_type(*get_stat_key(location))
+
+
+@lru_cache(maxsize=DETECTION_CACHE_SIZE)
+def _get_type(location, inode, mtime, size):
+    return contenttype.Type(location)
+
+
 def get_best_handler(location, kinds=all_kinds):
     """
     Return the best handler for the file at `location` or None .
+    The selected handler is memoized for a given file and `kinds`.
     """
     location = os.path.abspath(os.path.expanduser(location))
     if not filetype.is_file(location):
         return
 
+    return _get_best_handler(*get_stat_key(location), kinds=tuple(kinds))
+
+
+@lru_cache(maxsize=DETECTION_CACHE_SIZE)
+def _get_best_handler(location, inode, mtime, size, kinds=all_kinds):
     handlers = list(get_handlers(location))
     if TRACE_DEEP:
         logger.debug(f'    get_best_handler: handlers: {handlers}')
@@ -201,7 +336,12 @@ def get_handlers(location):
     """
     if filetype.is_file(location):
 
-        T = contenttype.get_type(location)
+        if not is_plausible_archive(location):
+            if TRACE_DEEP:
+                logger.debug(f'get_handlers: not an archive: {location}')
+            return
+
+        T = get_type(location)
         ftype = T.filetype_file.lower()
         mtype = T.mimetype_file
 
@@ -209,28 +349,303 @@ def get_handlers(location):
             logger.debug(
                 'get_handlers: processing %(location)s: '
                 'ftype: %(ftype)s, mtype: %(mtype)s ' % locals())
-        for handler in archive_handlers:
-            if not handler.extractors:
-                continue
-
-            extractor_count = len(handler.extractors)
-            if extractor_count > 2:
-                raise Exception('Maximum level of archive nesting is two.')
 
-            # default to False
-            type_matched = handler.filetypes and any(t in ftype for t in handler.filetypes)
+        for matched in handlers_index.get_handlers(location, ftype, mtype):
             if TRACE_DEEP:
-                logger.debug(f'    get_handlers: handler.filetypes={handler.filetypes}')
-            mime_matched = handler.mimetypes and any(m in mtype for m in handler.mimetypes)
-            exts = handler.extensions
-            if exts:
-                extension_matched = exts and location.lower().endswith(exts)
+                handler_name = matched[0].name
+                logger.debug('     get_handlers: yielding handler: %(handler_name)r' % locals())
+            yield matched
+
+
+# number of bytes read at the start of a file to sniff its signature
+SNIFF_SIZE = 512
+
+# Signatures of the formats of the handlers that can be matched without an
+# extension, as (format name, offset, magic bytes). A strict handler must match
+# an extension to be selected and does not need a signature here.
+ARCHIVE_SIGNATURES = (
+    ('gzip', 0, b'\x1f\x8b'),
+    ('Z', 0, b'\x1f\x9d'),
+    ('zip', 0, b'PK\x03\x04'),
+    ('zip', 0, b'PK\x05\x06'),
+    ('zip', 0, b'PK\x07\x08'),
+    ('zip', 0, b'PK00PK'),
+    ('bzip2', 0, b'BZh'),
+    ('xz', 0, b'\xfd7zXZ\x00'),
+    ('lzma', 0, b'\x5d\x00\x00'),
+    ('lzip', 0, b'LZIP'),
+    ('lz4', 0, b'\x04\x22\x4d\x18'),
+    ('lz4', 0, b'\x02\x21\x4c\x18'),
+    # zstandard frames version 0.1 to 1.0 start with 0x1e to 0x28
+    ('zstd', 1, b'\xb5\x2f\xfd'),
+    ('7zip', 0, b'7z\xbc\xaf\x27\x1c'),
+    ('ar', 0, b'!<arch>\n'),
+    ('rpm', 0, b'\xed\xab\xee\xdb'),
+    ('cpio', 0, b'070707'),
+    ('cpio', 0, b'070701'),
+    ('cpio', 0, b'070702'),
+    ('cpio', 0, b'\xc7\x71'),
+    ('cpio', 0, b'\x71\xc7'),
+    ('squashfs', 0, b'hsqs'),
+    ('squashfs', 0, b'sqsh'),
+    ('squashfs', 0, b'qshs'),
+    ('squashfs', 0, b'shsq'),
+    ('tar', 257, b'ustar'),
+)
 
-            if TRACE_DEEP:
-                print(
-                    f'  get_handlers: matched type: {type_matched}, '
-                    f'mime: {mime_matched}, ext: {extension_matched}' % locals()
-                  )
+
+def get_signature(head):
+    """
+    Return the name of the archive format of a file given the `head` bytes read
+    at the start of this file or None if no archive signature is found.
+    """
+    for name, offset, magic in ARCHIVE_SIGNATURES:
+        if head.startswith(magic, offset):
+            return name
+
+    if is_tar_header(head):
+        return 'tar'
+
+
+def is_tar_header(head):
+    """
+    Return True if the `head` bytes start with a tar header with a valid
+    checksum, such as for old V7 tar archives that have no magic bytes.
+    """
+    if len(head) < 512:
+        return False
+    try:
+        checksum = int(head[148:156].strip(b' \x00') or b'x', 8)
+    except ValueError:
+        return False
+    header = head[:148] + b' ' * 8 + head[156:512]
+    # some old tar implementations used signed chars
+    return checksum in (
+        sum(header),
+        sum(b - 256 if b > 127 else b for b in header),
+    )
+
+
+def is_plausible_archive(location):
+    """
+    Return True if the file at `location` could be extracted by some handler
+    based on a cheap check of its extension and signature.
+
+    Return False for files that cannot be matched by any handler, such that the
+    costly file type detection with libmagic is skipped for most of the files
+    that are not archives.
+    """
+    if handlers_index.match_extensions(location):
+        return True
+
+    try:
+        with open(location, 'rb') as f:
+            head = f.read(SNIFF_SIZE)
+    except OSError:
+        # let the full file type detection decide
+        return True
+
+    return bool(get_signature(head))
+
+
+# relative extraction cost per byte of an archive format: the formats extracted
+# with 7z in a subprocess or with a slow decompression weigh more than a plain
+# tar extracted in-process with libarchive
+EXTRACTION_COSTS = {
+    'tar': 1,
+    'ar': 1,
+    'cpio': 1,
+    'zip': 1.5,
+    'lz4': 1.5,
+    'zstd': 1.5,
+    'gzip': 2,
+    'Z': 2,
+    'xz': 3,
+    'lzma': 3,
+    'lzip': 3,
+    'rpm': 3,
+    'squashfs': 3,
+    'cab': 3,
+    'bzip2': 4,
+    '7zip': 4,
+    'iso': 4,
+    'dmg': 4,
+    'msi': 5,
+}
+
+# archive format names by lowercase extension, to estimate an extraction cost
+# without reading a file
+EXTENSION_FORMATS = {
+    '.tar': 'tar',
+    '.a': 'ar',
+    '.deb': 'ar',
+    '.cpio': 'cpio',
+    '.zip': 'zip',
+    '.jar': 'zip',
+    '.war': 'zip',
+    '.ear': 'zip',
+    '.whl': 'zip',
+    '.apk': 'zip',
+    '.gz': 'gzip',
+    '.tgz': 'gzip',
+    '.z': 'Z',
+    '.xz': 'xz',
+    '.txz': 'xz',
+    '.lzma': 'lzma',
+    '.bz2': 'bzip2',
+    '.tbz2': 'bzip2',
+    '.7z': '7zip',
+    '.rpm': 'rpm',
+    '.cab': 'cab',
+    '.iso': 'iso',
+    '.dmg': 'dmg',
+    '.msi': 'msi',
+}
+
+# files smaller than this are not read to estimate their extraction cost
+COST_SNIFF_MIN_SIZE = 1024 * 1024
+
+
+def get_extraction_cost(location):
+    """
+    Return an estimated relative cost to extract the file at `location`: its
+    size weighted by the cost of its archive format found from its extension
+    or from its signature for large files.
+
+    This is used to extract the most costly archives first in a parallel
+    extraction, such that a large archive found last does not run alone at the
+    end. It is only an estimate: this is neither the file type detection nor
+    the handler selection made when the file is extracted.
+    """
+    try:
+        size = os.stat(location).st_size
+    except OSError:
+        return 0
+
+    extension = os.path.splitext(location)[1].lower()
+    name = EXTENSION_FORMATS.get(extension)
+    if not name and size >= COST_SNIFF_MIN_SIZE:
+        try:
+            with open(location, 'rb') as f:
+                name = get_signature(f.read(SNIFF_SIZE))
+        except OSError:
+            pass
+
+    return size * EXTRACTION_COSTS.get(name, 1)
+
+
+class HandlersIndex(object):
+    """
+    A dispatch index of a list of `handlers` compiled once to find the handlers
+    matching the file type, mime type and extension of a file without scanning
+    the criteria of every handler for every file.
+
+    The file types and mime types of all handlers are deduplicated and combined
+    each in a single regex that finds all the type substrings found in a type
+    string in one pass. Extensions are looked up in a mapping of extension by
+    the possible suffixes of a path, one lookup per distinct extension length.
+    """
+
+    def __init__(self, handlers):
+        # only handlers with extractors are considered
+        self.handlers = [h for h in handlers if h.extractors]
+        for handler in self.handlers:
+            if len(handler.extractors) > 2:
+                raise Exception('Maximum level of archive nesting is two.')
+
+        self.filetypes_matcher, self.by_filetype = self.build_substrings_index(
+            {i: h.filetypes for i, h in enumerate(self.handlers)})
+        self.mimetypes_matcher, self.by_mimetype = self.build_substrings_index(
+            {i: h.mimetypes for i, h in enumerate(self.handlers)})
+
+        # {extension: set of handler indexes}
+        self.by_extension = {}
+        # Note: for legacy compatibility, a handler without extensions uses the
+        # extension match of the closest previous handler with extensions.
+        last_with_extensions = None
+        for i, handler in enumerate(self.handlers):
+            if handler.extensions:
+                last_with_extensions = i
+                for ext in handler.extensions:
+                    self.by_extension.setdefault(ext, set()).add(i)
+            elif last_with_extensions is not None:
+                for ext in self.handlers[last_with_extensions].extensions:
+                    self.by_extension[ext].add(i)
+        self.extension_lengths = sorted(set(map(len, self.by_extension)))
+
+    @staticmethod
+    def build_substrings_index(substrings_by_handler):
+        """
+        Return a tuple of (regex matcher, {substring: set of handler indexes})
+        built from a `substrings_by_handler` mapping of {handler index:
+        sequence of substrings}.
+
+        The regex matches the longest substring starting at each position of a
+        string. Since any shorter substring matched at the same position is
+        contained in this longest substring, the handlers of a substring also
+        include the handlers of all the substrings it contains.
+        """
+        handlers_by_substring = {}
+        for i, substrings in substrings_by_handler.items():
+            for substring in substrings:
+                handlers_by_substring.setdefault(substring, set()).add(i)
+
+        index = {}
+        for substring in handlers_by_substring:
+            index[substring] = set().union(*(
+                indexes for other, indexes in handlers_by_substring.items()
+                if other in substring
+            ))
+
+        if not index:
+            return None, index
+
+        longest_first = sorted(index, key=len, reverse=True)
+        alternatives = '|'.join(map(re.escape, longest_first))
+        matcher = re.compile(f'(?=({alternatives}))').finditer
+        return matcher, index
+
+    @staticmethod
+    def match_substrings(string, matcher, index):
+        """
+        Return a set of handler indexes matching any substring in `string`.
+        """
+        matched = set()
+        if not matcher:
+            return matched
+        for substring in set(m.group(1) for m in matcher(string)):
+            matched.update(index[substring])
+        return matched
+
+    def match_extensions(self, location):
+        """
+        Return a set of handler indexes matching the extension of `location`.
+        """
+        matched = set()
+        location = location.lower()
+        for length in self.extension_lengths:
+            if length > len(location):
+                break
+            indexes = self.by_extension.get(location[-length:])
+            if indexes:
+                matched.update(indexes)
+        return matched
+
+    def get_handlers(self, location, ftype, mtype):
+        """
+        Yield (handler, type_matched, mime_matched, extension_matched,) for
+        each handler matching the `location` with a lowercase `ftype` file type
+        and `mtype` mime type in their original order.
+        """
+        types = self.match_substrings(ftype, self.filetypes_matcher, self.by_filetype)
+        mimes = self.match_substrings(mtype, self.mimetypes_matcher, self.by_mimetype)
+        extensions = self.match_extensions(location)
+
+        for i in sorted(types | mimes | extensions):
+            handler = self.handlers[i]
+            type_matched = i in types
+            mime_matched = i in mimes
+            extension_matched = i in extensions
 
             if (
                 handler.strict
@@ -240,15 +655,9 @@ def get_handlers(location):
                     and extension_matched
                 )
             ):
-                if TRACE_DEEP:
-                    print(f'  get_handlers: skip strict: {handler.name}')
                 continue
 
-            if type_matched or mime_matched or extension_matched:
-                if TRACE_DEEP:
-                    handler_name = handler.name
-                    logger.debug('     get_handlers: yielding handler: %(handler_name)r' % locals())
-                yield handler, type_matched, mime_matched, extension_matched
+            yield handler, type_matched, mime_matched, extension_matched
 
 
 def score_handlers(handlers):
@@ -398,6 +807,75 @@ def extract_twice(location, target_dir, extractor1, extractor2):
     return warnings
 
 
+def extract_streamed(location, target_dir, include=(), exclude=()):
+    """
+    Extract a nested compressed archive at `location` to `target_dir` in a
+    single pass: the payload decompressed by 7zip is piped straight to
+    libarchive for extraction.
+
+    Return a list of warning messages. Raise exceptions on errors.
+
+    This is equivalent to an `extract_twice` with a 7zip-based `extractor1` and
+    a libarchive-based `extractor2` without writing to disk the intermediate
+    payload which is often several times bigger than the compressed file.
+    """
+    abs_location = os.path.abspath(os.path.expanduser(location))
+    abs_target_dir = str(os.path.abspath(os.path.expanduser(target_dir)))
+    if TRACE:
+        logger.debug('extract_streamed: %(abs_location)r' % locals())
+
+    return sevenzip.extract_to_stream(
+        location=abs_location,
+        consumer=functional.partial(
+            libarchive2.extract_fd,
+            target_dir=abs_target_dir,
+            include=include,
+            exclude=exclude,
+        ),
+    )
+
+
+def extract_tar_7z(location, target_dir, include=(), exclude=()):
+    """
+    Extract a tarball compressed in a 7zip archive at `location` to
+    `target_dir`. Return a list of warning messages. Raise exceptions on errors.
+
+    The tarball is streamed from 7zip to libarchive with `extract_streamed` if
+    it is the single file of the 7zip archive. Otherwise each file of the 7zip
+    archive is extracted to a temporary directory then extracted as a tarball:
+    7zip writes all the files back to back in a single output stream and
+    libarchive would read only the first tarball.
+    """
+    if has_single_file(location):
+        return extract_streamed(location, target_dir, include=include, exclude=exclude)
+
+    return extract_twice(
+        location,
+        target_dir,
+        extractor1=extract_7z,
+        extractor2=functional.partial(
+            libarchive2.extract,
+            include=include,
+            exclude=exclude,
+        ),
+    )
+
+
+def has_single_file(location):
+    """
+    Return True if the 7zip-supported archive at `location` contains exactly
+    one file, as listed by 7zip.
+    """
+    errors = []
+    files = 0
+    for entry in sevenzip.iter_entries(location, errors=errors):
+        if entry.is_file:
+            files += 1
+        if files > 1:
+            return False
+    return files == 1 and not errors
+
+
 def extract_with_fallback(location, target_dir, extractor1, extractor2):
     """
     Extract archive at `location` to `target_dir` trying first the primary
@@ -416,14 +894,14 @@ def extract_with_fallback(location, target_dir, extractor1, extractor2):
         warnings = extractor1(abs_location, temp_target1)
         if TRACE:
             logger.debug('extract_with_fallback: temp_target1: %(temp_target1)r' % locals())
-        fileutils.copytree(temp_target1, abs_target_dir)
+        move_tree(temp_target1, abs_target_dir)
     except:
         try:
             temp_target2 = str(fileutils.get_temp_dir(prefix='extractcode-extract2-'))
             warnings = extractor2(abs_location, temp_target2)
             if TRACE:
                 logger.debug('extract_with_fallback: temp_target2: %(temp_target2)r' % locals())
-            fileutils.copytree(temp_target2, abs_target_dir)
+            move_tree(temp_target2, abs_target_dir)
         finally:
             fileutils.delete(temp_target2)
     finally:
@@ -431,6 +909,33 @@ def extract_with_fallback(location, target_dir, extractor1, extractor2):
     return warnings
 
 
+def extract_selected(location, target_dir, extractor, include=(), exclude=()):
+    """
+    Extract archive at `location` to `target_dir` with the `extractor` function
+    keeping only the files selected by the `include` and `exclude` lists of
+    glob patterns. Return a list of warning messages. Raise exceptions on
+    errors.
+
+    Note: this is used for the extractors that cannot skip entries: all the
+    entries are extracted to a temporary directory first.
+    """
+    abs_location = os.path.abspath(os.path.expanduser(location))
+    abs_target_dir = str(os.path.abspath(os.path.expanduser(target_dir)))
+    temp_target = str(fileutils.get_temp_dir(prefix='extractcode-extract-'))
+    try:
+        warnings = extractor(abs_location, temp_target)
+        for extracted in fileutils.resource_iter(temp_target, with_dirs=False):
+            path = fileutils.as_posixpath(os.path.relpath(extracted, temp_target))
+            if not is_selected(path, include, exclude):
+                continue
+            target = os.path.join(abs_target_dir, path)
+            fileutils.create_dir(os.path.dirname(target))
+            os.rename(extracted, target)
+    finally:
+        fileutils.delete(temp_target)
+    return warnings
+
+
 def try_to_extract(location, target_dir, extractor):
     """
     Extract archive at `location` to `target_dir` trying the `extractor` function.
@@ -447,7 +952,7 @@ def try_to_extract(location, target_dir, extractor):
         warnings = extractor(abs_location, temp_target)
         if TRACE:
             logger.debug('try_to_extract: temp_target: %(temp_target)r' % locals())
-        fileutils.copytree(temp_target, abs_target_dir)
+        move_tree(temp_target, abs_target_dir)
     except:
         return warnings
     finally:
@@ -490,6 +995,43 @@ extract_zip = functional.partial(
 
 extract_springboot = functional.partial(try_to_extract, extractor=extract_zip)
 
+# single-stream compressed files are decompressed in-process first and with
+# sevenzip only as a fallback
+extract_xz = functional.partial(
+    extract_with_fallback,
+    extractor1=uncompress_xz,
+    extractor2=sevenzip.extract,
+)
+
+extract_lzma = functional.partial(
+    extract_with_fallback,
+    extractor1=uncompress_lzma,
+    extractor2=sevenzip.extract,
+)
+
+extract_Z = functional.partial(
+    extract_with_fallback,
+    extractor1=uncompress_Z,
+    extractor2=sevenzip.extract,
+)
+
+# first stage extractors of nested archives with a single payload, such as RPM,
+# that can be streamed to the second stage extractor rather than extracted
+# twice. A 7zip archive can contain several files: see extract_tar_7z
+streamable_extractors = (sevenzip.extract,)
+
+# first stage extractors of compressed tarballs that libarchive can decompress
+# itself while extracting the tarball
+libarchive_filters = (extract_xz, extract_lzma, extract_Z,)
+
+# a compressed tarball is extracted with libarchive in one pass or streamed
+# from sevenzip to libarchive as a fallback
+extract_compressed_tar = functional.partial(
+    extract_with_fallback,
+    extractor1=libarchive2.extract,
+    extractor2=extract_streamed,
+)
+
 extract_lzip = libarchive2.extract
 extract_zstd = libarchive2.extract
 extract_lz4 = libarchive2.extract
@@ -497,16 +1039,355 @@ extract_lz4 = libarchive2.extract
 extract_iso = sevenzip.extract
 extract_rar = libarchive2.extract
 extract_rpm = sevenzip.extract
-extract_xz = sevenzip.extract
-extract_lzma = sevenzip.extract
 extract_squashfs = sevenzip.extract
 extract_vm_image = vmimage.extract
 extract_cab = sevenzip.extract
 extract_nsis = sevenzip.extract
 extract_ishield = sevenzip.extract
-extract_Z = sevenzip.extract
 extract_xarpkg = sevenzip.extract
 
+# Archive listing without extraction
+####################################
+
+# An entry of an archive as it would be extracted: `path` is relative to the
+# extraction target directory and `size` is None if it is not known without
+# decompressing the data.
+ArchiveEntry = namedtuple(
+    'ArchiveEntry',
+    [
+        'path',
+        'size',
+        'is_file',
+        'is_dir',
+        'is_symlink',
+        'is_hardlink',
+        'is_special',
+        'link_target',
+    ]
+)
+
+
+def list_entries(location, kinds=all_kinds):
+    """
+    Yield ArchiveEntry for each entry of the archive at ``location`` using the
+    best handler for the ``kinds`` of archives, without writing the extracted
+    entries data to disk when possible. Yield nothing if this is not an
+    archive. Raise exceptions on errors.
+
+    The entries of nested archives (such as a tar.gz or an RPM) are the entries
+    of the inner archive that would be extracted.
+    """
+    abs_location = os.path.abspath(os.path.expanduser(location))
+    handler = get_best_handler(abs_location, kinds=kinds)
+    if not handler or not handler.extractors:
+        return
+
+    extractors = handler.extractors
+    if len(extractors) == 1:
+        yield from get_lister(extractors[0])(abs_location)
+        return
+
+    extractor1, extractor2 = extractors
+    lister2 = get_lister(extractor2)
+    if extractor2 is extract_tar and (
+        extractor1 in libarchive_filters or extractor1 is libarchive2.extract
+    ):
+        # libarchive decompresses these tarballs itself
+        yield from lister2(abs_location)
+
+    elif extractor2 is extract_tar and (
+        extractor1 in streamable_extractors
+        or (extractor1 is extract_7z and has_single_file(abs_location))
+    ):
+        # stream the payload of 7zip straight to libarchive
+        yield from sevenzip.extract_to_stream(
+            location=abs_location,
+            consumer=lambda fd: list(list_libarchive(fd)),
+        )
+
+    else:
+        # the intermediate payload of extractor1 is extracted to a temp dir
+        temp_target = str(fileutils.get_temp_dir(prefix='extractcode-list-'))
+        try:
+            extractor1(abs_location, temp_target)
+            for payload in fileutils.resource_iter(temp_target, with_dirs=False):
+                yield from lister2(payload)
+        finally:
+            fileutils.delete(temp_target)
+
+
+def get_lister(extractor):
+    """
+    Return a listing callable for an ``extractor`` callable. A listing callable
+    accepts a location and yields the ArchiveEntry that ``extractor`` would
+    extract from this location.
+    """
+    lister = listers.get(extractor)
+    if lister:
+        return lister
+
+    # extractors that are partials of a wrapper extractor
+    func = getattr(extractor, 'func', None)
+    if func is extract_with_fallback:
+        return functional.partial(
+            list_with_fallback,
+            lister1=get_lister(extractor.keywords['extractor1']),
+            lister2=get_lister(extractor.keywords['extractor2']),
+        )
+    if func is try_to_extract:
+        return functional.partial(
+            try_to_list,
+            lister=get_lister(extractor.keywords['extractor']),
+        )
+
+    return functional.partial(list_extracted, extractor=extractor)
+
+
+def list_libarchive(location):
+    """
+    Yield ArchiveEntry for a libarchive-supported archive at ``location`` (a
+    path or an opened file descriptor) skipping the entries data.
+    """
+    for entry in libarchive2.list_entries(location, skip_data=True):
+        yield ArchiveEntry(
+            path=entry.path,
+            size=entry.size,
+            is_file=entry.isfile,
+            is_dir=entry.isdir,
+            is_symlink=entry.issym,
+            is_hardlink=entry.islnk,
+            is_special=entry.isspecial,
+            link_target=entry.symlink_path or entry.hardlink_path,
+        )
+
+
+def list_sevenzip(location):
+    """
+    Yield ArchiveEntry for a 7zip-supported archive at ``location``.
+    """
+    errors = []
+    for entry in sevenzip.iter_entries(location, errors=errors):
+        yield ArchiveEntry(
+            path=entry.path,
+            size=int(entry.size) if entry.size else None,
+            is_file=entry.is_file,
+            is_dir=entry.is_dir,
+            is_symlink=entry.is_symlink,
+            is_hardlink=entry.is_hardlink,
+            is_special=entry.is_special,
+            link_target=entry.link_target,
+        )
+    if errors:
+        raise ExtractErrorFailedToExtract('\n'.join(errors))
+
+
+def list_uncompressed(location, get_name):
+    """
+    Yield a single ArchiveEntry for the compressed file at ``location`` named
+    with the ``get_name`` callable. Its size is not known.
+    """
+    yield ArchiveEntry(
+        path=get_name(location),
+        size=None,
+        is_file=True,
+        is_dir=False,
+        is_symlink=False,
+        is_hardlink=False,
+        is_special=False,
+        link_target=None,
+    )
+
+
+def list_with_fallback(location, lister1, lister2):
+    """
+    Yield ArchiveEntry for the archive at ``location`` using first the
+    ``lister1`` listing callable. If this fails before any entry is listed,
+    list with the fallback ``lister2`` callable instead.
+    """
+    listed = False
+    try:
+        for entry in lister1(location):
+            listed = True
+            yield entry
+    except Exception:
+        if listed:
+            raise
+        yield from lister2(location)
+
+
+def try_to_list(location, lister):
+    """
+    Yield ArchiveEntry for the archive at ``location`` using the ``lister``
+    listing callable ignoring any error.
+    """
+    try:
+        yield from lister(location)
+    except Exception:
+        return
+
+
+def list_extracted(location, extractor):
+    """
+    Yield ArchiveEntry for the archive at ``location`` extracted to a temporary
+    directory with the ``extractor`` callable. This is used for the few
+    extractors that have no listing support.
+    """
+    temp_target = str(fileutils.get_temp_dir(prefix='extractcode-list-'))
+    try:
+        extractor(location, temp_target)
+        for top, dirs, files in os.walk(temp_target):
+            for name in sorted(dirs) + sorted(files):
+                path = os.path.join(top, name)
+                is_symlink = os.path.islink(path)
+                is_dir = not is_symlink and os.path.isdir(path)
+                yield ArchiveEntry(
+                    path=fileutils.as_posixpath(os.path.relpath(path, temp_target)),
+                    size=0 if is_dir else os.lstat(path).st_size,
+                    is_file=not is_dir and not is_symlink,
+                    is_dir=is_dir,
+                    is_symlink=is_symlink,
+                    is_hardlink=False,
+                    is_special=False,
+                    link_target=is_symlink and os.readlink(path) or None,
+                )
+    finally:
+        fileutils.delete(temp_target)
+
+
+listers = {
+    libarchive2.extract: list_libarchive,
+    sevenzip.extract: list_sevenzip,
+    uncompress_gzip: functional.partial(
+        list_uncompressed,
+        get_name=get_gzip_uncompressed_name,
+    ),
+    uncompress_bzip2: functional.partial(
+        list_uncompressed,
+        get_name=lambda loc: os.path.basename(loc) + EXTRACT_SUFFIX,
+    ),
+    uncompress_xz: functional.partial(
+        list_uncompressed,
+        get_name=functional.partial(get_uncompressed_name, tar_extensions=('.txz',)),
+    ),
+    uncompress_lzma: functional.partial(
+        list_uncompressed,
+        get_name=get_uncompressed_name,
+    ),
+    uncompress_Z: functional.partial(
+        list_uncompressed,
+        get_name=functional.partial(get_uncompressed_name, tar_extensions=('.taz',)),
+    ),
+}
+
+# Random access to archive members
+##################################
+
+# maximum number of ZIP files kept opened with their parsed central directory
+# for reuse by open_member
+ZIP_CACHE_SIZE = 32
+
+
+def open_member(location, path, kinds=all_kinds):
+    """
+    Return a binary file-like object to read the content of the member file
+    with ``path`` in the archive at ``location`` without extracting the other
+    members. Use the best handler for the ``kinds`` of archives. Raise an
+    ExtractError if there is no such member or if this is not an archive.
+
+    The members of ZIP-based archives (such as jar, wheel, apk, nupkg or docx)
+    are decompressed on demand as they are read and the central directory of
+    the most recently used archives is parsed only once. The members of other
+    archives are found with a sequential scan of libarchive entries that skips
+    the data of other entries and their content is returned in memory.
+    """
+    abs_location = os.path.abspath(os.path.expanduser(location))
+    handler = get_best_handler(abs_location, kinds=kinds)
+    if not handler:
+        raise ExtractErrorFailedToExtract(f'Not a supported archive: {location}')
+
+    member = get_member_path(path)
+    if handler.extractors in ([extract_zip], [extract_springboot]):
+        try:
+            return open_zip_member(abs_location, member)
+        except zipfile.BadZipFile:
+            # some damaged ZIPs can still be read sequentially with libarchive
+            pass
+
+    # closing the entries generator closes the underlying libarchive Archive
+    with closing(libarchive2.list_entries(abs_location, skip_data=True)) as entries:
+        for entry in entries:
+            if entry.isfile and get_member_path(entry.path) == member:
+                return io.BytesIO(b''.join(entry.get_content()))
+    raise ExtractErrorFailedToExtract(f'No member {path!r} in archive: {location}')
+
+
+def open_zip_member(location, member):
+    """
+    Return a file-like object to read the ``member`` normalized path in the ZIP
+    file at ``location``. Raise an ExtractError if there is no such member.
+    """
+    zip_file = get_zip_file(location)
+    try:
+        return zip_file.open(member)
+    except KeyError:
+        # names may not be normalized in the archive, such as "./foo"
+        for info in zip_file.infolist():
+            if not info.is_dir() and get_member_path(info.filename) == member:
+                return zip_file.open(info)
+    raise ExtractErrorFailedToExtract(f'No member {member!r} in archive: {location}')
+
+
+def get_member_path(path):
+    """
+    Return a normalized POSIX archive member ``path`` stripped from any leading
+    "./" or "/".
+    """
+    path = fileutils.as_posixpath(path).lstrip('/')
+    while path.startswith('./'):
+        path = path[2:].lstrip('/')
+    return path
+
+
+# {location: (stat key, ZipFile)} of the ZipFile kept opened for reuse, ordered
+# from the least to the most recently used
+_zip_files = OrderedDict()
+
+
+def get_zip_file(location):
+    """
+    Return an opened ZipFile for the file at ``location``, reusing a recently
+    opened ZipFile for the same unmodified file.
+
+    At most ZIP_CACHE_SIZE ZipFile are kept opened: the least recently used
+    ZipFile is closed when evicted, or when its file is modified. The members
+    opened from a closed ZipFile can still be read until they are closed.
+    """
+    stat_key = get_stat_key(location)
+    cached_key, zip_file = _zip_files.pop(location, (None, None))
+    if zip_file and cached_key != stat_key:
+        zip_file.close()
+        zip_file = None
+
+    if not zip_file:
+        zip_file = zipfile.ZipFile(location)
+    _zip_files[location] = stat_key, zip_file
+
+    while len(_zip_files) > ZIP_CACHE_SIZE:
+        _location, (_key, evicted) = _zip_files.popitem(last=False)
+        evicted.close()
+    return zip_file
+
+
+def close_zip_files():
+    """
+    Close all the ZipFile kept opened for reuse by open_member, such as to
+    release the locks held on their files on Windows.
+    """
+    while _zip_files:
+        _location, (_key, zip_file) = _zip_files.popitem()
+        zip_file.close()
+
+
 # Archive handlers.
 ####################
 
@@ -1202,3 +2083,6 @@ try:
     archive_handlers.append(PatchHandler)
 except:
     pass
+
+# dispatch index of the archive_handlers
+handlers_index = HandlersIndex(archive_handlers)
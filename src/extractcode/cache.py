@@ -0,0 +1,267 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/extractcode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import uuid
+
+from os.path import exists
+from os.path import join
+
+import attr
+
+from commoncode import fileutils
+
+logger = logging.getLogger(__name__)
+TRACE = False
+
+if TRACE:
+    import sys
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+"""
+An opt-in, content-addressed cache of extracted archives.
+
+The same archive is often extracted many times across scans. The extracted tree
+of an archive is stored once in a local cache directory keyed by the SHA256 of
+the archive content, the name of the handler used to extract it and the version
+of extractcode. Later extractions of the same archive materialize the cached
+tree with hardlinks (or copies when hardlinks are not possible) rather than
+running the extractor again.
+
+Only successful extractions are cached. The cache is bounded in size and the
+least recently used entries are evicted first.
+
+An extracted tree is copied in the cache, such that the extracted files can be
+modified afterwards. The cached files are read-only: the files extracted from
+the cache as hardlinks are read-only too, such that an attempt to modify them
+in place fails rather than silently changing the cached tree shared by other
+extractions. Use an ExtractionCache with `link` False to extract the cached
+files as writable copies instead.
+"""
+
+# default maximum size of the cache in bytes
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024 * 1024
+
+# name of the JSON file storing the metadata of a cache entry
+ENTRY_INFO = 'entry.json'
+
+# name of the directory storing the extracted tree of a cache entry
+ENTRY_TREE = 'tree'
+
+
+def get_version():
+    """
+    Return the installed extractcode version string.
+    """
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version
+    try:
+        return version('extractcode')
+    except PackageNotFoundError:
+        from extractcode.cli import __version__
+        return __version__
+
+
+def get_sha256(location, chunk_size=1024 * 1024):
+    """
+    Return the hex SHA256 of the content of the file at `location`.
+    """
+    sha256 = hashlib.sha256()
+    with open(location, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_cache_key(location, handler_name, version=None):
+    """
+    Return a cache key string for the archive file at `location` extracted with
+    the handler named `handler_name` with the extractcode `version`.
+    """
+    version = version or get_version()
+    key = f'{get_sha256(location)}:{handler_name}:{version}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def get_tree_size(location):
+    """
+    Return the size in bytes of all the files in the `location` directory.
+    """
+    size = 0
+    for top, _dirs, files in os.walk(location):
+        for f in files:
+            size += os.lstat(join(top, f)).st_size
+    return size
+
+
+def link_tree(source, target, link=True, read_only=False):
+    """
+    Recreate the `source` directory tree in the existing `target` directory,
+    hardlinking files if `link` is True and possible or copying files
+    otherwise. Make the copied files read-only if `read_only` is True.
+    """
+    for top, dirs, files in os.walk(source):
+        rel_top = os.path.relpath(top, source)
+        target_top = target if rel_top == '.' else join(target, rel_top)
+        for d in dirs:
+            os.mkdir(join(target_top, d))
+        for f in files:
+            src = join(top, f)
+            dst = join(target_top, f)
+            if link:
+                try:
+                    os.link(src, dst)
+                    continue
+                except OSError:
+                    # for instance when crossing filesystems
+                    link = False
+            fileutils.copyfile(src, dst)
+            if read_only and os.path.exists(dst):
+                mode = stat.S_IMODE(os.stat(dst).st_mode)
+                os.chmod(dst, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+@attr.s
+class ExtractionCache(object):
+    """
+    A cache of extracted archives stored in the `cache_dir` directory using at
+    most `max_size` bytes. The cached trees are extracted as hardlinks if
+    `link` is True or as copies otherwise.
+
+    The `hits` and `misses` counters track the cache lookups made with this
+    cache in the current process. The lookups made in the worker processes of
+    a parallel extraction are reported to the parent process with the
+    ExtractEvent.cached flag instead.
+    """
+    cache_dir = attr.ib()
+    max_size = attr.ib(default=DEFAULT_MAX_SIZE)
+    link = attr.ib(default=True)
+    hits = attr.ib(default=0)
+    misses = attr.ib(default=0)
+
+    def __attrs_post_init__(self, *args, **kwargs):
+        self.cache_dir = os.path.abspath(os.path.expanduser(self.cache_dir))
+        fileutils.create_dir(self.cache_dir)
+
+    def get_entry_dir(self, key):
+        return join(self.cache_dir, key)
+
+    def get(self, key, target_dir):
+        """
+        Materialize the tree cached for `key` in the existing, empty
+        `target_dir` directory and return a list of the warnings of the cached
+        extraction. Return None if there is no such cached tree.
+        """
+        entry_dir = self.get_entry_dir(key)
+        entry_info = join(entry_dir, ENTRY_INFO)
+        try:
+            with open(entry_info) as inf:
+                info = json.load(inf)
+            link_tree(join(entry_dir, ENTRY_TREE), target_dir, link=self.link)
+            # mark this entry as recently used
+            os.utime(entry_info)
+        except (OSError, ValueError) as e:
+            # a missing entry or an entry evicted by another process
+            if TRACE:
+                logger.debug(f'ExtractionCache.get: miss: {key}: {e}')
+            fileutils.delete(target_dir)
+            fileutils.create_dir(target_dir)
+            self.misses += 1
+            return
+
+        if TRACE:
+            logger.debug(f'ExtractionCache.get: hit: {key}')
+        self.hits += 1
+        return info.get('warnings') or []
+
+    def put(self, key, source_dir, warnings=()):
+        """
+        Store a read-only copy of the `source_dir` extracted tree and its list
+        of `warnings` in the cache for `key`, then evict the least recently used
+        entries if the cache is larger than its maximum size.
+        """
+        entry_dir = self.get_entry_dir(key)
+        if exists(entry_dir):
+            return
+
+        size = get_tree_size(source_dir)
+        if size > self.max_size:
+            return
+
+        # build the entry aside and rename it when complete, such that
+        # concurrent processes never see a partial entry
+        tmp_dir = join(self.cache_dir, f'.{key}-{uuid.uuid4().hex[:12]}')
+        try:
+            tree = join(tmp_dir, ENTRY_TREE)
+            fileutils.create_dir(tree)
+            link_tree(source_dir, tree, link=False, read_only=True)
+            with open(join(tmp_dir, ENTRY_INFO), 'w') as out:
+                json.dump(dict(size=size, warnings=list(warnings)), out)
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            # another process stored the same entry first
+            if TRACE:
+                logger.debug(f'ExtractionCache.put: failed: {key}: {e}')
+        finally:
+            if exists(tmp_dir):
+                fileutils.delete(tmp_dir)
+
+        self.evict()
+
+    def get_entries(self):
+        """
+        Return a list of (last used time, size, key) for the cache entries.
+        """
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            if key.startswith('.'):
+                continue
+            entry_info = join(self.get_entry_dir(key), ENTRY_INFO)
+            try:
+                with open(entry_info) as inf:
+                    size = json.load(inf)['size']
+                entries.append((os.stat(entry_info).st_mtime, size, key))
+            except (OSError, ValueError, KeyError):
+                continue
+        return entries
+
+    def evict(self):
+        """
+        Delete the least recently used cache entries until the cache size is
+        below its maximum size.
+        """
+        entries = sorted(self.get_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_size:
+                break
+            if TRACE:
+                logger.debug(f'ExtractionCache.evict: {key}')
+            fileutils.delete(self.get_entry_dir(key))
+            total -= size
+
+
+_caches = {}
+
+
+def get_cache(cache_dir, max_size=DEFAULT_MAX_SIZE):
+    """
+    Return an ExtractionCache for `cache_dir`, reused across calls in the same
+    process.
+    """
+    key = cache_dir, max_size
+    cache = _caches.get(key)
+    if not cache:
+        cache = _caches[key] = ExtractionCache(cache_dir, max_size=max_size)
+    return cache
@@ -9,6 +9,7 @@
 
 import os
 import functools
+from collections import Counter
 
 import click
 click.disable_unicode_literals_warning = True
@@ -19,6 +20,7 @@ from commoncode import filetype
 from commoncode.text import toascii
 
 from extractcode.api import extract_archives
+from extractcode.api import list_archive
 
 __version__ = '2021.6.2'
 
@@ -144,6 +146,64 @@ Try 'extractcode --help' for help on options and arguments.'''
     multiple=True,
     help='Ignore files/directories matching this glob pattern.',
 )
+@click.option(
+    '--include',
+    default=[],
+    multiple=True,
+    help='Only extract the archive entries with a path matching this glob '
+    'pattern such as "*/package.json" or "META-INF/**".',
+)
+@click.option(
+    '--exclude',
+    default=[],
+    multiple=True,
+    help='Do not extract the archive entries with a path matching this glob '
+    'pattern.',
+)
+@click.option(
+    '--list',
+    'list_only',
+    is_flag=True,
+    help='List the entries of the archives without extracting them. '
+    'Nested archives in archives are not listed.',
+)
+@click.option(
+    '--jobs',
+    type=int,
+    default=1,
+    help='Extract archives in parallel using this number of processes. '
+    'The default is to extract archives one at a time in a single process.',
+)
+@click.option(
+    '--cache-dir',
+    type=click.Path(file_okay=False, writable=True, resolve_path=True),
+    help='Cache extracted archives in this directory and reuse the cached '
+    'extraction of identical archives rather than extracting them again. '
+    'The files reused from the cache are read-only hardlinks to the cached '
+    'files, while the other extracted files are writable.',
+)
+@click.option(
+    '--resume',
+    is_flag=True,
+    help='Record the completed extractions in a journal file and skip the '
+    'archives already extracted by a previous interrupted run. Other archives '
+    'are extracted again from scratch.',
+)
+@click.option(
+    '--journal',
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+    help='Use this journal file with --resume. The default is a '
+    '"<input>.extractcode-journal" file created side-by-side with the <input>.',
+)
+@click.option(
+    '--incremental',
+    is_flag=True,
+    help='Only extract the archives that are new or modified since a previous '
+    'incremental run and remove the extracted directories of deleted '
+    'archives. The state of the extracted archives is stored in a '
+    '"<input>.extractcode-manifests" directory created side-by-side with the '
+    '<input>. Takes precedence over --resume.',
+)
 
 @click.option(
     '--all-formats',
@@ -184,6 +244,14 @@ def extractcode(
     shallow,
     replace_originals,
     ignore,
+    include,
+    exclude,
+    list_only,
+    jobs,
+    cache_dir,
+    resume,
+    journal,
+    incremental,
     all_formats,
     *args,
     **kwargs,
@@ -271,15 +339,38 @@ def extractcode(
         if has_errors:
             summary_color = 'red'
 
+        if cache_dir:
+            hits = cache_lookups[True]
+            misses = cache_lookups[False]
+            echo_stderr(f'Extraction cache: {hits} hits, {misses} misses.')
+
         echo_stderr('Extracting done.', fg=summary_color, reset=True)
 
     # use for relative paths computation
     len_base_path = len(abs_location)
     base_is_dir = filetype.is_dir(abs_location)
 
+    if list_only:
+        has_list_errors = list_archives(
+            abs_location,
+            ignore_pattern=ignore,
+            all_formats=all_formats,
+            len_base_path=len_base_path,
+            base_is_dir=base_is_dir,
+        )
+        ctx.exit(1 if has_list_errors else 0)
+
     extract_result_with_errors = []
     unique_extract_events_with_errors = set()
     has_extract_errors = False
+    # {cached flag: count} of the extraction cache hits and misses
+    cache_lookups = Counter()
+
+    if resume:
+        from extractcode.journal import get_journal_location
+        journal = journal or get_journal_location(abs_location)
+    else:
+        journal = None
 
     extractibles = extract_archives(
         abs_location,
@@ -287,6 +378,12 @@ def extractcode(
         replace_originals=replace_originals,
         ignore_pattern=ignore,
         all_formats=all_formats,
+        jobs=jobs,
+        cache_dir=cache_dir,
+        include=include,
+        exclude=exclude,
+        journal=journal,
+        incremental=incremental,
     )
 
     if not quiet:
@@ -299,6 +396,8 @@ def extractcode(
         ) as extraction_events:
 
             for xev in extraction_events:
+                if xev.done:
+                    cache_lookups[xev.cached] += 1
                 if xev.done and (xev.warnings or xev.errors):
                     has_extract_errors = has_extract_errors or xev.errors
                     if repr(xev) not in unique_extract_events_with_errors:
@@ -316,6 +415,44 @@ def extractcode(
     ctx.exit(rc)
 
 
+def list_archives(location, ignore_pattern, all_formats, len_base_path, base_is_dir):
+    """
+    Print the entries of the archives found at ``location`` file or directory
+    tree skipping files matching the ``ignore_pattern`` list of glob patterns.
+    Return True if there were errors.
+    """
+    from extractcode import all_kinds
+    from extractcode import default_kinds
+    from extractcode.archive import should_extract
+
+    kinds = all_kinds if all_formats else default_kinds
+
+    if base_is_dir:
+        locations = fileutils.resource_iter(location, with_dirs=False)
+    else:
+        locations = [location]
+
+    has_errors = False
+    for loc in sorted(locations):
+        if not should_extract(loc, kinds=kinds, ignore_pattern=ignore_pattern):
+            continue
+        source = get_relative_path(
+            path=fileutils.as_posixpath(loc),
+            len_base_path=len_base_path,
+            base_is_dir=base_is_dir,
+        )
+        click.echo(f'{source}:')
+        try:
+            for entry in list_archive(loc, all_formats=all_formats):
+                size = '-' if entry.size is None else entry.size
+                click.echo(f'{size:>12} {entry.path}')
+        except Exception as e:
+            has_errors = True
+            echo_stderr(f'ERROR listing: {source}: {e}', fg='red')
+
+    return has_errors
+
+
 def get_relative_path(path, len_base_path, base_is_dir):
     """
     Return a posix relative path from the posix 'path' relative to a base path
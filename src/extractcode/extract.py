@@ -8,15 +8,21 @@
 #
 
 import logging
+import os
+import re
+import stat
 import traceback
+import uuid
 
 from collections import namedtuple
 from functools import partial
 from os.path import abspath
+from os.path import dirname
 from os.path import expanduser
 from os.path import join
 
 from commoncode import fileutils
+from commoncode import filetype
 from commoncode import ignore
 
 import extractcode  # NOQA
@@ -76,8 +82,19 @@ An ExtractEvent contains data about an archive extraction progress:
  - `done` is a boolean set to True when the extraction is done (even if failed).
  - `warnings` is a mapping of extracted paths to a list of warning messages.
  - `errors` is a list of error messages.
+ - `cached` is True if the extracted files were reused from the extraction
+   cache, False if the archive was extracted and cached, or None if no cache is
+   used. This is set only when the extraction is done.
 """
-ExtractEvent = namedtuple('ExtractEvent', 'source target done warnings errors')
+ExtractEvent = namedtuple(
+    'ExtractEvent',
+    'source target done warnings errors cached',
+    defaults=(None,),
+)
+
+# number of extractions submitted to each worker process of a parallel
+# extraction and not yet done: the other candidates wait in the main process
+IN_FLIGHT_PER_JOB = 2
 
 
 def extract(
@@ -86,6 +103,13 @@ def extract(
     recurse=False,
     replace_originals=False,
     ignore_pattern=(),
+    jobs=None,
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    journal=None,
+    incremental=False,
+    executor=None,
 ):
     """
     Walk and extract any archives found at ``location`` (either a file or
@@ -111,16 +135,53 @@ def extract(
 
     ``ignore_pattern`` is a list of glob patterns to ignore.
 
+    If ``jobs`` is an integer greater than one, extract independent archives
+    concurrently using a pool of ``jobs`` processes.
+
+    If ``cache_dir`` is provided, cache the extracted archives in this directory
+    and reuse cached extractions of identical archives. See extractcode.cache.
+
+    If ``include`` or ``exclude`` lists of glob patterns are provided, only
+    extract the archive entries selected by these patterns. See
+    extractcode.is_selected for details.
+
+    If ``journal`` is the location of a journal file, record the completed
+    extractions in this file and resume an interrupted extraction: skip the
+    archives journaled as completely extracted and extract again from scratch
+    any other archive. A single done ExtractEvent is emitted for a skipped
+    archive. See extractcode.journal for details.
+
+    If ``incremental`` is True, store the state of each extracted archive in a
+    manifest file and skip the archives unchanged since their last extraction:
+    only new or modified archives are extracted again and the targets of
+    deleted archives are removed. The manifests are stored in a directory
+    side-by-side with ``location``. See journal.get_manifests_location. This
+    replaces any ``journal``.
+
+    If an ``executor`` ProcessPoolExecutor is provided, extract independent
+    archives concurrently using this executor rather than a new pool of
+    ``jobs`` processes. See extract_async for details.
+
     Note that while the original filesystem is walked top-down, breadth-first,
     if ``recurse`` and a nested archive is found, it is extracted first
     recursively and at full depth-first before resuming the filesystem walk.
     """
+    if incremental:
+        from extractcode.journal import get_manifests_location
+        from extractcode.journal import ManifestJournal
+        journal = ManifestJournal(get_manifests_location(location))
 
     extract_events = extract_files(
         location=location,
         kinds=kinds,
         recurse=recurse,
         ignore_pattern=ignore_pattern,
+        jobs=jobs,
+        cache_dir=cache_dir,
+        include=include,
+        exclude=exclude,
+        journal=journal,
+        executor=executor,
     )
 
     processed_events = []
@@ -142,8 +203,120 @@ def extract(
                         f'{source!r} by {target!r}'
                     )
                 fileutils.delete(source)
-                fileutils.copytree(target, source)
-                fileutils.delete(target)
+                extractcode.move_tree(target, source)
+                if incremental:
+                    journal.delete(target)
+
+    if incremental:
+        # forget the targets removed since the last run
+        journal.prune()
+
+
+async def extract_async(location, jobs=None, **kwargs):
+    """
+    Walk and extract any archives found at ``location`` and yield ExtractEvent
+    as an asynchronous iterator. See ``extract`` for the other arguments.
+
+    The archives are extracted with the same scheduler as a parallel
+    extraction using a pool of ``jobs`` worker processes (one by default)
+    driven from a thread, such that the event loop is never blocked. Each
+    worker is the leader of its own process group that also contains the
+    7z or guestfish processes that it runs.
+
+    If the iteration is cancelled or stopped early, the worker processes and
+    their children are killed and the staging directories of the interrupted
+    extractions are deleted.
+    """
+    import asyncio
+    import threading
+    from concurrent.futures import ProcessPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+    end = object()
+    executor = ProcessPoolExecutor(
+        max_workers=max(jobs or 1, 1),
+        initializer=set_process_group,
+    )
+
+    def produce():
+        try:
+            for xevent in extract(
+                location=location,
+                jobs=jobs,
+                executor=executor,
+                **kwargs,
+            ):
+                if stopped.is_set():
+                    # kill the workers before closing the extraction, such
+                    # that no worker writes to the staging directories that
+                    # are then deleted
+                    kill_workers(executor)
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, xevent)
+        except BaseException as e:
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, end)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is end:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    finally:
+        if not producer.done():
+            stopped.set()
+            kill_workers(executor)
+        try:
+            await asyncio.shield(producer)
+        except Exception:
+            pass
+        executor.shutdown(wait=False)
+
+
+def set_process_group():
+    """
+    Make the current worker process the leader of a new process group such
+    that it can be killed with its own child processes.
+    """
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+
+
+# maximum time in seconds to wait for a killed worker process to exit
+KILL_TIMEOUT = 5
+
+
+def kill_workers(executor):
+    """
+    Kill the worker processes of a ProcessPoolExecutor ``executor`` and their
+    process groups and wait for the worker processes to exit.
+    """
+    import signal
+    # note: there is no public API to access the worker processes
+    processes = getattr(executor, '_processes', None) or {}
+    for process in list(processes.values()):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, AttributeError):
+            # not a process group leader yet, or not on POSIX
+            try:
+                process.kill()
+            except OSError:
+                # the process is already gone
+                pass
+
+    for process in list(processes.values()):
+        process.join(KILL_TIMEOUT)
 
 
 def extract_files(
@@ -151,6 +324,12 @@ def extract_files(
     kinds=extractcode.default_kinds,
     recurse=False,
     ignore_pattern=(),
+    jobs=None,
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    journal=None,
+    executor=None,
 ):
     """
     Extract the files found at `location`.
@@ -164,7 +343,41 @@ def extract_files(
     extracted archive identified by the corresponding extract suffix location.
 
     ``ignore_pattern`` is a list of glob patterns to ignore.
+
+    If ``jobs`` is an integer greater than one, extract independent archives
+    concurrently using a pool of ``jobs`` processes.
+
+    If ``cache_dir`` is provided, cache the extracted archives in this directory
+    and reuse cached extractions of identical archives.
+
+    If ``include`` or ``exclude`` lists of glob patterns are provided, only
+    extract the archive entries selected by these patterns.
+
+    ``journal`` is either the location of a journal file or a Journal used to
+    record completed extractions and skip them when resuming.
+
+    If an ``executor`` ProcessPoolExecutor is provided, extract archives
+    concurrently using this executor rather than a new pool of ``jobs``
+    processes.
     """
+    journal = get_journal(journal)
+
+    if executor or (jobs and jobs > 1):
+        for xevent in extract_files_parallel(
+            location=location,
+            kinds=kinds,
+            recurse=recurse,
+            ignore_pattern=ignore_pattern,
+            jobs=jobs,
+            cache_dir=cache_dir,
+            include=include,
+            exclude=exclude,
+            journal=journal,
+            executor=executor,
+        ):
+            yield xevent
+        return
+
     ignored = partial(ignore.is_ignored, ignores=ignore.default_ignores, unignores={})
     if TRACE:
         logger.debug('extract:start: %(location)r recurse: %(recurse)r\n' % locals())
@@ -175,16 +388,20 @@ def extract_files(
             logger.debug(
                 'extract:walk: top: %(top)r dirs: %(dirs)r files: r(files)r' % locals())
 
-        if not recurse:
+        # when resuming, the existing extraction directories are walked only
+        # once their archive is extracted again or skipped as journaled
+        if not recurse or journal:
             if TRACE:
                 drs = set(dirs)
-            for d in dirs[:]:
-                if extractcode.is_extraction_path(d):
-                    dirs.remove(d)
+            prune_extracted_dirs(top, dirs, journal)
             if TRACE:
                 rd = repr(drs.symmetric_difference(set(dirs)))
                 logger.debug(f'extract:walk: not recurse: removed dirs: {rd}')
 
+        # when resuming, the staging directories are deleted when their
+        # archive is extracted again
+        prune_staging_dirs(top, dirs, delete=not journal)
+
         for f in files:
             loc = join(top, f)
             if not recurse and extractcode.is_extraction_path(loc):
@@ -207,35 +424,319 @@ def extract_files(
             if TRACE:
                 logger.debug('extract:target: %(target)r' % locals())
 
-            # extract proper
-            for xevent in extract_file(
-                location=loc,
-                target=target,
-                kinds=kinds,
-            ):
+            journaled = journal and get_journaled_event(journal, loc, target)
+            if journaled:
+                if TRACE:
+                    logger.debug('extract:walk: skipped journaled: %(loc)r' % locals())
+                yield journaled
+                xevents = []
+            else:
+                # extract proper
+                xevents = extract_file(
+                    location=loc,
+                    target=target,
+                    kinds=kinds,
+                    cache_dir=cache_dir,
+                    include=include,
+                    exclude=exclude,
+                    clean=bool(journal),
+                )
+
+            for xevent in xevents:
                 if TRACE:
                     logger.debug('extract:walk:extraction event: %(xevent)r' % locals())
+                if journal:
+                    record_event(journal, xevent)
                 yield xevent
 
             if recurse:
                 if TRACE:
                     logger.debug('extract:walk: recursing on target: %(target)r' % locals())
-                for xevent in extract(
+                for xevent in extract_files(
                     location=target,
                     kinds=kinds,
                     recurse=recurse,
                     ignore_pattern=ignore_pattern,
+                    cache_dir=cache_dir,
+                    include=include,
+                    exclude=exclude,
+                    journal=journal,
                 ):
                     if TRACE:
                         logger.debug('extract:walk:recurse:extraction event: %(xevent)r' % locals())
                     yield xevent
 
 
+def extract_files_parallel(
+    location,
+    kinds=extractcode.default_kinds,
+    recurse=False,
+    ignore_pattern=(),
+    jobs=2,
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    journal=None,
+    executor=None,
+):
+    """
+    Extract the files found at `location` using a pool of `jobs` processes.
+    See `extract_files` for the meaning of the other arguments.
+
+    The filesystem is walked to find the candidate files that could be archives
+    based on a cheap check of their extension and signature: the other files
+    are never sent to a worker. Each candidate is then checked and extracted in
+    a worker process. The same ExtractEvent start and done pairs are yielded as
+    for a serial extraction, but in the order in which the archives are done
+    rather than in walk order.
+
+    At most a few candidates per worker are submitted at any time, starting
+    while the filesystem is still walked. The other candidates wait in this
+    process and are submitted ordered by decreasing estimated extraction cost,
+    largest first, such that a large or slow archive does not run alone at the
+    end of the extraction. See archive.get_extraction_cost.
+
+    If `recurse` is True, the target of each extracted archive is walked in
+    turn and its candidate files are added to the same waiting candidates, such
+    that any idle worker can pick them: a large nested archive does not block
+    the extraction of other archives until its whole subtree is done.
+
+    If a `journal` is provided, the journaled archives are skipped rather than
+    submitted and the completed extractions are recorded by this process.
+
+    If an `executor` ProcessPoolExecutor is provided, use it rather than a new
+    pool of `jobs` processes. It is not shut down when done.
+    """
+    import heapq
+    from collections import deque
+    from concurrent.futures import FIRST_COMPLETED
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures import wait
+    from contextlib import nullcontext
+    from itertools import count
+
+    if executor:
+        pool = nullcontext(executor)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+
+    # maximum number of submitted extractions not yet done
+    max_in_flight = max(jobs or 1, 1) * IN_FLIGHT_PER_JOB
+
+    # {future: location} of the submitted extractions not yet done
+    in_flight = {}
+    try:
+        with pool as executor:
+            submit = partial(
+                executor.submit,
+                extract_candidate,
+                kinds=kinds,
+                ignore_pattern=ignore_pattern,
+                cache_dir=cache_dir,
+                include=include,
+                exclude=exclude,
+                clean=bool(journal),
+            )
+            walk = partial(get_candidates, recurse=recurse, journal=journal)
+            # iterators of candidate locations of the directories being walked
+            walks = deque([walk(location)])
+            pending = set()
+            skipped = []
+            # heap of (negated cost, sequence, location) of the candidates
+            # waiting to be submitted: the sequence keeps the walk order for
+            # equal costs
+            waiting = []
+            sequence = count()
+
+            def walk_next():
+                """
+                Add the next candidate found in the walks to the waiting or
+                skipped candidates. Return False if all the walks are done.
+                """
+                while walks:
+                    loc = next(walks[0], None)
+                    if loc is None:
+                        walks.popleft()
+                        continue
+                    journaled = journal and get_journaled_event(journal, loc)
+                    if journaled:
+                        skipped.append(journaled)
+                    else:
+                        cost = extractcode.archive.get_extraction_cost(loc)
+                        heapq.heappush(waiting, (-cost, next(sequence), loc))
+                    return True
+                return False
+
+            def submit_waiting():
+                while waiting and len(pending) < max_in_flight:
+                    _cost, _seq, loc = heapq.heappop(waiting)
+                    future = submit(loc)
+                    in_flight[future] = loc
+                    pending.add(future)
+
+            while True:
+                while skipped:
+                    xevent = skipped.pop()
+                    yield xevent
+                    if recurse:
+                        walks.append(walk(xevent.target))
+
+                walking = walk_next()
+                submit_waiting()
+                if not pending:
+                    if walking or skipped:
+                        continue
+                    break
+
+                if walking:
+                    # collect the done extractions without waiting, then
+                    # continue the walk
+                    done, pending = wait(pending, timeout=0)
+                else:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    xevents = future.result()
+                    del in_flight[future]
+                    for xevent in xevents:
+                        if journal:
+                            record_event(journal, xevent)
+                        yield xevent
+
+                    if not recurse:
+                        continue
+
+                    for xevent in xevents:
+                        if not xevent.done:
+                            continue
+                        if TRACE:
+                            logger.debug(
+                                f'extract_files_parallel: nested: {xevent.target}')
+                        walks.append(walk(xevent.target))
+
+    finally:
+        # the extractions were interrupted, such as when the worker processes
+        # are killed or when this generator is closed as an asynchronous
+        # extraction is cancelled: delete their staging directories
+        for loc in in_flight.values():
+            delete_staging_dirs(extractcode.get_extraction_path(abspath(loc)))
+
+
+def get_candidates(location, recurse=False, journal=None):
+    """
+    Yield the locations of the files found at `location` that are candidates
+    for extraction: the files that could be archives based on a cheap check of
+    their extension and signature. See archive.is_plausible_archive.
+    If `recurse` is false, skip any already extracted archive identified by the
+    corresponding extract suffix location.
+
+    If a `journal` is provided, do not walk the existing extraction
+    directories: they are walked when their archive is extracted or skipped.
+    """
+    ignored = partial(ignore.is_ignored, ignores=ignore.default_ignores, unignores={})
+    abs_location = abspath(expanduser(location))
+    for top, dirs, files in fileutils.walk(abs_location, ignored):
+        if not recurse or journal:
+            prune_extracted_dirs(top, dirs, journal)
+        prune_staging_dirs(top, dirs, delete=not journal)
+
+        for f in files:
+            loc = join(top, f)
+            if not recurse and extractcode.is_extraction_path(loc):
+                continue
+            if not filetype.is_file(loc):
+                continue
+            if not extractcode.archive.is_plausible_archive(loc):
+                continue
+            yield loc
+
+
+def prune_extracted_dirs(top, dirs, journal=None):
+    """
+    Remove the extraction directories from the ``dirs`` list of the names of
+    the sub-directories of ``top`` such that they are not walked. If a
+    ``journal`` is provided, also delete the stale extraction directories of
+    archives that do not exist anymore.
+    """
+    for d in dirs[:]:
+        if not extractcode.is_extraction_path(d):
+            continue
+        dirs.remove(d)
+        if journal:
+            target = join(abspath(top), d)
+            if journal.is_stale(target):
+                if TRACE:
+                    logger.debug(f'prune_extracted_dirs: deleting stale: {target}')
+                fileutils.delete(target)
+                journal.delete(target)
+
+
+def prune_staging_dirs(top, dirs, delete=True):
+    """
+    Remove the staging directories from the ``dirs`` list of the names of the
+    sub-directories of ``top`` such that they are not walked: a staging
+    directory found when walking is left over by an interrupted extraction.
+    Also delete these directories if ``delete`` is True.
+
+    Note that the staging directories of the current extraction are never
+    found when walking: they are created side-by-side with an archive once the
+    directory of this archive has been walked.
+    """
+    for d in dirs[:]:
+        if not is_staging_dir(d):
+            continue
+        dirs.remove(d)
+        if delete:
+            staging = join(abspath(top), d)
+            if TRACE:
+                logger.debug(f'prune_staging_dirs: deleting: {staging}')
+            fileutils.delete(staging)
+
+
+def extract_candidate(
+    location,
+    kinds=extractcode.default_kinds,
+    ignore_pattern=(),
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    clean=False,
+):
+    """
+    Extract the file at `location` if it should be extracted and return a list
+    of ExtractEvent. Does not extract recursively.
+
+    This is the unit of work executed by a worker process for a parallel
+    extraction.
+    """
+    if not extractcode.archive.should_extract(
+        location=location,
+        kinds=kinds,
+        ignore_pattern=ignore_pattern,
+    ):
+        return []
+
+    target = extractcode.get_extraction_path(abspath(location))
+    return list(extract_file(
+        location=location,
+        target=target,
+        kinds=kinds,
+        cache_dir=cache_dir,
+        include=include,
+        exclude=exclude,
+        clean=clean,
+    ))
+
+
 def extract_file(
     location,
     target,
     kinds=extractcode.default_kinds,
     verbose=False,
+    cache_dir=None,
+    include=(),
+    exclude=(),
+    clean=False,
     *args,
     **kwargs,
 ):
@@ -243,12 +744,25 @@ def extract_file(
     Extract a single archive file at ``location`` to the ``target`` directory if
     this file is of a kind supported in the ``kinds`` kind tuple. Yield
     ExtractEvents. Does not extract recursively.
+
+    If ``cache_dir`` is provided, reuse the extracted tree cached in this
+    directory for an identical archive if any, or cache the extracted tree.
+    Only complete extractions are cached: the cache is not used if ``include``
+    or ``exclude`` lists of glob patterns are provided to extract only some
+    archive entries.
+
+    If ``clean`` is True, delete any existing ``target`` directory and any
+    staging directory left over by an interrupted extraction first, such that
+    the archive is extracted again from scratch.
     """
     warnings = []
     errors = []
+    cached = None
     extractor = extractcode.archive.get_extractor(
         location=location,
         kinds=kinds,
+        include=include,
+        exclude=exclude,
     )
 
     if TRACE:
@@ -268,15 +782,34 @@ def extract_file(
             errors=[],
         )
 
+        staging = None
         try:
-            # Extract first to a temp directory: if there is an error, the
-            # extracted files will not be moved to the target.
-            tmp_tgt = fileutils.get_temp_dir(prefix='extractcode-extract-')
+            # Extract first to a staging directory on the same filesystem as
+            # the target: if there is an error, the extracted files will not
+            # be moved to the target. Otherwise the staging directory is
+            # renamed to the target such that files are written only once.
+            if clean:
+                clean_target(target)
+            staging = get_staging_dir(target)
             abs_location = abspath(expanduser(location))
-            warns = extractor(abs_location, tmp_tgt) or []
+
+            cache = cache_key = warns = None
+            if cache_dir and not (include or exclude):
+                from extractcode import cache as extract_cache
+                cache = extract_cache.get_cache(cache_dir)
+                handler = extractcode.archive.get_best_handler(abs_location, kinds)
+                cache_key = extract_cache.get_cache_key(abs_location, handler.name)
+                warns = cache.get(cache_key, staging)
+                cached = warns is not None
+
+            if warns is None:
+                warns = extractor(abs_location, staging) or []
+                normalize_tree(staging)
+                if cache:
+                    cache.put(cache_key, staging, warns)
+
             warnings.extend(warns)
-            fileutils.copytree(tmp_tgt, target)
-            fileutils.delete(tmp_tgt)
+            extractcode.move_tree(staging, target)
 
         except Exception as e:
             errors = [str(e).strip(' \'"')]
@@ -288,10 +821,131 @@ def extract_file(
                     f'extract_file: ERROR: {location}: {errors}\n{e}\n{tb}')
 
         finally:
+            if staging:
+                fileutils.delete(staging)
             yield ExtractEvent(
                 source=location,
                 target=target,
                 done=True,
                 warnings=warnings,
                 errors=errors,
+                cached=cached,
             )
+
+
+def get_journal(journal):
+    """
+    Return a Journal for a ``journal`` file location, or return ``journal``
+    as-is if this is already a Journal or None.
+    """
+    if not isinstance(journal, str):
+        return journal
+    from extractcode.journal import Journal
+    return Journal(journal)
+
+
+def get_journaled_event(journal, location, target=None):
+    """
+    Return a done ExtractEvent for the archive at ``location`` if its extraction
+    to ``target`` is journaled as complete in ``journal``. Return None otherwise.
+    """
+    location = abspath(location)
+    if not target:
+        target = extractcode.get_extraction_path(location)
+    warnings = journal.get(location, abspath(target))
+    if warnings is None:
+        return
+    return ExtractEvent(
+        source=location,
+        target=target,
+        done=True,
+        warnings=warnings,
+        errors=[],
+    )
+
+
+def record_event(journal, xevent):
+    """
+    Record the ``xevent`` ExtractEvent in the ``journal`` if this is the event
+    of a complete extraction without errors.
+    """
+    if xevent.done and not xevent.errors:
+        journal.put(
+            source=abspath(xevent.source),
+            target=abspath(xevent.target),
+            warnings=xevent.warnings,
+        )
+
+
+def clean_target(target):
+    """
+    Delete the ``target`` directory and its leftover staging directories if any.
+    """
+    delete_staging_dirs(target)
+    abs_target = abspath(expanduser(target))
+    if os.path.lexists(abs_target):
+        fileutils.delete(abs_target)
+
+
+# number of random hex digits at the end of the name of a staging directory
+STAGING_ID_SIZE = 12
+
+# name of a staging directory: ".<target name>-staging-<random hex>"
+is_staging_dir = re.compile(
+    r'^\..+' + re.escape(extractcode.EXTRACT_SUFFIX)
+    + r'-staging-[0-9a-f]{%d}$' % STAGING_ID_SIZE
+).match
+
+
+def delete_staging_dirs(target):
+    """
+    Delete the staging directories of the ``target`` directory if any.
+    """
+    abs_target = abspath(expanduser(target)).rstrip('\\/')
+    parent = dirname(abs_target)
+    if not os.path.isdir(parent):
+        return
+    prefix = '.' + fileutils.file_name(abs_target) + '-staging-'
+    for name in os.listdir(parent):
+        if name.startswith(prefix):
+            fileutils.delete(join(parent, name))
+
+
+def get_staging_dir(target):
+    """
+    Return a new empty staging directory created side-by-side with the
+    ``target`` directory such that they are on the same filesystem.
+    """
+    abs_target = abspath(expanduser(target)).rstrip('\\/')
+    parent = dirname(abs_target)
+    fileutils.create_dir(parent)
+    prefix = '.' + fileutils.file_name(abs_target) + '-staging-'
+    while True:
+        # note: we use mkdir rather than a mkdtemp such that the staging
+        # directory is created with the default permissions of a target
+        staging = join(parent, prefix + uuid.uuid4().hex[:STAGING_ID_SIZE])
+        try:
+            os.mkdir(staging)
+            return staging
+        except FileExistsError:
+            continue
+
+
+def normalize_tree(location):
+    """
+    Prepare the extracted tree at ``location`` to be moved to its target: make
+    files and directories readable and writable by the user and remove symlinks
+    and special files. This is what copying the tree would otherwise do.
+    """
+    for entry in os.scandir(location):
+        if entry.is_dir(follow_symlinks=False):
+            mode = stat.S_IMODE(entry.stat(follow_symlinks=False).st_mode)
+            if mode & fileutils.RWX != fileutils.RWX:
+                os.chmod(entry.path, mode | fileutils.RWX)
+            normalize_tree(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            mode = stat.S_IMODE(entry.stat(follow_symlinks=False).st_mode)
+            if mode & fileutils.RW != fileutils.RW:
+                os.chmod(entry.path, mode | fileutils.RW)
+        else:
+            os.remove(entry.path)
@@ -0,0 +1,286 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/extractcode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import hashlib
+import json
+import logging
+import os
+
+from os.path import abspath
+from os.path import expanduser
+
+import attr
+
+from commoncode import fileutils
+
+logger = logging.getLogger(__name__)
+TRACE = False
+
+if TRACE:
+    import sys
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+"""
+An append-only journal of completed extractions used to resume an interrupted
+extraction.
+
+Each line of a journal file is a JSON object for an archive that was extracted
+successfully: its source and target locations, a fingerprint of the source
+archive file and the list of extraction warnings. A line is appended only once
+the extracted tree has been moved to its target, such that a journaled target
+is always complete.
+
+When resuming, an archive is skipped if it is journaled with the same
+fingerprint and its target directory exists. Any other archive is extracted
+again from scratch. A truncated last line left by a killed process is ignored.
+
+For incremental extractions, a ManifestJournal stores instead the state of each
+archive in a manifest file: the archive size, modification time and SHA256.
+Unchanged archives are skipped and only new or modified archives are extracted
+again. The manifest files are stored in a directory side-by-side with the
+extracted location rather than in the extracted tree.
+"""
+
+# suffix added to the input location to name its default journal file
+JOURNAL_SUFFIX = '.extractcode-journal'
+
+# suffix added to the input location to name its manifests directory
+MANIFESTS_SUFFIX = '.extractcode-manifests'
+
+
+def get_journal_location(location):
+    """
+    Return the default journal file location for an extraction of the
+    `location` file or directory: a file side-by-side with `location`.
+    """
+    abs_location = abspath(expanduser(location)).rstrip('\\/')
+    return abs_location + JOURNAL_SUFFIX
+
+
+def get_fingerprint(location):
+    """
+    Return a fingerprint string for the file at `location` based on its size
+    and modification time. This is cheap to compute even for large archives.
+    """
+    st = os.stat(location)
+    return f'{st.st_size}:{st.st_mtime_ns}'
+
+
+@attr.s
+class Journal(object):
+    """
+    An extraction journal stored in the `location` file. The `entries` mapping
+    of {target: journal entry} is loaded from this file on creation.
+    """
+    location = attr.ib()
+    entries = attr.ib(default=attr.Factory(dict))
+
+    def __attrs_post_init__(self, *args, **kwargs):
+        self.location = abspath(expanduser(self.location))
+        self.load()
+
+    def load(self):
+        """
+        Load the entries of the journal file, if it exists.
+        """
+        if not os.path.exists(self.location):
+            return
+        with open(self.location) as inp:
+            for line in inp:
+                try:
+                    entry = json.loads(line)
+                    self.entries[entry['target']] = entry
+                except (ValueError, KeyError, TypeError):
+                    # an incomplete line written by a killed process
+                    if TRACE:
+                        logger.debug(f'Journal.load: skipped: {line!r}')
+
+    def get(self, source, target):
+        """
+        Return a list of the warnings of the journaled extraction of the
+        `source` archive to the `target` directory. Return None if this
+        extraction is not journaled as complete or is stale.
+        """
+        entry = self.entries.get(target)
+        if not entry or entry.get('source') != source:
+            return
+        try:
+            if entry.get('fingerprint') != get_fingerprint(source):
+                return
+        except OSError:
+            return
+        if not os.path.isdir(target):
+            return
+        return entry.get('warnings') or []
+
+    def is_stale(self, target):
+        """
+        Return True if the `target` directory was journaled for an archive that
+        does not exist anymore.
+        """
+        entry = self.entries.get(target)
+        return bool(entry) and not os.path.exists(entry.get('source') or '')
+
+    def put(self, source, target, warnings=()):
+        """
+        Append an entry for the completed extraction of the `source` archive
+        to the `target` directory with a list of `warnings`.
+        """
+        entry = dict(
+            source=source,
+            target=target,
+            fingerprint=get_fingerprint(source),
+            warnings=list(warnings),
+        )
+        fileutils.create_dir(os.path.dirname(self.location))
+        with open(self.location, 'a') as out:
+            out.write(json.dumps(entry) + '\n')
+        self.entries[target] = entry
+
+    def delete(self, target):
+        """
+        Forget the `target` directory.
+        """
+        self.entries.pop(target, None)
+
+
+def get_manifests_location(location):
+    """
+    Return the default manifests directory location for an incremental
+    extraction of the `location` file or directory: a directory side-by-side
+    with `location`.
+    """
+    abs_location = abspath(expanduser(location)).rstrip('\\/')
+    return abs_location + MANIFESTS_SUFFIX
+
+
+@attr.s
+class ManifestJournal(object):
+    """
+    An extraction journal stored as one manifest file per extracted archive in
+    the `location` directory, used for incremental extractions.
+
+    An archive is unchanged if its size and modification time are the same as
+    in its manifest, or if only its modification time changed but its content
+    SHA256 is the same, such as for a mirrored archive downloaded again.
+    """
+    location = attr.ib()
+
+    def __attrs_post_init__(self, *args, **kwargs):
+        self.location = abspath(expanduser(self.location))
+
+    def get_manifest_location(self, target):
+        """
+        Return the location of the manifest file of the `target` extraction
+        directory, named after the SHA256 of the `target` path.
+        """
+        name = hashlib.sha256(os.fsencode(target)).hexdigest()
+        return os.path.join(self.location, name + '.json')
+
+    def read(self, target):
+        """
+        Return the manifest mapping of the `target` directory or None.
+        """
+        try:
+            with open(self.get_manifest_location(target)) as inp:
+                return json.load(inp)
+        except (OSError, ValueError):
+            return
+
+    def get(self, source, target):
+        """
+        Return a list of the warnings of the extraction of the `source` archive
+        to the `target` directory if this archive is unchanged since it was
+        extracted. Return None otherwise.
+        """
+        manifest = self.read(target)
+        if not manifest or manifest.get('source') != source:
+            return
+        if manifest.get('target') != target or not os.path.isdir(target):
+            return
+
+        try:
+            st = os.stat(source)
+            if st.st_size != manifest.get('size'):
+                return
+            if st.st_mtime_ns != manifest.get('mtime_ns'):
+                from extractcode.cache import get_sha256
+                if get_sha256(source) != manifest.get('sha256'):
+                    return
+                # the same content with a new modification time
+                manifest['mtime_ns'] = st.st_mtime_ns
+                self.write(target, manifest)
+        except OSError:
+            return
+        return manifest.get('warnings') or []
+
+    def is_stale(self, target):
+        """
+        Return True if the `target` directory has a manifest for an archive
+        that does not exist anymore.
+        """
+        manifest = self.read(target)
+        return bool(manifest) and not os.path.exists(manifest.get('source') or '')
+
+    def put(self, source, target, warnings=()):
+        """
+        Write the manifest of the completed extraction of the `source` archive
+        to the `target` directory with a list of `warnings`.
+        """
+        from extractcode.cache import get_sha256
+        st = os.stat(source)
+        manifest = dict(
+            source=source,
+            target=target,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            sha256=get_sha256(source),
+            warnings=list(warnings),
+        )
+        self.write(target, manifest)
+
+    def write(self, target, manifest):
+        """
+        Write the `manifest` mapping of the `target` directory.
+        """
+        manifest_loc = self.get_manifest_location(target)
+        fileutils.create_dir(self.location)
+        # write aside and rename such that a manifest is never partial
+        tmp_loc = manifest_loc + '.tmp'
+        with open(tmp_loc, 'w') as out:
+            json.dump(manifest, out)
+        os.replace(tmp_loc, manifest_loc)
+
+    def delete(self, target):
+        """
+        Delete the manifest of the `target` directory if any.
+        """
+        manifest_loc = self.get_manifest_location(target)
+        if os.path.exists(manifest_loc):
+            os.remove(manifest_loc)
+
+    def prune(self):
+        """
+        Delete the manifests of the target directories that do not exist
+        anymore, such as a target removed or replaced by its extracted content.
+        """
+        if not os.path.isdir(self.location):
+            return
+        for name in os.listdir(self.location):
+            manifest_loc = os.path.join(self.location, name)
+            try:
+                with open(manifest_loc) as inp:
+                    target = json.load(inp).get('target')
+            except (OSError, ValueError, AttributeError):
+                target = None
+            if not target or not os.path.isdir(target):
+                if TRACE:
+                    logger.debug(f'ManifestJournal.prune: {manifest_loc}')
+                fileutils.delete(manifest_loc)
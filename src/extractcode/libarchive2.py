@@ -15,12 +15,14 @@ import os
 import warnings
 
 import ctypes.util
+from ctypes import addressof
+from ctypes import byref
+from ctypes import c_char
 from ctypes import c_char_p, c_wchar_p
 from ctypes import c_int, c_longlong
 from ctypes import c_size_t, c_ssize_t
 from ctypes import c_void_p
 from ctypes import POINTER
-from ctypes import create_string_buffer
 
 import attr
 
@@ -79,6 +81,15 @@ EXTRACTCODE_LIBARCHIVE_DLL = 'extractcode.libarchive.dll'
 
 EXTRACTCODE_LIBARCHIVE_PATH_ENVVAR = 'EXTRACTCODE_LIBARCHIVE_PATH'
 
+# Size in bytes of the write buffer used for extracted files. Blocks returned by
+# libarchive that are larger than this are written directly without buffering.
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Size in bytes of the blocks read by libarchive from an archive file opened
+# by its path. Large blocks avoid issuing a read syscall for every few KB when
+# probing formats and seeking in zip or 7z archives.
+READ_BLOCK_SIZE = 1024 * 1024
+
 _LIBRARY_NAME = 'libarchive'
 
 
@@ -146,10 +157,20 @@ locale.setlocale(locale.LC_ALL, '')
 libarchive = load_lib()
 
 
-def extract(location, target_dir, skip_symlinks=True):
+def extract(
+    location,
+    target_dir,
+    skip_symlinks=True,
+    include=(),
+    exclude=(),
+    use_mmap=False,
+):
     """
     Extract files from a libarchive-supported archive file at `location` in the
     `target_dir` directory. `skip_symlinks` by default.
+    Only extract the entries selected by the `include` and `exclude` lists of
+    glob patterns if provided. See extractcode.is_selected for details.
+    If `use_mmap` is True, read the archive from a memory map of its file.
     Return a list of warning messages if any or an empty list.
     Raise Exceptions on errors.
     """
@@ -157,11 +178,66 @@ def extract(location, target_dir, skip_symlinks=True):
     assert target_dir
     abs_location = os.path.abspath(os.path.expanduser(location))
     abs_target_dir = os.path.abspath(os.path.expanduser(target_dir))
-    warnings = []
 
     set_env_with_tz()
 
-    for entry in list_entries(abs_location):
+    return write_entries(
+        entries=list_entries(abs_location, use_mmap=use_mmap),
+        target_dir=abs_target_dir,
+        skip_symlinks=skip_symlinks,
+        include=include,
+        exclude=exclude,
+    )
+
+
+def extract_fd(fd, target_dir, skip_symlinks=True, include=(), exclude=()):
+    """
+    Extract files from a libarchive-supported archive read from the opened `fd`
+    file descriptor in the `target_dir` directory. `skip_symlinks` by default.
+    The file descriptor can be the read end of a pipe: the archive is read
+    sequentially in a single pass.
+    Only extract the entries selected by the `include` and `exclude` lists of
+    glob patterns if provided.
+    Return a list of warning messages if any or an empty list.
+    Raise Exceptions on errors.
+    """
+    assert target_dir
+    abs_target_dir = os.path.abspath(os.path.expanduser(target_dir))
+
+    set_env_with_tz()
+
+    with Archive(fd) as archive:
+        return write_entries(
+            entries=archive,
+            target_dir=abs_target_dir,
+            skip_symlinks=skip_symlinks,
+            include=include,
+            exclude=exclude,
+        )
+
+
+def write_entries(
+    entries,
+    target_dir,
+    skip_symlinks=True,
+    buffer_size=WRITE_BUFFER_SIZE,
+    include=(),
+    exclude=(),
+):
+    """
+    Write the `entries` iterable of Entry to the `target_dir` directory.
+    `skip_symlinks` by default. `buffer_size` is the size in bytes of the write
+    buffer used for each extracted file.
+    Only write the entries selected by the `include` and `exclude` lists of
+    glob patterns if provided: the data of other entries is skipped without
+    being read. `entries` must then be consumed lazily from an open Archive.
+    Return a list of warning messages if any or an empty list.
+    Raise Exceptions on errors.
+    """
+    warnings = []
+    registry = extractcode.NameRegistry()
+
+    for entry in entries:
         logger.debug('processing entry: {}'.format(entry))
         if not entry:
             continue
@@ -171,6 +247,12 @@ def extract(location, target_dir, skip_symlinks=True):
                 logger.debug('Skipping empty: {}'.format(entry))
             continue
 
+        if not extractcode.is_selected(entry.path or '', include, exclude):
+            if TRACE:
+                logger.debug('Skipping not selected: {}'.format(entry))
+            entry.skip()
+            continue
+
         if entry.warnings:
             if not entry.is_empty():
                 entry_path = entry.path
@@ -203,23 +285,67 @@ def extract(location, target_dir, skip_symlinks=True):
         if TRACE:
             logger.debug('  writing.....')
 
-        _target_path = entry.write(abs_target_dir, transform_path=partial(paths.safe_path, preserve_spaces=True))
+        _target_path = entry.write(
+            target_dir,
+            transform_path=partial(paths.safe_path, preserve_spaces=True),
+            buffer_size=buffer_size,
+            registry=registry,
+        )
 
     return warnings
 
 
-def list_entries(location):
+def uncompress_file(location, target_location, filter_code=None):
     """
-    Return an archive entries list for the archive file at `location`.
+    Uncompress a single-stream compressed file at `location` (such as a .Z
+    file) to the `target_location` file using libarchive "raw" format.
+    If `filter_code` is provided, raise an ExtractError if the file is not
+    compressed with this libarchive filter (e.g. the file is not compressed).
+    Return a list of warning messages if any or an empty list.
+    Raise Exceptions on errors.
     """
     assert location
+    assert target_location
     abs_location = os.path.abspath(os.path.expanduser(location))
-    assert os.path.isfile(abs_location)
+
+    with Archive(abs_location, extract=False) as archive:
+        for entry in archive:
+            code = get_filter_code(archive.archive_struct, 0)
+            if filter_code is not None and code != filter_code:
+                raise ExtractError(
+                    f'{location}: not compressed with the expected filter: '
+                    f'{filter_code}, but with: {code}'
+                )
+            with open(target_location, 'wb', buffering=WRITE_BUFFER_SIZE) as target:
+                entry.write_content(target)
+            return list(entry.warnings)
+
+    raise ExtractError(f'{location}: no compressed data found.')
+
+
+def list_entries(location, skip_data=False, use_mmap=False):
+    """
+    Return an archive entries list for the archive file at `location`.
+    `location` is either a file path or an opened file descriptor integer.
+    If `use_mmap` is True, read the archive from a memory map of its file.
+
+    If `skip_data` is True, the data of each entry is skipped without being
+    decompressed or read when possible once the entry has been consumed: the
+    entries content cannot be read.
+    """
+    if isinstance(location, int):
+        abs_location = location
+    else:
+        assert location
+        abs_location = os.path.abspath(os.path.expanduser(location))
+        assert os.path.isfile(abs_location)
 
     # TODO: harden error handling
-    with Archive(abs_location) as archive:
+    with Archive(abs_location, use_mmap=use_mmap) as archive:
         for entry in archive:
             yield entry
+            if skip_data:
+                entry.skip()
 
 
 class Archive(object):
@@ -233,9 +359,17 @@ class Archive(object):
                 # do something with entry
     """
 
-    def __init__(self, location, uncompress=True, extract=True, block_size=10240):
+    def __init__(
+        self,
+        location,
+        uncompress=True,
+        extract=True,
+        block_size=READ_BLOCK_SIZE,
+        use_mmap=False,
+    ):
         """
-        Build an Archive object from file at `location`.
+        Build an Archive object from file at `location`. `location` is either
+        a file path or an opened file descriptor integer.
 
         If `uncompress` is True, the archive will be uncompressed first if
         compressed. (e.g. a tar.gz will be ungzipped).
@@ -245,6 +379,13 @@ class Archive(object):
 
         If both are True, the archive will be uncompressed then extracted as
         needed. (e.g. a tar.xz will be unxzed then untarred at once).
+
+        `block_size` is the size in bytes of the blocks read from a file path or
+        file descriptor.
+
+        If `use_mmap` is True and `location` is a file path, the archive is read
+        from a memory map of this file rather than with read syscalls. Format
+        probing and seeks are then served from the page cache.
         """
         msg = 'At least one of `uncompress` or `extract` flag is required.'
         assert uncompress or extract, msg
@@ -252,8 +393,12 @@ class Archive(object):
         self.uncompress = uncompress
         self.extract = extract
         self.block_size = block_size
+        self.use_mmap = use_mmap
         # pointer to the libarchive structure
         self.archive_struct = None
+        # memory map of the archive file and the ctypes buffer exported from it
+        self.mapped = None
+        self.mapped_buffer = None
 
     def open(self):
         """
@@ -266,8 +411,16 @@ class Archive(object):
         self.archive_struct = archive_reader()
         if self.uncompress:
             use_all_filters(self.archive_struct)
-        if extract:
+        if self.extract:
             use_all_formats(self.archive_struct)
+        else:
+            # read the uncompressed payload as a single "data" entry
+            use_raw_formats(self.archive_struct)
+        if isinstance(self.location, int):
+            open_fd(self.archive_struct, self.location, self.block_size)
+            return self
+        if self.use_mmap and self.open_mmap():
+            return self
         try:
             # TODO: ensure that we have proper exceptions raised?
             open_file(self.archive_struct, self.location, self.block_size)
@@ -275,6 +428,29 @@ class Archive(object):
             open_file_w(self.archive_struct, self.location, self.block_size)
         return self
 
+    def open_mmap(self):
+        """
+        Open the archive for reading from a memory map of its file. Return True
+        if opened or False if the file cannot be memory-mapped, such as an empty
+        file.
+        """
+        with open(self.location, 'rb') as inp:
+            size = os.fstat(inp.fileno()).st_size
+            if not size:
+                return False
+            try:
+                # a private copy-on-write map can be exported as a ctypes buffer
+                # and the file is never modified
+                self.mapped = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_COPY)
+            except (OSError, ValueError) as e:
+                if TRACE:
+                    logger.debug(f'Archive.open_mmap: cannot map: {self.location}: {e}')
+                return False
+
+        self.mapped_buffer = (c_char * size).from_buffer(self.mapped)
+        open_memory(self.archive_struct, addressof(self.mapped_buffer), size)
+        return True
+
     def close(self):
         """
         Release any memory held by the underlying librachive for this archive.
@@ -284,6 +460,11 @@ class Archive(object):
         if self.archive_struct:
             free_archive(self.archive_struct)
             self.archive_struct = None
+        if self.mapped:
+            # the exported buffer must be released before closing the map
+            self.mapped_buffer = None
+            self.mapped.close()
+            self.mapped = None
 
     def iter(self):
         """
@@ -415,14 +596,23 @@ class Entry(object):
 
         return path
 
-    def write(self, target_dir, transform_path=lambda x: x, skip_links=True):
+    def write(
+        self,
+        target_dir,
+        transform_path=lambda x: x,
+        skip_links=True,
+        buffer_size=WRITE_BUFFER_SIZE,
+        registry=None,
+    ):
         """
         Write entry to a file or directory saved relatively to the `target_dir`
         and return the path where the file or directory was written or None if
         nothing was written to disk. `transform_path` is a callable taking a
         path and returning a transformed path such as resolving relative paths,
         transliterating non-portable characters or other path transformations.
-        The default is a no-op lambda.
+        The default is a no-op lambda. `buffer_size` is the size in bytes of the
+        write buffer of the target file. `registry` is an optional
+        extractcode.NameRegistry used to find a unique name for the file.
         """
         if TRACE:
             logger.debug('writing entry: {}'.format(self))
@@ -450,6 +640,8 @@ class Entry(object):
             # TODO: also rename directories to a new name if needed segment by segment
             dir_path = os.path.join(abs_target_dir, clean_path)
             fileutils.create_dir(dir_path)
+            if registry is not None:
+                registry.add(dir_path)
             return dir_path
 
         # note: here isfile=True
@@ -459,36 +651,94 @@ class Entry(object):
 
         # TODO: also rename directories to a new name if needed segment by segment
         fileutils.create_dir(parent_path)
+        if registry is not None:
+            registry.add(parent_path)
 
         # TODO: return some warning when original path has been renamed?
-        unique_path = extractcode.new_name(target_path, is_dir=False)
+        unique_path = extractcode.new_name(
+            target_path,
+            is_dir=False,
+            registry=registry,
+        )
         if TRACE:
             logger.debug(
                 f'path: \ntarget_path: {target_path}\n'
                 f'unique_path: {unique_path}',
             )
 
-        with open(unique_path, 'wb') as target:
-            for content in self.get_content():
-                if TRACE_DEEP:
-                    logger.debug('    chunk: {}'.format(repr(content)))
-                target.write(content)
+        with open(unique_path, 'wb', buffering=buffer_size) as target:
+            self.write_content(target)
 
         os.utime(unique_path, (self.time, self.time))
 
         return target_path
 
-    def get_content(self):
+    def get_blocks(self):
         """
-        Yield the content of this archive as bytes.
+        Yield tuples of (offset, data) for the content of this entry where
+        `offset` is the position of this block of `data` in the entry content.
+
+        `data` is a memoryview over the buffer owned by libarchive: it is not
+        copied and is valid only until the next block is read. Offsets may skip
+        over holes in a sparse entry.
         """
-        chunk_len = mmap.PAGESIZE
-        sbuffer = create_string_buffer(chunk_len)
         archive_struct = self.archive.archive_struct
-        red_len = 1
-        while red_len:
-            red_len = read_entry_data(archive_struct, sbuffer, chunk_len)
-            yield sbuffer.raw[0:red_len]
+        buff = c_void_p()
+        size = c_size_t()
+        offset = c_longlong()
+        while True:
+            rc = read_entry_data_block(
+                archive_struct, byref(buff), byref(size), byref(offset))
+            if rc == ARCHIVE_EOF:
+                return
+            if size.value:
+                block = (c_char * size.value).from_address(buff.value)
+                yield offset.value, memoryview(block).cast('B')
+            else:
+                yield offset.value, memoryview(b'')
+
+    def get_content(self):
+        """
+        Yield the content of this archive as bytes. Holes in sparse entries are
+        filled with zeros.
+        """
+        position = 0
+        for offset, data in self.get_blocks():
+            if offset > position:
+                yield bytes(offset - position)
+            yield data.tobytes()
+            position = offset + len(data)
+        if position < self.size:
+            yield bytes(self.size - position)
+
+    def skip(self):
+        """
+        Skip the data of this entry without reading it. This is mostly a seek
+        for uncompressed archives.
+        """
+        if self.is_empty():
+            raise ArchiveErrorIllegalOperationOnClosedArchive()
+        skip_entry_data(self.archive.archive_struct)
+
+    def write_content(self, target):
+        """
+        Write the content of this entry to the `target` binary file object
+        opened for writing. The blocks returned by libarchive are written as-is
+        and holes in sparse entries are skipped by seeking.
+        """
+        position = 0
+        for offset, data in self.get_blocks():
+            if offset != position:
+                target.seek(offset)
+            if TRACE_DEEP:
+                logger.debug('    block: {} {}'.format(offset, len(data)))
+            target.write(data)
+            position = offset + len(data)
+
+        # a sparse entry that ends with a hole has no trailing block: extend
+        # the file to the entry size
+        if position < self.size:
+            target.truncate(self.size)
 
 
 class ArchiveException(ExtractError):
@@ -596,6 +846,14 @@ ARCHIVE_WARN = -20
 ARCHIVE_FAILED = -25
 ARCHIVE_FATAL = -30
 
+# libarchive filter codes
+ARCHIVE_FILTER_NONE = 0
+ARCHIVE_FILTER_GZIP = 1
+ARCHIVE_FILTER_BZIP2 = 2
+ARCHIVE_FILTER_COMPRESS = 3
+ARCHIVE_FILTER_LZMA = 5
+ARCHIVE_FILTER_XZ = 6
+
 # libarchive stat/file types
 AE_IFREG = 0o0100000  # Regular file
 AE_IFLNK = 0o0120000  # Symbolic link
@@ -683,6 +941,16 @@ use_all_filters.argtypes = [c_void_p]
 use_all_filters.restype = c_int
 use_all_filters.errcheck = errcheck
 
+"""
+Return a numeric code identifying the filter at position `n` in the filter
+stack of an opened archive, where 0 is the filter closest to the format.
+Return ARCHIVE_FILTER_NONE if the archive is not compressed.
+"""
+# int archive_filter_code(struct archive *, int);
+get_filter_code = libarchive.archive_filter_code
+get_filter_code.argtypes = [c_void_p, c_int]
+get_filter_code.restype = c_int
+
 """
 Once formats and filters have been set, you open an archive filename for
 actual reading.
@@ -711,6 +979,32 @@ open_file_w.argtypes = [c_void_p, c_wchar_p, c_size_t]
 open_file_w.restype = c_int
 open_file_w.errcheck = errcheck
 
+"""
+Freeze the settings, open the archive, and prepare for reading entries.
+Accepts an already opened file descriptor, such as the read end of a pipe and a
+block size.
+
+Return ARCHIVE_OK on success, or ARCHIVE_FATAL.
+"""
+# int archive_read_open_fd(struct archive *, int fd, size_t block_size);
+open_fd = libarchive.archive_read_open_fd
+open_fd.argtypes = [c_void_p, c_int, c_size_t]
+open_fd.restype = c_int
+open_fd.errcheck = errcheck
+
+"""
+Freeze the settings, open the archive, and prepare for reading entries.
+Accepts a memory buffer and its size. The buffer must stay valid until the
+archive is freed.
+
+Return ARCHIVE_OK on success, or ARCHIVE_FATAL.
+"""
+# int archive_read_open_memory(struct archive *, const void *buff, size_t size);
+open_memory = libarchive.archive_read_open_memory
+open_memory.argtypes = [c_void_p, c_void_p, c_size_t]
+open_memory.restype = c_int
+open_memory.errcheck = errcheck
+
 """
 When done with reading an archive you must free its resources.
 
@@ -789,6 +1083,18 @@ read_entry_data_block.argtypes = [c_void_p, POINTER(c_void_p), POINTER(c_size_t)
 read_entry_data_block.restype = c_int
 read_entry_data_block.errcheck = errcheck
 
+"""
+A convenience function that repeatedly calls archive_read_data_block() to skip
+all of the data for this archive entry. Note that this function is invoked
+automatically by archive_read_next_header2() if the previous entry was not
+completely consumed.
+"""
+# int archive_read_data_skip(struct archive *);
+skip_entry_data = libarchive.archive_read_data_skip
+skip_entry_data.argtypes = [c_void_p]
+skip_entry_data.restype = c_int
+skip_entry_data.errcheck = errcheck
+
 """
 Releases the struct archive_entry object.
 The struct entry object must be freed when no longer needed.
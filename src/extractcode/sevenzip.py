@@ -12,6 +12,8 @@ import logging
 import os
 import pprint
 import re
+import subprocess
+import tempfile
 import warnings
 
 from collections import defaultdict
@@ -193,8 +195,9 @@ def is_rar(location):
     """
     if not os.path.exists(location):
         return
-    from typecode import contenttype
-    T = contenttype.get_type(location)
+    # the file type is memoized and shared with the handler selection
+    from extractcode.archive import get_type
+    T = get_type(location)
     return T.filetype_file.lower().startswith('rar archive')
 
 
@@ -204,6 +207,8 @@ def extract(
     arch_type='*',
     file_by_file=on_mac,
     skip_symlinks=True,
+    include=(),
+    exclude=(),
 ):
     """
     Extract all files from a 7zip-supported archive file at ``location`` in the
@@ -217,6 +222,10 @@ def extract(
     Based on ``file_by_file`` the extraction will either be done all-files-at-
     once (default on most OSes) or one-file-at-a-time after collecting a
     directory listing (for some problematic OSes such as recent macOS)
+
+    If ``include`` or ``exclude`` lists of glob patterns are provided, only
+    extract the entries selected by these patterns using a file-by-file
+    extraction of the listed entries. See extractcode.is_selected for details.
     """
     assert location
     abs_location = os.path.abspath(os.path.expanduser(location))
@@ -234,6 +243,16 @@ def extract(
         raise ExtractErrorFailedToExtract(
             f'The system cannot find the target path specified: {target_dir}')
 
+    if include or exclude:
+        return extract_file_by_file(
+            location=abs_location,
+            target_dir=abs_target_dir,
+            arch_type=arch_type,
+            skip_symlinks=skip_symlinks,
+            include=include,
+            exclude=exclude,
+        )
+
     if file_by_file:
         extractor = extract_file_by_file
     else:
@@ -290,6 +309,8 @@ def build_7z_extract_command(
     target_dir,
     single_entry=None,
     arch_type='*',
+    to_stdout=False,
+    listfile=None,
 ):
     """
     Return a mapping of 7z command line aguments to extract the archive at
@@ -297,6 +318,13 @@ def build_7z_extract_command(
 
     If ``single_entry`` contains an Entry, return the command to extract only
     this single entry "path" in the current directory without any leading path.
+
+    If ``listfile`` is the location of a UTF-8 text file with one entry path
+    per line, return the command to extract only these entries with their full
+    paths. Paths are matched exactly and case-sensitively, without wildcards.
+
+    If ``to_stdout`` is True, return the command to write the extracted data to
+    stdout rather than to files.
     """
 
     # 7z arguments
@@ -359,6 +387,18 @@ def build_7z_extract_command(
     if single_entry:
         args += [shlex_quote(single_entry.path)]
 
+    if to_stdout:
+        # write data to stdout: this must come before the "--" switches stopper
+        args.insert(args.index('--'), '-so')
+
+    if listfile:
+        # match the listed paths exactly: the paths of a batch are unique when
+        # the case is ignored and we do not want one path to match several
+        # entries. These switches must come before the "--" switches stopper
+        args[args.index(case_sensitive)] = '-ssc'
+        stopper = args.index('--')
+        args[stopper:stopper] = ['-spd', '-scsUTF-8', '-i@' + listfile]
+
     cmd_loc = get_command_location()
 
     ex_args = dict(
@@ -375,11 +415,84 @@ def build_7z_extract_command(
     return ex_args
 
 
+# size in bytes of the reads of the remaining 7z output once a consumer is done
+STREAM_DRAIN_SIZE = 1024 * 1024
+
+
+def extract_to_stream(location, consumer, arch_type='*'):
+    """
+    Extract the payload of a 7zip-supported single-stream compressed file at
+    ``location`` (such as xz, lzma or Z) piping the extracted data to the
+    ``consumer`` callable without writing this data to disk. ``consumer`` is
+    called with the readable file descriptor of the pipe and its return value is
+    returned.
+
+    Raise exception on errors.
+
+    ``arch_type`` is the type of 7zip archive passed to the -t 7zip option. Can
+    be None.
+    """
+    assert location
+    abs_location = os.path.abspath(os.path.expanduser(location))
+    if not os.path.exists(abs_location):
+        raise ExtractErrorFailedToExtract(
+            f'The system cannot find the path specified: {abs_location}')
+
+    if is_rar(location):
+        raise ExtractErrorFailedToExtract(
+            f'RAR extraction deactivated: {location}')
+
+    ex_args = build_7z_extract_command(
+        location=abs_location,
+        target_dir=os.path.dirname(abs_location),
+        arch_type=arch_type,
+        to_stdout=True,
+    )
+
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            [ex_args['cmd_loc']] + ex_args['args'],
+            cwd=ex_args['cwd'],
+            env=ex_args['env'],
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+        consumer_error = None
+        try:
+            result = consumer(process.stdout.fileno())
+            # the consumer may stop reading before the end of a valid payload,
+            # such as libarchive at the end-of-archive marker of a tarball
+            # followed by padding: read the rest such that 7z exits cleanly
+            while process.stdout.read(STREAM_DRAIN_SIZE):
+                pass
+        except Exception as e:
+            consumer_error = e
+        finally:
+            # closing the pipe ensures that 7z is not blocked writing to it if
+            # the consumer failed before reading everything.
+            process.stdout.close()
+            rc = process.wait()
+
+        if rc != 0:
+            stderr.seek(0)
+            stderr = stderr.read().decode('utf-8', 'replace')
+            if TRACE:
+                logger.debug(f'extract_to_stream: failure: {rc}\nstderr: {stderr}')
+            error = get_7z_errors(stderr, stderr) or UNKNOWN_ERROR
+            raise ExtractErrorFailedToExtract(error)
+
+    if consumer_error:
+        raise consumer_error
+    return result
+
+
 def extract_file_by_file(
     location,
     target_dir,
     arch_type='*',
     skip_symlinks=True,
+    include=(),
+    exclude=(),
 ):
     """
     Extract all files using a one-by-one process from a 7zip-supported archive
@@ -390,12 +503,20 @@ def extract_file_by_file(
 
     ``arch_type`` is the type of 7zip archive passed to the -t 7zip option.
     Can be None.
+
+    Only extract the entries selected by the ``include`` and ``exclude`` lists
+    of glob patterns if provided.
     """
     abs_location = os.path.abspath(os.path.expanduser(location))
     abs_target_dir = os.path.abspath(os.path.expanduser(target_dir))
 
     entries, errors_msgs = list_entries(location, arch_type)
-    entries = list(entries)
+    selective = bool(include or exclude)
+    if selective:
+        entries = [
+            e for e in entries
+            if extractcode.is_selected(e.path, include, exclude)
+        ]
 
     # Determine if we need a one-by-one approach: technically the aproach is to
     # check if we have files that are in the same dir and have the same name
@@ -406,7 +527,8 @@ def extract_file_by_file(
 
     paths_as_is = set(e.path for e in entries)
     paths_no_case = set(p.lower() for p in paths_as_is)
-    need_by_file = len(paths_as_is) != len(paths_no_case)
+    # the selected entries are extracted in batches using a list file
+    need_by_file = selective or len(paths_as_is) != len(paths_no_case)
 
     if not need_by_file:
         # use regular extract
@@ -415,74 +537,79 @@ def extract_file_by_file(
             target_dir=target_dir,
             arch_type=arch_type)
 
-    # now we are extracting one file at a time. this is a tad painful because we
-    # are dealing with a full command execution at each time.
+    # now we are extracting files in batches of entries that have unique paths
+    # when the case is ignored, and then one file at a time for the entries
+    # that could not be extracted in a batch. This is a tad painful because we
+    # are dealing with a full command execution for each batch and each entry.
 
     errors = {}
     warnings = {}
     tmp_dir = fileutils.get_temp_dir(prefix='extractcode-extract-')
-    for i, entry in enumerate(entries):
 
-        if not entry.is_file:
-            continue
+    # {entry index: location of the extracted file}
+    extracted = {}
+    batches, singles = get_batches(entries)
+    for batch_num, batch in enumerate(batches):
+        batch_dir = os.path.join(tmp_dir, f'batch-{batch_num}')
+        fileutils.create_dir(batch_dir)
+        batch_extracted = extract_batch(
+            location=abs_location,
+            batch=batch,
+            target_dir=batch_dir,
+            arch_type=arch_type,
+            warnings=warnings,
+        )
+        extracted.update(batch_extracted)
+        # the entries that were not extracted are extracted one by one
+        singles.extend((i, e) for i, e in batch if i not in batch_extracted)
 
+    for i, entry in singles:
         tmp_extract_dir = os.path.join(tmp_dir, str(i))
         fileutils.create_dir(tmp_extract_dir)
-
-        ex_args = build_7z_extract_command(
-            location=location,
+        source_file_loc = extract_single_entry(
+            location=abs_location,
+            entry=entry,
             target_dir=tmp_extract_dir,
-            single_entry=entry,
             arch_type=arch_type,
+            errors=errors,
+            warnings=warnings,
         )
-        rc, stdout, stderr = command.execute(**ex_args)
-
-        error = get_7z_errors(stdout, stderr)
-        if error or rc != 0:
-            error = error or UNKNOWN_ERROR
-            if TRACE:
-                logger.debug(
-                    'extract: failure: {rc}\n'
-                    'stderr: {stderr}\nstdout: {stdout}'.format(**locals()))
-            errors[entry.path] = error
-            continue
+        if source_file_loc:
+            extracted[i] = source_file_loc
 
-        # these are all for a single file path
-        warns = get_7z_warnings(stdout) or {}
-        wmsg = '\n'.join(warns.values())
-        if wmsg:
-            if entry.path in warnings:
-                warnings[entry.path] += '\n' + wmsg
-            else:
-                warnings[entry.path] = wmsg
-
-        # finally move that extracted file to its target location, possibly
-        # renamed
-        source_file_name = fileutils.file_name(entry.path)
-        source_file_loc = os.path.join(tmp_extract_dir, source_file_name)
-        if not os.path.exists(source_file_loc):
-            if entry.path in errors:
-                errors[entry.path] += '\nNo file name extracted.'
-            else:
-                errors[entry.path] = 'No file name extracted.'
+    # finally move the extracted files to their target location, possibly
+    # renamed, in the original order of the entries
+    registry = extractcode.NameRegistry()
+    for i, entry in enumerate(entries):
+        source_file_loc = extracted.get(i)
+        if not source_file_loc:
             continue
 
         safe_path = paths.safe_path(entry.path, posix=True, preserve_spaces=True)
         target_file_loc = os.path.join(target_dir, safe_path)
         target_file_dir = os.path.dirname(target_file_loc)
         fileutils.create_dir(target_file_dir)
+        registry.add(target_file_dir)
 
-        unique_target_file_loc = extractcode.new_name(target_file_loc, is_dir=False)
+        unique_target_file_loc = extractcode.new_name(
+            target_file_loc,
+            is_dir=False,
+            registry=registry,
+        )
 
         if TRACE:
             logger.debug('extract: unique_target_file_loc: from {} to {}'.format(
                 target_file_loc, unique_target_file_loc))
 
         if os.path.isfile(source_file_loc):
-            fileutils.copyfile(source_file_loc, unique_target_file_loc)
+            try:
+                os.rename(source_file_loc, unique_target_file_loc)
+            except OSError:
+                fileutils.copyfile(source_file_loc, unique_target_file_loc)
         else:
             fileutils.copytree(source_file_loc, unique_target_file_loc)
 
+    fileutils.delete(tmp_dir)
     extractcode.remove_backslashes_and_dotdots(abs_target_dir)
     if errors:
         raise ExtractErrorFailedToExtract(errors)
@@ -490,19 +617,176 @@ def extract_file_by_file(
     return convert_warnings_to_list(warnings)
 
 
+def get_batches(entries):
+    """
+    Return a tuple of (list of batches, list of singles) from a list of
+    `entries` where a batch is a list of (index, Entry) for file entries that
+    have unique paths when the case is ignored and can be extracted together in
+    a single 7z command. The singles are a list of (index, Entry) that must be
+    extracted one at a time.
+
+    The number of batches is the largest number of entries with the same path
+    when the case is ignored, typically two.
+    """
+    batches = []
+    singles = []
+    # {lowercased path: number of entries with this path}
+    path_counts = {}
+    for i, entry in enumerate(entries):
+        if not entry.is_file:
+            continue
+
+        if not is_batchable_path(entry.path):
+            singles.append((i, entry))
+            continue
+
+        path = entry.path.lower()
+        batch_num = path_counts.get(path, 0)
+        path_counts[path] = batch_num + 1
+        if batch_num == len(batches):
+            batches.append([])
+        batches[batch_num].append((i, entry))
+
+    return batches, singles
+
+
+def is_batchable_path(path):
+    """
+    Return True if an entry `path` can be extracted in a batch: the path must
+    be a relative path that can be listed in a list file and is extracted
+    as-is by 7z such that the extracted file can be found at this path.
+    """
+    if not path or path.startswith('/'):
+        return False
+    if any(c in path for c in '\\\n\r'):
+        return False
+    segments = path.split('/')
+    return not any(s in ('', '.', '..') for s in segments)
+
+
+def extract_batch(
+    location,
+    batch,
+    target_dir,
+    arch_type='*',
+    warnings=None,
+):
+    """
+    Extract a `batch` list of (index, Entry) from the archive at `location` in
+    the `target_dir` directory with a single 7z command. Update the `warnings`
+    mapping with any warning.
+
+    Return a mapping of {entry index: extracted file location} for the entries
+    that were extracted. Return an empty mapping if the 7z command failed: the
+    entries should then be extracted one at a time.
+    """
+    listfile = target_dir + '-list.txt'
+    with open(listfile, 'w', encoding='utf-8') as lf:
+        lf.write('\n'.join(entry.path for _, entry in batch))
+
+    ex_args = build_7z_extract_command(
+        location=location,
+        target_dir=target_dir,
+        arch_type=arch_type,
+        listfile=listfile,
+    )
+    rc, stdout, stderr = command.execute(**ex_args)
+
+    error = get_7z_errors(stdout, stderr)
+    if error or rc != 0:
+        if TRACE:
+            logger.debug(
+                'extract_batch: failure: {rc}\n'
+                'stderr: {stderr}\nstdout: {stdout}'.format(**locals()))
+        return {}
+
+    warns = get_7z_warnings(stdout) or {}
+    if warnings is not None:
+        for path, msg in warns.items():
+            warnings[path] = '\n'.join(msg)
+
+    extracted = {}
+    for i, entry in batch:
+        source_file_loc = os.path.join(target_dir, entry.path)
+        if os.path.isfile(source_file_loc) and not os.path.islink(source_file_loc):
+            extracted[i] = source_file_loc
+    return extracted
+
+
+def extract_single_entry(
+    location,
+    entry,
+    target_dir,
+    arch_type='*',
+    errors=None,
+    warnings=None,
+):
+    """
+    Extract a single `entry` Entry from the archive at `location` in the
+    `target_dir` directory without any leading path. Update the `errors` and
+    `warnings` mappings with any error or warning.
+
+    Return the location of the extracted file or None.
+    """
+    errors = errors if errors is not None else {}
+    warnings = warnings if warnings is not None else {}
+
+    ex_args = build_7z_extract_command(
+        location=location,
+        target_dir=target_dir,
+        single_entry=entry,
+        arch_type=arch_type,
+    )
+    rc, stdout, stderr = command.execute(**ex_args)
+
+    error = get_7z_errors(stdout, stderr)
+    if error or rc != 0:
+        error = error or UNKNOWN_ERROR
+        if TRACE:
+            logger.debug(
+                'extract: failure: {rc}\n'
+                'stderr: {stderr}\nstdout: {stdout}'.format(**locals()))
+        errors[entry.path] = error
+        return
+
+    # these are all for a single file path
+    warns = get_7z_warnings(stdout) or {}
+    wmsg = '\n'.join(warns.values())
+    if wmsg:
+        if entry.path in warnings:
+            warnings[entry.path] += '\n' + wmsg
+        else:
+            warnings[entry.path] = wmsg
+
+    source_file_name = fileutils.file_name(entry.path)
+    source_file_loc = os.path.join(target_dir, source_file_name)
+    if not os.path.exists(source_file_loc):
+        if entry.path in errors:
+            errors[entry.path] += '\nNo file name extracted.'
+        else:
+            errors[entry.path] = 'No file name extracted.'
+        return
+
+    return source_file_loc
+
+
 def list_entries(location, arch_type='*'):
     """
-    Return a tuple of (iterator of Entry, error_messages). The generator
-    contains each entry found in a 7zip-supported archive file at `location`.
+    Return a tuple of (list of Entry, error_messages). The list contains each
+    entry found in a 7zip-supported archive file at `location`.
     Use the provided 7zip `arch_type` CLI archive type code (e.g. with the "-t*
     7z" cli type option) (can be None).
     """
-    assert location
-    abs_location = os.path.abspath(os.path.expanduser(location))
+    error_messages = []
+    entries = list(iter_entries(location, arch_type, errors=error_messages))
+    return entries, error_messages
 
-    if is_rar(location):
-        return []
 
+def build_7z_list_command(location, arch_type='*'):
+    """
+    Return a mapping of 7z command arguments to list the entries of the archive
+    file at `location` using the long "-slt" listing format.
+    """
     # 7z arguments
     listing = 'l'
 
@@ -534,34 +818,80 @@ def list_entries(location, arch_type='*'):
         output_as_utf,
         password,
         '--',
-        abs_location,
+        location,
     ]
 
     cmd_loc = get_command_location()
+    return dict(cmd_loc=cmd_loc, args=args, env=timezone)
 
-    rc, stdout, stderr = command.execute(
-        cmd_loc=cmd_loc,
-        args=args,
-        env=timezone,
-        to_files=True)
 
-    if TRACE:
-        logger.debug(
-            'list_entries: rc: {rc}\n'
-            'stderr: file://{stderr}\n'
-            'stdout: file://{stdout}\n'.format(**locals()))
+def iter_entries(location, arch_type='*', errors=None):
+    """
+    Yield Entry found in a 7zip-supported archive file at `location` as they are
+    listed by 7zip, reading the listing through a pipe. Use the provided 7zip
+    `arch_type` CLI archive type code (e.g. with the "-t* 7z" cli type option)
+    (can be None).
 
-    error_messages = []
-    if rc != 0:
-        error_messages = get_7z_errors(stdout, stderr) or UNKNOWN_ERROR
+    If the listing fails, error messages are appended to the `errors` list once
+    all the entries have been yielded.
+    """
+    assert location
+    abs_location = os.path.abspath(os.path.expanduser(location))
+
+    if is_rar(location):
+        return
+
+    list_args = build_7z_list_command(location=abs_location, arch_type=arch_type)
+    cmd_loc = list_args['cmd_loc']
+    env = command.get_env(list_args['env'], lib_dir=os.path.dirname(cmd_loc)) or None
+
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            [cmd_loc] + list_args['args'],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+        try:
+            # NB: universal newlines normalize line endings to POSIX
+            listing = io.TextIOWrapper(process.stdout, encoding='utf-8')
+            yield from iter_7z_listing(listing)
+        finally:
+            # closing the pipe ensures that 7z is not blocked writing to it if
+            # the entries are not all consumed.
+            process.stdout.close()
+            rc = process.wait()
+
+        if TRACE:
+            logger.debug(f'iter_entries: rc: {rc}')
 
-    return parse_7z_listing(stdout), error_messages
+        if rc != 0 and errors is not None:
+            stderr.seek(0)
+            stderr = stderr.read().decode('utf-8', 'replace')
+            errors.append(get_7z_errors(stderr, stderr) or UNKNOWN_ERROR)
 
 
 def parse_7z_listing(location):
     """
     Return a list Entry objects from parsing a long format 7zip listing from a
-    file at `location`.
+    file at `location`. See `iter_7z_listing` for details.
+    """
+    with io.open(location, 'r', encoding='utf-8') as listing:
+        entries = list(iter_7z_listing(listing))
+
+    if TRACE_ENTRIES:
+        logger.debug('parse_7z_listing: entries# {}\n'.format(len(entries)))
+        for entry in entries:
+            logger.debug('    ' + repr(entry.to_dict()))
+
+    return entries
+
+
+def iter_7z_listing(lines):
+    """
+    Yield Entry objects from parsing a long format 7zip listing from an iterable
+    of text `lines`, such as a file or a pipe opened in text mode. The listing
+    is parsed in a single pass and one path block at a time.
 
     The 7zip -slt format looks like this:
 
@@ -599,26 +929,10 @@ def parse_7z_listing(location):
 
     We ignore the header and footer in a listing.
     """
-
-    # read to unicode
-    with io.open(location, 'r', encoding='utf-8') as listing:
-        text = listing.read()
-        # normalize line endings to POSIX
-        text = text.replace('\r\n', '\n')
-
-    if TRACE:
-        logger.debug('parse_7z_listing: initial text: type: ' + repr(type(text)))
-        print('--------------------------------------')
-        print(text)
-        print('--------------------------------------')
-
-    # for now we ignore the header, and only start dealing with text after that
-    end_of_header = '----------\n'
-    _header, _, paths = text.rpartition(end_of_header)
-
-    if not paths:
-        # we have only a header, likely an error condition or an empty archive
-        return []
+    # for now we ignore the header, and only start dealing with lines after
+    # this line
+    end_of_header = '----------'
+    in_paths = False
 
     # each block representing one path or file:
     # - starts with a "Path = <some/path>" key/value
@@ -626,63 +940,84 @@ def parse_7z_listing(location):
     #   (unless there is a \n in file name which is an error condition)
     # - ends with an empty line
     # then we have a global footer
-    two_empty_lines = '\n\n'
-    path_key = 'Path'
-    path_blocks = [
-        pb for pb in paths.split(two_empty_lines)
-        if pb and path_key in pb
-    ]
-
-    key_value_sep = '='
+    block = []
+    for line in lines:
+        line = line.rstrip('\n')
+
+        if line.endswith(end_of_header):
+            # a new start: anything before is part of the header
+            in_paths = True
+            block = []
+            continue
 
-    entries = []
+        if not in_paths:
+            continue
 
-    for path_block in path_blocks:
-        # we ignore empty lines as well as lines that do not contain a key
-        lines = [
-            line.strip() for line in path_block.splitlines(False)
-            if line.strip()
-        ]
-        if not lines:
+        if line:
+            block.append(line)
             continue
-        # we have a weird case of path with line returns in the file name
-        # we concatenate these in the first Path line
-        while (
-            len(lines) > 1
-            and lines[0].startswith(path_key)
-            and key_value_sep not in lines[1]
-        ):
-            first_line = lines[0]
-            second_line = lines.pop(1)
-            first_line = '\n'.join([first_line, second_line])
-            lines[0] = first_line
-
-        dangling_lines = [line  for line in lines if key_value_sep not in line]
-        entry_errors = []
-        if dangling_lines:
-            emsg = (
-                'Invalid 7z listing path block missing "=" as key/value '
-                'separator: {}'.format(repr(path_block))
-            )
-            entry_errors.append(emsg)
 
-        entry_attributes = {}
-        key_lines = [line  for line in lines if key_value_sep in line]
-        for line in key_lines:
-            k, _, v = line.partition(key_value_sep)
-            k = k.strip()
-            v = v.strip()
-            entry_attributes[k] = v
+        if block:
+            entry = build_entry(block)
+            if entry:
+                yield entry
+            block = []
 
-        ntry = Entry.from_dict(infos=entry_attributes, errors=entry_errors)
-        entries.append(ntry)
+    if in_paths and block:
+        entry = build_entry(block)
+        if entry:
+            yield entry
 
-    if TRACE_ENTRIES:
-        logger.debug('parse_7z_listing: entries# {}\n'.format(len(entries)))
-        for entry in entries:
-            logger.debug('    ' + repr(entry.to_dict()))
 
-    return entries
+def build_entry(block):
+    """
+    Return an Entry built from a `block` list of the text lines of a 7zip
+    listing path block or None if this is not a path block.
+    """
+    path_key = 'Path'
+    if not any(path_key in line for line in block):
+        return
+
+    if TRACE:
+        logger.debug('build_entry: block: ' + repr(block))
+
+    key_value_sep = '='
+
+    # we ignore empty lines as well as lines that do not contain a key
+    lines = [line.strip() for line in block if line.strip()]
+    if not lines:
+        return
+    # we have a weird case of path with line returns in the file name
+    # we concatenate these in the first Path line
+    while (
+        len(lines) > 1
+        and lines[0].startswith(path_key)
+        and key_value_sep not in lines[1]
+    ):
+        first_line = lines[0]
+        second_line = lines.pop(1)
+        first_line = '\n'.join([first_line, second_line])
+        lines[0] = first_line
+
+    dangling_lines = [line  for line in lines if key_value_sep not in line]
+    entry_errors = []
+    if dangling_lines:
+        path_block = '\n'.join(block)
+        emsg = (
+            'Invalid 7z listing path block missing "=" as key/value '
+            'separator: {}'.format(repr(path_block))
+        )
+        entry_errors.append(emsg)
+
+    entry_attributes = {}
+    key_lines = [line  for line in lines if key_value_sep in line]
+    for line in key_lines:
+        k, _, v = line.partition(key_value_sep)
+        k = k.strip()
+        v = v.strip()
+        entry_attributes[k] = v
+
+    return Entry.from_dict(infos=entry_attributes, errors=entry_errors)
 
 
 @attr.s(slots=True)
@@ -10,9 +10,11 @@
 import bz2
 import gzip
 import logging
+import lzma
 import os
-import shutil
+import re
 
+from collections import namedtuple
 from functools import partial
 
 from commoncode import fileutils
@@ -26,27 +28,185 @@ logger = logging.getLogger(__name__)
 # logger.setLevel(logging.DEBUG)
 
 
-def uncompress(location, target_dir, decompressor, suffix=EXTRACT_SUFFIX):
+"""
+A gzip backend is an implementation of gzip decompression:
+ - `name` is the name of the backend.
+ - `gzip_file` is a gzip.GzipFile-compatible class.
+ - `zlib` is a zlib-compatible module providing a decompressobj function.
+
+The backends are tried in the order of GZIP_BACKENDS and the first that can be
+imported is used: accelerated implementations first and the standard library
+last. Set the EXTRACTCODE_GZIP_BACKEND environment variable to the name of a
+backend to force using this backend.
+"""
+GzipBackend = namedtuple('GzipBackend', 'name gzip_file zlib')
+
+EXTRACTCODE_GZIP_BACKEND_ENVVAR = 'EXTRACTCODE_GZIP_BACKEND'
+
+
+def load_isal_backend():
+    """
+    Return a GzipBackend using the Intel ISA-L library from python-isal.
+    """
+    from isal import igzip
+    from isal import isal_zlib
+    return GzipBackend(name='isal', gzip_file=igzip.IGzipFile, zlib=isal_zlib)
+
+
+def load_zlib_ng_backend():
+    """
+    Return a GzipBackend using the zlib-ng library from python-zlib-ng.
+    """
+    from zlib_ng import gzip_ng
+    from zlib_ng import zlib_ng
+    return GzipBackend(name='zlib-ng', gzip_file=gzip_ng.GzipNGFile, zlib=zlib_ng)
+
+
+def load_stdlib_backend():
+    """
+    Return a GzipBackend using the standard library gzip and zlib modules.
+    """
+    import zlib
+    return GzipBackend(name='stdlib', gzip_file=gzip.GzipFile, zlib=zlib)
+
+
+# {name: backend loader function} in order of preference
+GZIP_BACKENDS = {
+    'isal': load_isal_backend,
+    'zlib-ng': load_zlib_ng_backend,
+    'stdlib': load_stdlib_backend,
+}
+
+
+# {backend name or None: GzipBackend} of the gzip backends loaded once
+_gzip_backends = {}
+
+
+def get_gzip_backend(name=None):
+    """
+    Return a GzipBackend named `name`, or forced with the
+    EXTRACTCODE_GZIP_BACKEND environment variable, or the first available
+    backend otherwise. Raise an Exception if a requested backend is unknown or
+    cannot be imported.
+    """
+    name = name or os.environ.get(EXTRACTCODE_GZIP_BACKEND_ENVVAR) or None
+    backend = _gzip_backends.get(name)
+    if backend:
+        return backend
+
+    if name:
+        loader = GZIP_BACKENDS.get(name)
+        if not loader:
+            raise Exception(
+                f'Unknown gzip backend: {name!r}. '
+                f'Use one of: {", ".join(GZIP_BACKENDS)}.'
+            )
+        try:
+            backend = loader()
+        except ImportError as e:
+            raise Exception(f'Cannot load gzip backend: {name!r}: {e}') from e
+    else:
+        for loader in GZIP_BACKENDS.values():
+            try:
+                backend = loader()
+                break
+            except ImportError:
+                continue
+
+    if DEBUG:
+        logger.debug(f'get_gzip_backend: using: {backend.name}')
+    _gzip_backends[name] = backend
+    return backend
+
+
+def gzip_decompressor(location, mode='rb'):
+    """
+    Return a gzip.GzipFile-compatible object opened on the gzip file at
+    `location` using the selected gzip backend. This is a `decompressor` for
+    gzip files.
+    """
+    return get_gzip_backend().gzip_file(location, mode)
+
+
+def uncompress(location, target_dir, decompressor, suffix=EXTRACT_SUFFIX, target_name=None):
     """
     Uncompress a compressed file at location in the target_dir using the
-    `decompressor` object. The uncompressed file is named after the original
-    archive with a `suffix` added.
+    `decompressor` object. The uncompressed file is named `target_name` if
+    provided or after the original archive with a `suffix` added otherwise.
 
     Return a list of warning messages. Raise Exceptions on errors.
     """
-    # FIXME: do not create a sub-directory and instead strip the "compression"
-    # extension such gz, etc. or introspect the archive header to get the file
-    # name when present.
     if DEBUG:
         logger.debug('uncompress: ' + location)
 
-    tmp_loc, warnings = uncompress_file(location, decompressor)
-
-    target_location = os.path.join(target_dir, os.path.basename(location) + suffix)
+    target_name = target_name or os.path.basename(location) + suffix
+    target_location = os.path.join(target_dir, target_name)
     if os.path.exists(target_location):
         fileutils.delete(target_location)
-    shutil.move(tmp_loc, target_location)
-    return warnings
+    return uncompress_file_to(location, target_location, decompressor)
+
+
+def get_uncompressed_name(location, tar_extensions=()):
+    """
+    Return the name of the uncompressed file for the compressed file at
+    `location` using the same conventions as 7zip: strip the extension or
+    replace it with .tar if it is one of the `tar_extensions` (such as .txz).
+    Add a "~" suffix to a name without extension.
+    """
+    base_name, extension = os.path.splitext(os.path.basename(location))
+    if not base_name or not extension:
+        return os.path.basename(location) + '~'
+    if extension.lower() in tar_extensions:
+        return base_name + '.tar'
+    return base_name
+
+
+# gzip header flags. See RFC 1952
+GZIP_FLAG_FEXTRA = 4
+GZIP_FLAG_FNAME = 8
+
+# maximum length of an original file name read from a gzip header
+GZIP_MAX_NAME_SIZE = 1024
+
+
+def get_gzip_original_name(location):
+    """
+    Return the original file name stored in the FNAME field of the header of
+    the gzip file at `location` or None if there is no such name. Only the last
+    segment of a name with a path is returned, made safe and portable.
+    """
+    from commoncode import paths
+
+    with open(location, 'rb') as f:
+        header = f.read(10)
+        if len(header) < 10 or not header.startswith(b'\x1f\x8b'):
+            return
+        flags = header[3]
+        if not flags & GZIP_FLAG_FNAME:
+            return
+        if flags & GZIP_FLAG_FEXTRA:
+            xlen = int.from_bytes(f.read(2), 'little')
+            f.seek(xlen, os.SEEK_CUR)
+        name, _, _ = f.read(GZIP_MAX_NAME_SIZE).partition(b'\x00')
+
+    # names are ISO-8859-1 per the specification
+    name = name.decode('latin-1').replace('\\', '/').rstrip('/')
+    name = name.rpartition('/')[-1]
+    if name in ('', '.', '..'):
+        return
+    return paths.portable_filename(name, preserve_spaces=True) or None
+
+
+def get_gzip_uncompressed_name(location):
+    """
+    Return the name of the uncompressed file for the gzip file at `location`:
+    the original file name stored in its header if any, or the name of the
+    file with its compression extension stripped otherwise.
+    """
+    return get_gzip_original_name(location) or get_uncompressed_name(
+        location,
+        tar_extensions=('.tgz',),
+    )
 
 
 def uncompress_file(location, decompressor):
@@ -55,30 +215,229 @@ def uncompress_file(location, decompressor):
     the uncompressed file and a list of warning messages. Raise Exceptions on
     errors. Use the `decompressor` object for decompression.
     """
-    # FIXME: do not create a sub-directory and instead strip the "compression"
-    # extension such gz, etc. or introspect the archive header to get the file
-    # name when present.
     assert location
     assert decompressor
 
-    warnings = []
     base_name = fileutils.file_base_name(location)
     target_location = os.path.join(fileutils.get_temp_dir(
         prefix='extractcode-extract-'), base_name)
+    warnings = uncompress_file_to(location, target_location, decompressor)
+    return target_location, warnings
+
+
+def uncompress_file_to(location, target_location, decompressor):
+    """
+    Uncompress a compressed file at location to the `target_location` file and
+    return a list of warning messages. Raise Exceptions on errors and delete
+    any partially written file. Use the `decompressor` object for
+    decompression.
+    """
+    warnings = []
+    if uncompress_file_in_parallel(location, target_location, decompressor):
+        return warnings
 
-    with decompressor(location, 'rb') as compressed:
-        with open(target_location, 'wb') as uncompressed:
-            buffer_size = 32 * 1024 * 1024
-            while True:
-                chunk = compressed.read(buffer_size)
-                if not chunk:
-                    break
-                uncompressed.write(chunk)
+    try:
+        with decompressor(location, 'rb') as compressed:
+            with open(target_location, 'wb') as uncompressed:
+                buffer_size = 32 * 1024 * 1024
+                while True:
+                    chunk = compressed.read(buffer_size)
+                    if not chunk:
+                        break
+                    uncompressed.write(chunk)
 
-        if getattr(decompressor, 'has_trailing_garbage', False):
-            warnings.append(location + ': Trailing garbage found and ignored.')
+            if getattr(decompressor, 'has_trailing_garbage', False):
+                warnings.append(location + ': Trailing garbage found and ignored.')
+    except BaseException:
+        if os.path.exists(target_location):
+            os.remove(target_location)
+        raise
 
-    return target_location, warnings
+    return warnings
+
+
+# compressed files smaller than this are always decompressed serially
+PARALLEL_MIN_SIZE = 2 * 1024 * 1024
+
+# approximate size of the compressed segments decompressed in parallel. A
+# segment is made of one or more consecutive gzip members or bzip2 streams.
+PARALLEL_SEGMENT_SIZE = 1024 * 1024
+
+# maximum number of threads used to decompress a file in parallel
+PARALLEL_THREADS = min(os.cpu_count() or 1, 8)
+
+# a BGZF block header: a gzip header with the FEXTRA flag and a "BC" subfield
+# storing the block size. See the SAM/BAM specification.
+BGZF_HEADER = b'\x1f\x8b\x08\x04'
+
+# the start of a bzip2 stream with its first block magic, or an empty stream
+BZIP2_STREAM_START = re.compile(
+    rb'BZh[1-9](?:\x31\x41\x59\x26\x53\x59|\x17\x72\x45\x38\x50\x90)')
+
+
+def get_bgzf_members(location):
+    """
+    Return a list of the (start, end) offsets of the gzip members of the BGZF
+    file at `location`, or None if this is not a BGZF file such as one created
+    by bgzip. The size of each member is read from its header.
+    """
+    members = []
+    file_size = os.path.getsize(location)
+    with open(location, 'rb') as f:
+        start = 0
+        while start < file_size:
+            f.seek(start)
+            header = f.read(18)
+            if not header.startswith(BGZF_HEADER) or len(header) < 18:
+                return
+            xlen = int.from_bytes(header[10:12], 'little')
+            # the "BC" subfield is the first and only subfield written by bgzip
+            if header[12:14] != b'BC' or xlen < 6:
+                return
+            size = int.from_bytes(header[16:18], 'little') + 1
+            members.append((start, start + size))
+            start += size
+    if start != file_size:
+        return
+    return members
+
+
+def get_bzip2_streams(location):
+    """
+    Return a list of the (start, end) offsets of the streams of the bzip2 file
+    at `location` such as created by pbzip2 or by concatenating bzip2 files,
+    or None if this file has only one stream.
+
+    The stream starts are found by their signature: this may find a false
+    stream start in the compressed data, which is detected when the segments
+    are decompressed.
+    """
+    import mmap
+    with open(location, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            starts = [m.start() for m in BZIP2_STREAM_START.finditer(mapped)]
+            size = len(mapped)
+    if len(starts) < 2 or starts[0] != 0:
+        return
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def get_segments(members, segment_size=PARALLEL_SEGMENT_SIZE):
+    """
+    Return a list of (start, end) offsets of segments grouping consecutive
+    `members` (start, end) offsets into segments of about `segment_size` bytes.
+    """
+    segments = []
+    seg_start = seg_end = None
+    for start, end in members:
+        if seg_start is None:
+            seg_start = start
+        seg_end = end
+        if seg_end - seg_start >= segment_size:
+            segments.append((seg_start, seg_end))
+            seg_start = None
+    if seg_start is not None:
+        segments.append((seg_start, seg_end))
+    return segments
+
+
+def decompress_gzip_segment(data):
+    """
+    Return the decompressed bytes of the `data` bytes of one or more complete
+    gzip members. Raise an Exception if a member is truncated.
+    """
+    zlib = get_gzip_backend().zlib
+    chunks = []
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        chunks.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            raise EOFError('Truncated gzip member.')
+        data = decompressor.unused_data
+    return b''.join(chunks)
+
+
+def decompress_bzip2_segment(data):
+    """
+    Return the decompressed bytes of the `data` bytes of one or more complete
+    bzip2 streams. Raise an Exception if a stream is truncated or invalid.
+    """
+    chunks = []
+    while data:
+        decompressor = bz2.BZ2Decompressor()
+        chunks.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            raise EOFError('Truncated bzip2 stream.')
+        data = decompressor.unused_data
+    return b''.join(chunks)
+
+
+def uncompress_file_in_parallel(
+    location,
+    target_location,
+    decompressor,
+    threads=PARALLEL_THREADS,
+):
+    """
+    Uncompress the compressed file at `location` to `target_location` and
+    return True if this is a multi-member gzip (BGZF) or multi-stream bzip2 file
+    that can be decompressed in parallel. Return False otherwise, or if there
+    was an error: the file should then be decompressed serially with the
+    `decompressor` object for byte-identical results and error messages.
+
+    The file is split into segments of complete members or streams that are
+    decompressed with a pool of `threads` threads: zlib and bz2 release the GIL
+    while decompressing. The decompressed segments are written in order, with only a
+    bounded number of segments in memory.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if threads < 2 or os.path.getsize(location) < PARALLEL_MIN_SIZE:
+        return False
+
+    try:
+        if decompressor in (gzip_decompressor, gzip.GzipFile):
+            members = get_bgzf_members(location)
+            decompress = decompress_gzip_segment
+        elif decompressor is bz2.BZ2File:
+            members = get_bzip2_streams(location)
+            decompress = decompress_bzip2_segment
+        else:
+            return False
+
+        if not members:
+            return False
+        segments = get_segments(members)
+        if len(segments) < 2:
+            return False
+
+        if DEBUG:
+            logger.debug(f'uncompress_file_in_parallel: {location}: {len(segments)}')
+
+        with open(location, 'rb') as compressed, \
+                open(target_location, 'wb') as uncompressed, \
+                ThreadPoolExecutor(max_workers=threads) as executor:
+
+            def submit(segment):
+                start, end = segment
+                compressed.seek(start)
+                return executor.submit(decompress, compressed.read(end - start))
+
+            # keep at most two segments per thread in flight
+            window = 2 * threads
+            pending = [submit(seg) for seg in segments[:window]]
+            for segment in segments[window:] + [None] * len(pending):
+                uncompressed.write(pending.pop(0).result())
+                if segment:
+                    pending.append(submit(segment))
+        return True
+
+    except Exception as e:
+        if DEBUG:
+            logger.debug(f'uncompress_file_in_parallel: {location}: failed: {e}')
+        if os.path.exists(target_location):
+            os.remove(target_location)
+        return False
 
 
 def uncompress_bzip2(location, target_dir):
@@ -95,7 +454,83 @@ def uncompress_gzip(location, target_dir):
     Return a list warnings messages.
     """
 
-    return uncompress(location, target_dir, decompressor=gzip.GzipFile)
+    return uncompress(
+        location,
+        target_dir,
+        decompressor=gzip_decompressor,
+        target_name=get_gzip_uncompressed_name(location),
+    )
+
+
+def uncompress_xz(location, target_dir):
+    """
+    Uncompress an xz or lzma compressed file at location in the target_dir.
+    Return a list warnings messages.
+    """
+    return uncompress(
+        location,
+        target_dir,
+        decompressor=lzma.LZMAFile,
+        target_name=get_uncompressed_name(location, tar_extensions=('.txz',)),
+    )
+
+
+def uncompress_lzma(location, target_dir):
+    """
+    Uncompress an lzma or xz compressed file at location in the target_dir.
+    Return a list warnings messages.
+    """
+    return uncompress(
+        location,
+        target_dir,
+        decompressor=lzma.LZMAFile,
+        target_name=get_uncompressed_name(location),
+    )
+
+
+def uncompress_Z(location, target_dir):
+    """
+    Uncompress a Unix compress .Z compressed file at location in the target_dir.
+    Return a list warnings messages.
+    """
+    # stdlib has no LZW decompressor: use libarchive instead
+    from extractcode import libarchive2
+
+    target_name = get_uncompressed_name(location, tar_extensions=('.taz',))
+    target_location = os.path.join(target_dir, target_name)
+    if os.path.exists(target_location):
+        fileutils.delete(target_location)
+    return libarchive2.uncompress_file(
+        location,
+        target_location,
+        filter_code=libarchive2.ARCHIVE_FILTER_COMPRESS,
+    )
+
+
+# size of the chunks of decompressed content returned when streaming
+CHUNK_SIZE = 1024 * 1024
+
+
+def open_compressed_file(location, decompressor):
+    """
+    Return a binary file-like object to read the decompressed content of the
+    compressed file at `location` using the `decompressor` object. Only a
+    bounded buffer of the content is kept in memory while reading. The caller
+    must close the returned object, for instance using it as a context manager.
+    """
+    return decompressor(location, 'rb')
+
+
+def iter_compressed_file_content(location, decompressor, chunk_size=CHUNK_SIZE):
+    """
+    Yield the decompressed content of the compressed file at `location` as
+    byte strings of at most `chunk_size` bytes using the `decompressor` object,
+    such that the whole content is never loaded in memory. Raise Exceptions on
+    errors.
+    """
+    with open_compressed_file(location, decompressor) as compressed:
+        for chunk in iter(partial(compressed.read, chunk_size), b''):
+            yield chunk
 
 
 def get_compressed_file_content(location, decompressor):
@@ -103,18 +538,36 @@ def get_compressed_file_content(location, decompressor):
     Uncompress a compressed file at location and return its content as a byte
     string and a list of warning messages. Raise Exceptions on errors. Use the
     `decompressor` object for decompression.
+
+    Note that the whole content is loaded in memory: use
+    iter_compressed_file_content or open_compressed_file for large files.
     """
     warnings = []
-    with decompressor(location, 'rb') as compressed:
-        content = compressed.read()
-        if getattr(decompressor, 'has_trailing_garbage', False):
-            warnings.append(location + ': Trailing garbage found and ignored.')
+    content = b''.join(iter_compressed_file_content(location, decompressor))
+    if getattr(decompressor, 'has_trailing_garbage', False):
+        warnings.append(location + ': Trailing garbage found and ignored.')
     return content, warnings
 
 
+open_gz_compressed_file = partial(
+    open_compressed_file,
+    decompressor=gzip_decompressor,
+)
+open_bz2_compressed_file = partial(
+    open_compressed_file,
+    decompressor=bz2.BZ2File,
+)
+iter_gz_compressed_file_content = partial(
+    iter_compressed_file_content,
+    decompressor=gzip_decompressor,
+)
+iter_bz2_compressed_file_content = partial(
+    iter_compressed_file_content,
+    decompressor=bz2.BZ2File,
+)
 get_gz_compressed_file_content = partial(
     get_compressed_file_content,
-    decompressor=gzip.GzipFile,
+    decompressor=gzip_decompressor,
 )
 get_bz2_compressed_file_content = partial(
     get_compressed_file_content,
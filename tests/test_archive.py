@@ -10,6 +10,7 @@
 
 import os
 from pathlib import Path
+from unittest import mock
 
 import pytest
 
@@ -27,6 +28,7 @@ from extractcode_assert_utils import to_posix
 
 import extractcode
 from extractcode import archive
+from extractcode import ExtractError
 from extractcode import ExtractErrorFailedToExtract
 from extractcode import libarchive2
 from extractcode import sevenzip
@@ -227,6 +229,116 @@ class TestGetExtractorTest(BaseArchiveTestCase):
         expected = []
         self.check_get_extractors(test_file, expected, kinds=extractcode.default_kinds)
 
+    def test_get_best_handler_is_memoized_until_the_file_changes(self):
+        test_file = self.get_test_loc('archive/zip/basic.zip', copy=True)
+        archive._get_best_handler.cache_clear()
+        archive._get_type.cache_clear()
+
+        assert 'Zip' == archive.get_best_handler(test_file).name
+        assert archive.should_extract(test_file, kinds=extractcode.all_kinds)
+        assert archive.get_extractor(test_file) is archive.extract_zip
+        assert not sevenzip.is_rar(test_file)
+        assert 1 == archive._get_type.cache_info().misses
+        assert 1 == archive._get_best_handler.cache_info().misses
+
+        tar_file = self.get_test_loc('archive/tar/tarred.tar')
+        fileutils.copyfile(tar_file, test_file)
+        assert 'Tar' == archive.get_best_handler(test_file).name
+        assert 2 == archive._get_type.cache_info().misses
+
+    def test_get_handlers_index_has_parity_with_a_linear_scan_on_all_test_files(self):
+        from commoncode import filetype
+        from typecode import contenttype
+
+        def get_handlers_linear(location):
+            # reference linear scan over all the handlers
+            T = contenttype.Type(location)
+            ftype = T.filetype_file.lower()
+            mtype = T.mimetype_file
+            for handler in archive.archive_handlers:
+                if not handler.extractors:
+                    continue
+                type_matched = handler.filetypes and any(t in ftype for t in handler.filetypes)
+                mime_matched = handler.mimetypes and any(m in mtype for m in handler.mimetypes)
+                exts = handler.extensions
+                if exts:
+                    extension_matched = exts and location.lower().endswith(exts)
+                if (
+                    handler.strict
+                    and not (type_matched and mime_matched and extension_matched)
+                ):
+                    continue
+                if type_matched or mime_matched or extension_matched:
+                    yield (
+                        handler,
+                        bool(type_matched),
+                        bool(mime_matched),
+                        bool(extension_matched),
+                    )
+
+        def get_best_handler_linear(location, kinds):
+            handlers = list(get_handlers_linear(location))
+            candidates = list(archive.score_handlers(handlers))
+            return archive.pick_best_handler(candidates, kinds=kinds)
+
+        tested = 0
+        for top, _dirs, files in os.walk(self.get_test_loc('.')):
+            for f in files:
+                location = os.path.join(top, f)
+                if not filetype.is_file(location):
+                    continue
+                tested += 1
+                expected = list(get_handlers_linear(location))
+                assert expected == list(archive.get_handlers(location)), location
+                for kinds in (extractcode.default_kinds, extractcode.all_kinds):
+                    expected = get_best_handler_linear(location, kinds)
+                    assert expected == archive.get_best_handler(location, kinds), location
+        assert tested > 500
+
+    def test_is_plausible_archive(self):
+        assert not archive.is_plausible_archive(self.get_test_loc('archive/tar/testtar.README'))
+        assert archive.is_plausible_archive(self.get_test_loc('archive/tar/tarred.tar'))
+        assert archive.is_plausible_archive(self.get_test_loc('archive/zip/basic.zip'))
+
+        # plain text files are plausible archives with an archive extension
+        test_file = self.get_test_loc('archive/tar/testtar.README', copy=True)
+        renamed = test_file + '.tar.gz'
+        os.rename(test_file, renamed)
+        assert archive.is_plausible_archive(renamed)
+
+    def test_get_extraction_cost_weighs_size_by_format(self):
+        test_dir = self.get_temp_dir()
+        costs = {}
+        for name in ('a.tar', 'a.iso', 'a.txt', 'a.bin'):
+            location = os.path.join(test_dir, name)
+            with open(location, 'wb') as out:
+                if name == 'a.bin':
+                    # a large 7zip archive without an extension is sniffed
+                    out.write(b'7z\xbc\xaf\x27\x1c')
+                    out.truncate(archive.COST_SNIFF_MIN_SIZE)
+                else:
+                    out.write(b'x' * 1000)
+            costs[name] = archive.get_extraction_cost(location)
+
+        assert 1000 == costs['a.tar']
+        assert 1000 == costs['a.txt']
+        assert costs['a.iso'] > costs['a.tar']
+        assert archive.COST_SNIFF_MIN_SIZE * 4 == costs['a.bin']
+        assert 0 == archive.get_extraction_cost(os.path.join(test_dir, 'missing'))
+
+    def test_get_signature_detects_tar_headers_with_a_valid_checksum(self):
+        import tarfile
+        header = tarfile.TarInfo('foo.txt').tobuf(format=tarfile.USTAR_FORMAT)
+        assert 'tar' == archive.get_signature(header)
+
+        # remove the ustar magic as in an old V7 tar header
+        v7_header = header[:257] + bytes(8) + header[265:]
+        assert not archive.is_tar_header(v7_header)
+        checksum = sum(v7_header[:148] + b' ' * 8 + v7_header[156:512])
+        v7_header = v7_header[:148] + b'%06o\x00 ' % checksum + v7_header[156:]
+        assert archive.is_tar_header(v7_header)
+        assert 'tar' == archive.get_signature(v7_header)
+
     def test_get_handlers(self):
         test_data = [
             ('archive/deb/adduser_3.112ubuntu1_all.deb', ['Tar', 'Debian package']),
@@ -439,9 +551,77 @@ class TestUncompressGzip(BaseArchiveTestCase):
         test_file = self.get_test_loc('archive/gzip/file_4.26-1.diff.gz')
         test_dir = self.get_temp_dir()
         archive.uncompress_gzip(test_file, test_dir)
-        result = os.path.join(test_dir, 'file_4.26-1.diff.gz-extract')
+        result = os.path.join(test_dir, 'file_4.26-1.diff')
         assert os.path.exists(result)
 
+    def test_get_gzip_uncompressed_name(self):
+        from extractcode import uncompress
+        test_file = self.get_test_loc('archive/gzip/twofiles.gz')
+        assert 'f1' == uncompress.get_gzip_original_name(test_file)
+        # without a name in the header, strip the extension
+        test_file = self.get_test_loc('archive/gzip/file_4.26-1.diff.gz')
+        assert uncompress.get_gzip_original_name(test_file) is None
+        assert 'file_4.26-1.diff' == uncompress.get_gzip_uncompressed_name(test_file)
+
+    def test_iter_gz_compressed_file_content_streams_bounded_chunks(self):
+        from extractcode import uncompress
+        test_file = self.get_test_loc('archive/gzip/file_4.26-1.diff.gz')
+        expected, _warnings = uncompress.get_gz_compressed_file_content(test_file)
+        chunks = list(uncompress.iter_gz_compressed_file_content(test_file, chunk_size=1000))
+        assert all(len(c) <= 1000 for c in chunks)
+        assert len(chunks) > 1
+        assert expected == b''.join(chunks)
+
+        with uncompress.open_gz_compressed_file(test_file) as content:
+            assert expected[:100] == content.read(100)
+
+    def test_uncompress_gzip_bgzf_in_parallel_is_the_same_as_serial(self):
+        import gzip
+        import zlib
+        from extractcode import uncompress
+
+        def bgzf_block(data):
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            deflated = compressor.compress(data) + compressor.flush()
+            block_size = 18 + len(deflated) + 8
+            header = (
+                b'\x1f\x8b\x08\x04' + bytes(4) + b'\x00\xff'
+                + (6).to_bytes(2, 'little') + b'BC' + (2).to_bytes(2, 'little')
+                + (block_size - 1).to_bytes(2, 'little')
+            )
+            trailer = zlib.crc32(data).to_bytes(4, 'little') + len(data).to_bytes(4, 'little')
+            return header + deflated + trailer
+
+        test_file = os.path.join(self.get_temp_dir(), 'data.bin.gz')
+        with open(test_file, 'wb') as out:
+            for i in range(100):
+                out.write(bgzf_block(os.urandom(30000) + bytes(30000)))
+            out.write(bgzf_block(b''))
+
+        members = uncompress.get_bgzf_members(test_file)
+        assert 101 == len(members)
+        assert os.path.getsize(test_file) == members[-1][1]
+
+        target = os.path.join(self.get_temp_dir(), 'parallel')
+        assert uncompress.uncompress_file_in_parallel(
+            test_file, target, gzip.GzipFile, threads=4)
+        with open(target, 'rb') as result:
+            with gzip.GzipFile(test_file) as expected:
+                assert expected.read() == result.read()
+
+    def test_uncompress_in_parallel_is_not_used_for_regular_gzip(self):
+        from extractcode import uncompress
+        test_file = self.get_test_loc('archive/gzip/file_4.26-1.diff.gz')
+        assert uncompress.get_bgzf_members(test_file) is None
+
+    def test_get_gzip_backend(self):
+        from extractcode import uncompress
+        backend = uncompress.get_gzip_backend('stdlib')
+        assert 'stdlib' == backend.name
+        assert uncompress.get_gzip_backend().name in uncompress.GZIP_BACKENDS
+        with pytest.raises(Exception, match='Unknown gzip backend'):
+            uncompress.get_gzip_backend('foo')
+
     def test_uncompress_concatenated_gzip(self):
         # Archive created with:
         # echo "f1content" > f1
@@ -451,7 +631,8 @@ class TestUncompressGzip(BaseArchiveTestCase):
         test_file = self.get_test_loc('archive/gzip/twofiles.gz')
         test_dir = self.get_temp_dir()
         warnings = archive.uncompress_gzip(test_file, test_dir)
-        result = os.path.join(test_dir, 'twofiles.gz-extract')
+        # named after the original name of the first member
+        result = os.path.join(test_dir, 'f1')
         assert os.path.exists(result)
         assert b'f1content\nf2content\n' == open(result, 'rb').read()
         assert [] == warnings
@@ -480,25 +661,27 @@ class TestUncompressGzip(BaseArchiveTestCase):
         self.assertRaisesInstance(expected, archive.uncompress_gzip, test_file, test_dir)
 
     def test_uncompress_gzip_with_backslash_in_path(self):
-        # weirdly enough, gzip keeps the original path/name
+        # weirdly enough, gzip keeps the original path/name: only the last
+        # segment of this path is used
         test_file = self.get_test_loc('archive/gzip/backslash_path.gz')
         test_dir = self.get_temp_dir()
         archive.uncompress_gzip(test_file, test_dir)
-        result = os.path.join(test_dir, 'backslash_path.gz-extract')
+        assert ['that'] == os.listdir(test_dir)
+        result = os.path.join(test_dir, 'that')
         assert os.path.exists(result)
 
     def test_uncompress_gzip_can_uncompress_windows_ntfs_wmz(self):
         test_file = self.get_test_loc('archive/wmz/image003.wmz')
         test_dir = self.get_temp_dir()
         archive.uncompress_gzip(test_file, test_dir)
-        result = os.path.join(test_dir, 'image003.wmz-extract')
+        result = os.path.join(test_dir, 'image003')
         assert os.path.exists(result)
 
     def test_uncompress_gzip_can_uncompress_mysql_arz(self):
         test_file = self.get_test_loc('archive/gzip/mysql-arch.ARZ')
         test_dir = self.get_temp_dir()
         archive.uncompress_gzip(test_file, test_dir)
-        result = os.path.join(test_dir, 'mysql-arch.ARZ-extract')
+        result = os.path.join(test_dir, 'mysql-arch')
         assert os.path.exists(result)
 
 
@@ -615,6 +798,38 @@ class TestUncompressBz2(BaseArchiveTestCase):
         result = os.path.join(test_dir, 'example-file.csv.bz2-extract')
         assert open(expected, 'rb').read() == open(result, 'rb').read()
 
+    def test_uncompress_bzip2_multistream_in_parallel_is_the_same_as_serial(self):
+        import bz2
+        from extractcode import uncompress
+
+        test_file = os.path.join(self.get_temp_dir(), 'data.bin.bz2')
+        with open(test_file, 'wb') as out:
+            for i in range(4):
+                out.write(bz2.compress(os.urandom(600000) + bytes(400000)))
+            # trailing garbage must be handled as in a serial decompression
+            out.write(b'garbage')
+
+        assert 4 == len(uncompress.get_bzip2_streams(test_file))
+        test_dir = self.get_temp_dir()
+        archive.uncompress_bzip2(test_file, test_dir)
+        with open(os.path.join(test_dir, 'data.bin.bz2-extract'), 'rb') as result:
+            with bz2.BZ2File(test_file) as expected:
+                assert expected.read() == result.read()
+
+        target = os.path.join(test_dir, 'parallel')
+        assert not uncompress.uncompress_file_in_parallel(
+            test_file, target, bz2.BZ2File, threads=4)
+        assert not os.path.exists(target)
+
+        # without trailing garbage the streams are decompressed in parallel
+        with open(test_file, 'r+b') as out:
+            out.truncate(os.path.getsize(test_file) - len('garbage'))
+        assert uncompress.uncompress_file_in_parallel(
+            test_file, target, bz2.BZ2File, threads=4)
+        with open(target, 'rb') as result:
+            with bz2.BZ2File(test_file) as expected:
+                assert expected.read() == result.read()
+
 
 class TestSevenzipBz2(BaseArchiveTestCase):
 
@@ -1670,6 +1885,232 @@ class TestExtractTwice(BaseArchiveTestCase):
         assert exists(join(test_tgt_dir, 'usr/sbin/abrt-dbus'))
 
 
+class TestListEntries(BaseArchiveTestCase):
+
+    def check_list_entries(self, test_file):
+        """
+        Check that listing and extracting ``test_file`` return the same paths.
+        """
+        test_file = self.get_test_loc(test_file)
+        listed = sorted(
+            e.path.strip('/') for e in archive.list_entries(test_file)
+            if not e.is_dir
+        )
+        test_dir = self.get_temp_dir()
+        archive.get_extractor(test_file)(test_file, test_dir)
+        extracted = sorted(
+            p.strip('/') for p in self.collect_extracted_path(test_dir)
+            if not p.endswith('/')
+        )
+        assert extracted == listed
+
+    def test_list_entries_tar_gz(self):
+        self.check_list_entries('archive/tgz/tarred_gzipped.tgz')
+
+    def test_list_entries_tar_xz(self):
+        self.check_list_entries('archive/lzma_xz/texlive-core-patches-20.tar.xz')
+
+    def test_list_entries_tar_lzip_zstd_and_lz4_in_one_pass(self):
+        self.check_list_entries('archive/lzip/sample.tar.lz')
+        self.check_list_entries('archive/zstd/sample.tar.zst')
+        self.check_list_entries('archive/lz4/sample.tar.lz4')
+
+        test_file = self.get_test_loc('archive/zstd/sample.tar.zst')
+        with mock.patch.object(fileutils, 'get_temp_dir') as get_temp_dir:
+            assert list(archive.list_entries(test_file))
+        assert not get_temp_dir.called
+
+    def test_list_entries_zip_and_7z(self):
+        self.check_list_entries('archive/zip/basic.zip')
+        self.check_list_entries('archive/7z/z.7z')
+
+    def test_list_entries_tar_7z_with_several_tarballs(self):
+        self.check_list_entries('archive/7z/two_tarballs.tar.7z')
+        self.check_list_entries('archive/7z/one_tarball.tar.7z')
+
+    def test_list_entries_iso_with_sevenzip(self):
+        self.check_list_entries('archive/iso/small.iso')
+
+    def test_list_sevenzip_does_not_know_the_size_of_directories(self):
+        test_file = self.get_test_loc('archive/iso/small.iso')
+        sizes = {e.path: e.size for e in archive.list_sevenzip(test_file)}
+        assert None == sizes['this']
+        assert 0 == sizes['this/that']
+        assert 77 == sizes['freebase.ABOUT']
+
+    def test_list_entries_gzip_is_named_like_the_extracted_file(self):
+        # named after the original name stored in the gzip header
+        self.check_list_entries('archive/gzip/twofiles.gz')
+        # named after the gzip file name without its extension
+        self.check_list_entries('archive/gzip/file_4.26-1.diff.gz')
+
+    def test_list_entries_rpm_streams_the_payload(self):
+        test_file = self.get_test_loc('archive/rpm/xz-compressed-cpio.rpm')
+        paths = [e.path for e in archive.list_entries(test_file)]
+        assert './usr/sbin/abrt-dbus' in paths
+
+    def test_list_entries_compressed_file_does_not_know_the_size(self):
+        test_file = self.get_test_loc('archive/Z/tr2tex.Z')
+        expected = [archive.ArchiveEntry(
+            path='tr2tex',
+            size=None,
+            is_file=True,
+            is_dir=False,
+            is_symlink=False,
+            is_hardlink=False,
+            is_special=False,
+            link_target=None,
+        )]
+        assert expected == list(archive.list_entries(test_file))
+
+    def test_list_extracted_for_extractors_without_listing_support(self):
+        test_file = self.get_test_loc('archive/tgz/tarred_gzipped.tgz')
+        listed = archive.list_extracted(test_file, extractor=archive.extract_tar)
+        expected = ['e', 'e/a', 'e/a/b.txt', 'e/b', 'e/b/a.txt', 'e/c.txt']
+        assert expected == sorted(e.path for e in listed)
+
+    def test_list_entries_of_a_non_archive_is_empty(self):
+        test_file = self.get_test_loc('archive/lzma_xz/ABOUT.txt')
+        assert [] == list(archive.list_entries(test_file))
+
+    def test_list_entries_broken_rpm_raises_7zip_error(self):
+        test_file = self.get_test_loc('archive/rpm/broken.rpm')
+        expected = Exception('CRC Failed : broken')
+        self.assertRaisesInstance(
+            expected, lambda: list(archive.list_entries(test_file)))
+
+
+class TestSelectiveExtraction(BaseArchiveTestCase):
+
+    def test_get_extractor_with_include_selects_inner_entries_of_nested_archives(self):
+        test_file = self.get_test_loc('archive/lzma_xz/texlive-core-patches-20.tar.xz')
+        test_dir = self.get_temp_dir()
+        extractor = archive.get_extractor(test_file, include=('*/series',))
+        assert [] == extractor(test_file, test_dir)
+        assert ['/patches/', '/patches/series'] == self.collect_extracted_path(test_dir)
+
+    def test_get_extractor_with_include_streams_rpm_payload(self):
+        test_file = self.get_test_loc('archive/rpm/xz-compressed-cpio.rpm')
+        test_dir = self.get_temp_dir()
+        extractor = archive.get_extractor(test_file, include=('*/abrt-dbus',))
+        assert [] == extractor(test_file, test_dir)
+        files = [p for p in self.collect_extracted_path(test_dir) if not p.endswith('/')]
+        assert ['/usr/sbin/abrt-dbus'] == files
+
+    def test_extract_selected_filters_extracted_files(self):
+        test_file = self.get_test_loc('archive/Z/tr2tex.Z')
+        test_dir = self.get_temp_dir()
+        extractor = archive.get_extractor(test_file, exclude=('tr2tex',))
+        extractor(test_file, test_dir)
+        assert [] == os.listdir(test_dir)
+
+
+class TestOpenMember(BaseArchiveTestCase):
+
+    def test_open_member_of_zip_based_archive(self):
+        test_file = self.get_test_loc('archive/shar/demo-spring-boot.jar')
+        with archive.open_member(test_file, 'META-INF/MANIFEST.MF') as member:
+            assert b'Manifest-Version: 1.0\r\n\r\n' == member.read()
+
+    def test_open_member_reuses_parsed_zip_files(self):
+        test_file = self.get_test_loc('api/doc.docx')
+        zip_file = archive.get_zip_file(test_file)
+        assert zip_file is archive.get_zip_file(test_file)
+        with archive.open_member(test_file, './c/a/a.txt') as member:
+            assert member.read().startswith(b'bbbb')
+
+    def test_get_zip_file_closes_evicted_zip_files(self):
+        zip1 = self.get_test_loc('api/doc.docx', copy=True)
+        zip2 = self.get_test_loc('archive/zip/basic.zip', copy=True)
+        cache_size = archive.ZIP_CACHE_SIZE
+        try:
+            archive.close_zip_files()
+            archive.ZIP_CACHE_SIZE = 1
+            member = archive.open_member(zip1, 'c/a/a.txt')
+            zip_file1 = archive.get_zip_file(zip1)
+            zip_file2 = archive.get_zip_file(zip2)
+            assert zip_file1.fp is None
+            assert zip_file2.fp is not None
+            # an opened member can still be read
+            with member:
+                assert member.read().startswith(b'bbbb')
+        finally:
+            archive.ZIP_CACHE_SIZE = cache_size
+            archive.close_zip_files()
+        assert zip_file2.fp is None
+
+    def test_open_member_of_other_archives_closes_the_archive(self):
+        from unittest import mock
+        test_file = self.get_test_loc('archive/tgz/tarred_gzipped.tgz')
+        close = libarchive2.Archive.close
+        with mock.patch.object(
+            libarchive2.Archive, 'close', autospec=True, side_effect=close,
+        ) as mock_close:
+            member = archive.open_member(test_file, 'e/a/b.txt')
+            assert mock_close.called
+        with member:
+            assert b'b\n' == member.read()
+
+    def test_open_member_of_other_archives(self):
+        test_file = self.get_test_loc('archive/tgz/tarred_gzipped.tgz')
+        with archive.open_member(test_file, 'e/a/b.txt') as member:
+            assert b'b\n' == member.read()
+
+    def test_open_member_raises_exception_on_missing_members(self):
+        for test_file in ('api/doc.docx', 'archive/tgz/tarred_gzipped.tgz'):
+            test_file = self.get_test_loc(test_file)
+            self.assertRaises(
+                ExtractError, archive.open_member, test_file, 'not/there')
+
+
+class TestExtractStreamed(BaseArchiveTestCase):
+
+    def test_get_extractor_extracts_compressed_tarballs_with_libarchive(self):
+        for test_file in (
+            'archive/lzma_xz/texlive-core-patches-20.tar.xz',
+            'archive/lzma_xz/coreutils-8.5-patches-1.tar.lzma',
+            'archive/Z/tkWWW-0.11.tar.Z',
+        ):
+            test_file = self.get_test_loc(test_file)
+            assert archive.get_extractor(test_file) is archive.extract_compressed_tar
+
+    def test_extract_compressed_tar_is_the_same_as_extract_streamed(self):
+        test_file = self.get_test_loc('archive/lzma_xz/texlive-core-patches-20.tar.xz')
+        streamed_dir = self.get_temp_dir()
+        assert [] == archive.extract_streamed(test_file, streamed_dir)
+        native_dir = self.get_temp_dir()
+        assert [] == archive.extract_compressed_tar(test_file, native_dir)
+        assert self.collect_extracted_path(streamed_dir) == self.collect_extracted_path(native_dir)
+
+    def test_extract_streamed_is_the_same_as_extract_twice(self):
+        test_file = self.get_test_loc('archive/Z/tkWWW-0.11.tar.Z')
+        twice_dir = self.get_temp_dir()
+        result = archive.extract_twice(
+            test_file,
+            twice_dir,
+            extractor1=archive.extract_Z,
+            extractor2=archive.extract_tar,
+        )
+        assert [] == result
+        streamed_dir = self.get_temp_dir()
+        result = archive.extract_streamed(test_file, streamed_dir)
+        assert [] == result
+        assert self.collect_extracted_path(twice_dir) == self.collect_extracted_path(streamed_dir)
+
+    def test_extract_streamed_with_rpm_with_xz_compressed_cpio(self):
+        test_file = self.get_test_loc('archive/rpm/xz-compressed-cpio.rpm')
+        test_dir = self.get_temp_dir()
+        result = archive.extract_streamed(test_file, test_dir)
+        assert [] == result
+        assert os.path.exists(os.path.join(test_dir, 'usr/sbin/abrt-dbus'))
+
+    def test_extract_streamed_broken_rpm_raises_7zip_error(self):
+        test_file = self.get_test_loc('archive/rpm/broken.rpm')
+        test_dir = self.get_temp_dir()
+        expected = Exception('CRC Failed : broken')
+        self.assertRaisesInstance(expected, archive.extract_streamed, test_file, test_dir)
+
+
 class TestRar(BaseArchiveTestCase):
 
     def test_extract_rar_basic(self):
@@ -1753,6 +2194,35 @@ class TestSevenZip(BaseArchiveTestCase):
         expected = ['z/a/a.txt', 'z/b/a.txt', 'z/c/a.txt']
         check_files(test_dir, expected)
 
+    def test_extract_tar_7z_with_a_single_tarball_is_streamed(self):
+        test_file = self.get_test_loc('archive/7z/one_tarball.tar.7z')
+        assert archive.extract_tar_7z == archive.get_extractor(test_file)
+        assert archive.has_single_file(test_file)
+        test_dir = self.get_temp_dir()
+        result = archive.extract_tar_7z(test_file, test_dir)
+        assert [] == result
+        check_files(test_dir, ['a/a.txt'])
+
+    def test_extract_tar_7z_with_padding_after_the_end_of_the_tarball(self):
+        # libarchive stops reading at the end-of-archive marker of the tarball
+        # and 4 MB of zero padding are left unread in the 7z output
+        test_file = self.get_test_loc('archive/7z/padded_tarball.tar.7z')
+        for extractor in (archive.get_extractor(test_file), archive.extract_streamed):
+            test_dir = self.get_temp_dir()
+            result = extractor(test_file, test_dir)
+            assert [] == result
+            check_files(test_dir, ['p/a.txt'])
+        paths = [e.path for e in archive.list_entries(test_file)]
+        assert ['p/', 'p/a.txt'] == paths
+
+    def test_extract_tar_7z_with_several_tarballs_extracts_all_tarballs(self):
+        test_file = self.get_test_loc('archive/7z/two_tarballs.tar.7z')
+        assert not archive.has_single_file(test_file)
+        test_dir = self.get_temp_dir()
+        result = archive.get_extractor(test_file)(test_file, test_dir)
+        assert [] == result
+        check_files(test_dir, ['a/a.txt', 'b/b.txt'])
+
     def test_extract_7z_with_trailing_data(self):
         test_file = self.get_test_loc('archive/7z/7zip_trailing.7z')
         test_dir = self.get_temp_dir()
@@ -1891,6 +2361,27 @@ class TestIso(BaseArchiveTestCase):
 
 class TestXzLzma(BaseArchiveTestCase):
 
+    def test_get_uncompressed_name_uses_sevenzip_conventions(self):
+        from extractcode.uncompress import get_uncompressed_name
+        assert 'a' == get_uncompressed_name('/tmp/a.xz')
+        assert 'a.tar' == get_uncompressed_name('/tmp/a.tar.xz')
+        assert 'a.tar' == get_uncompressed_name('/tmp/a.TXZ', tar_extensions=('.txz',))
+        assert 'a' == get_uncompressed_name('/tmp/a.tlz')
+        assert 'a~' == get_uncompressed_name('/tmp/a')
+
+    def test_uncompress_xz_is_the_same_as_sevenzip(self):
+        from extractcode import sevenzip
+        from extractcode.uncompress import uncompress_xz
+        test_file = self.get_test_loc('archive/lzma_xz/texlive-core-patches-20.tar.xz')
+        native_dir = self.get_temp_dir()
+        assert [] == uncompress_xz(test_file, native_dir)
+        sevenzip_dir = self.get_temp_dir()
+        sevenzip.extract(test_file, sevenzip_dir)
+        assert os.listdir(sevenzip_dir) == os.listdir(native_dir)
+        with open(os.path.join(native_dir, 'texlive-core-patches-20.tar'), 'rb') as native:
+            with open(os.path.join(sevenzip_dir, 'texlive-core-patches-20.tar'), 'rb') as expected:
+                assert expected.read() == native.read()
+
     def check_lzma_extract(self, extract_fun, test_file, expected):
         test_file = self.get_test_loc(test_file)
         extract_dir = self.get_temp_dir()
@@ -1939,7 +2430,7 @@ class TestDia(BaseArchiveTestCase):
         test_file = self.get_test_loc('archive/dia/dia.dia')
         test_dir = self.get_temp_dir()
         archive.uncompress_gzip(test_file, test_dir)
-        result = os.path.join(test_dir, 'dia.dia-extract')
+        result = os.path.join(test_dir, 'dia')
         assert os.path.exists(result)
 
     @pytest.mark.xfail(reason='Fails for now on Python 3')
@@ -1987,7 +2478,7 @@ class TestDia(BaseArchiveTestCase):
         test_dir = self.get_temp_dir()
         ext = archive.get_extractor(test_file)
         ext(test_file, test_dir)
-        result = os.path.join(test_dir, 'infoset-doc.dia-extract')
+        result = os.path.join(test_dir, 'infoset-doc')
         assert os.path.exists(result)
 
 
@@ -2007,6 +2498,24 @@ class TestTarZ(BaseArchiveTestCase):
         result = os.path.join(test_dir, 'tr2tex')
         assert os.path.exists(result)
 
+    def test_uncompress_Z_is_the_same_as_sevenzip(self):
+        from extractcode import sevenzip
+        from extractcode.uncompress import uncompress_Z
+        test_file = self.get_test_loc('archive/Z/tkWWW-0.11.tar.Z')
+        native_dir = self.get_temp_dir()
+        assert [] == uncompress_Z(test_file, native_dir)
+        sevenzip_dir = self.get_temp_dir()
+        sevenzip.extract(test_file, sevenzip_dir)
+        with open(os.path.join(native_dir, 'tkWWW-0.11.tar'), 'rb') as native:
+            with open(os.path.join(sevenzip_dir, 'tkWWW-0.11.tar'), 'rb') as expected:
+                assert expected.read() == native.read()
+
+    def test_uncompress_Z_fails_on_a_file_not_compressed(self):
+        from extractcode.uncompress import uncompress_Z
+        test_file = self.get_test_loc('archive/xar/xar-1.4.xar')
+        test_dir = self.get_temp_dir()
+        self.assertRaises(ExtractError, uncompress_Z, test_file, test_dir)
+
 
 class TestXar(BaseArchiveTestCase):
 
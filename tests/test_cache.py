@@ -0,0 +1,146 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/extractcode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+import stat
+
+from commoncode import fileutils
+
+from extractcode_assert_utils import check_files
+from extractcode_assert_utils import check_no_error
+from extractcode_assert_utils import BaseArchiveTestCase
+
+from extractcode import cache
+from extractcode import extract
+
+
+class TestExtractionCache(BaseArchiveTestCase):
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def create_tree(self, files):
+        test_dir = self.get_temp_dir()
+        for path, content in files.items():
+            location = os.path.join(test_dir, path)
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            with open(location, 'w') as out:
+                out.write(content)
+        return test_dir
+
+    def test_get_cache_key_depends_on_content_handler_and_version(self):
+        test_file = self.get_test_loc('extract/basic_non_nested.tar.gz')
+        key = cache.get_cache_key(test_file, 'Tar', version='1.0')
+        assert key == cache.get_cache_key(test_file, 'Tar', version='1.0')
+        assert key != cache.get_cache_key(test_file, 'Zip', version='1.0')
+        assert key != cache.get_cache_key(test_file, 'Tar', version='2.0')
+        other_file = self.get_test_loc('extract/small/empty_small.zip')
+        assert key != cache.get_cache_key(other_file, 'Tar', version='1.0')
+
+    def test_cache_get_and_put(self):
+        test_cache = cache.ExtractionCache(self.get_temp_dir())
+        source = self.create_tree({'a/b.txt': 'b', 'c.txt': 'c'})
+
+        target = self.get_temp_dir()
+        assert test_cache.get('somekey', target) is None
+        assert (0, 1) == (test_cache.hits, test_cache.misses)
+
+        test_cache.put('somekey', source, warnings=['some warning'])
+        assert ['some warning'] == test_cache.get('somekey', target)
+        check_files(target, ['a/b.txt', 'c.txt'])
+        assert (1, 1) == (test_cache.hits, test_cache.misses)
+
+    def test_cache_put_stores_a_read_only_copy(self):
+        test_cache = cache.ExtractionCache(self.get_temp_dir())
+        source = self.create_tree({'a/b.txt': 'b'})
+        test_cache.put('somekey', source)
+
+        # the source tree can be modified without changing the cached tree
+        with open(os.path.join(source, 'a', 'b.txt'), 'w') as out:
+            out.write('modified')
+        target = self.get_temp_dir()
+        test_cache.get('somekey', target)
+        linked = os.path.join(target, 'a', 'b.txt')
+        with open(linked) as inp:
+            assert 'b' == inp.read()
+
+        # a file extracted as a hardlink cannot be modified in place
+        assert not os.stat(linked).st_mode & stat.S_IWUSR
+
+        # a file extracted as a copy can be modified
+        copied_cache = cache.ExtractionCache(test_cache.cache_dir, link=False)
+        target = self.get_temp_dir()
+        copied_cache.get('somekey', target)
+        copied = os.path.join(target, 'a', 'b.txt')
+        with open(copied, 'w') as out:
+            out.write('modified')
+        assert not os.path.samefile(linked, copied)
+
+    def test_cache_evicts_least_recently_used_entries(self):
+        test_cache = cache.ExtractionCache(self.get_temp_dir(), max_size=25)
+        for key in ('one', 'two'):
+            source = self.create_tree({'f.txt': 'x' * 10})
+            test_cache.put(key, source)
+
+        # use "one" such that "two" is the least recently used
+        one_info = os.path.join(test_cache.get_entry_dir('one'), cache.ENTRY_INFO)
+        two_info = os.path.join(test_cache.get_entry_dir('two'), cache.ENTRY_INFO)
+        os.utime(two_info, (1, 1))
+        assert test_cache.get('one', self.get_temp_dir()) is not None
+        assert os.path.exists(one_info)
+
+        source = self.create_tree({'f.txt': 'x' * 10})
+        test_cache.put('three', source)
+        assert ['one', 'three'] == sorted(k for _, _, k in test_cache.get_entries())
+
+    def test_extract_with_cache_dir_reuses_cached_extraction(self):
+        cache_dir = self.get_temp_dir()
+        expected = ['a/b/a.txt', 'a/b/b.txt', 'a/c/c.txt']
+
+        first = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        result = list(extract.extract(first, cache_dir=cache_dir))
+        check_no_error(result)
+        check_files(first + '-extract', expected)
+        assert [False] == [xev.cached for xev in result if xev.done]
+
+        # add a file to the cached tree to check that it is reused
+        test_cache = cache.get_cache(cache_dir)
+        [(_, _, key)] = test_cache.get_entries()
+        cached_tree = os.path.join(test_cache.get_entry_dir(key), cache.ENTRY_TREE)
+        with open(os.path.join(cached_tree, 'cached.txt'), 'w') as out:
+            out.write('cached')
+
+        second = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        result = list(extract.extract(second, cache_dir=cache_dir))
+        check_no_error(result)
+        check_files(second + '-extract', expected + ['cached.txt'])
+        assert [True] == [xev.cached for xev in result if xev.done]
+
+    def test_extract_in_parallel_reports_cache_hits_to_the_parent(self):
+        cache_dir = self.get_temp_dir()
+        test_dir = self.get_temp_dir()
+        test_file = self.get_test_loc('extract/basic_non_nested.tar.gz')
+        for name in ('first', 'second'):
+            os.mkdir(os.path.join(test_dir, name))
+            fileutils.copyfile(test_file, os.path.join(test_dir, name))
+
+        result = list(extract.extract(test_dir, cache_dir=cache_dir, jobs=2))
+        check_no_error(result)
+        cached = [xev.cached for xev in result if xev.done]
+        # both archives may miss if they are extracted at the same time
+        assert 2 == len(cached)
+        assert False in cached
+
+        result = list(extract.extract(test_dir, cache_dir=cache_dir, jobs=2))
+        check_no_error(result)
+        assert [True, True] == [xev.cached for xev in result if xev.done]
+
+    def test_extract_without_cache_dir_reports_no_cache_lookup(self):
+        test_file = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        result = list(extract.extract(test_file))
+        check_no_error(result)
+        assert [None] == [xev.cached for xev in result if xev.done]
@@ -224,6 +224,193 @@ class TestExtract(BaseArchiveTestCase):
         check_no_error(result)
         check_files(test_dir, expected)
 
+    def test_extract_tree_recursive_in_parallel_is_the_same_as_serial(self):
+        serial_dir = self.get_test_loc('extract/tree', copy=True)
+        serial = list(extract.extract(serial_dir, recurse=True))
+        check_no_error(serial)
+
+        parallel_dir = self.get_test_loc('extract/tree', copy=True)
+        parallel = list(extract.extract(parallel_dir, recurse=True, jobs=3))
+        check_no_error(parallel)
+
+        def relative_events(events, base):
+            return sorted(
+                (e.source.replace(base, ''), e.target.replace(base, ''), e.done)
+                for e in events
+            )
+
+        assert relative_events(serial, serial_dir) == relative_events(parallel, parallel_dir)
+
+        def relative_files(base):
+            return sorted(
+                os.path.join(top, f).replace(base, '')
+                for top, _, files in os.walk(base) for f in files
+            )
+
+        assert relative_files(serial_dir) == relative_files(parallel_dir)
+
+    def test_extract_in_parallel_yields_start_and_done_events_in_pairs(self):
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        result = list(extract.extract(test_dir, recurse=False, jobs=2))
+        check_no_error(result)
+        starts = result[0::2]
+        dones = result[1::2]
+        assert all(not e.done for e in starts)
+        assert all(e.done for e in dones)
+        assert [e.source for e in starts] == [e.source for e in dones]
+
+    def test_extract_in_parallel_submits_only_plausible_archives_in_a_bounded_window(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        class RecordingExecutor(ThreadPoolExecutor):
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.submitted = []
+                self.not_done = set()
+                self.max_not_done = 0
+
+            def submit(self, fn, location, *args, **kwargs):
+                self.submitted.append(location)
+                future = super().submit(fn, location, *args, **kwargs)
+                self.not_done.add(future)
+                future.add_done_callback(self.not_done.discard)
+                self.max_not_done = max(self.max_not_done, len(self.not_done))
+                return future
+
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        for i in range(50):
+            with open(os.path.join(test_dir, f'plain{i}.txt'), 'w') as out:
+                out.write('not an archive')
+
+        with RecordingExecutor(max_workers=1) as executor:
+            result = list(extract.extract(
+                test_dir, recurse=True, jobs=1, executor=executor))
+        check_no_error(result)
+
+        extracted = sorted(e.source for e in result if e.done)
+        assert 5 == len(extracted)
+        assert extracted == sorted(executor.submitted)
+        assert executor.max_not_done <= extract.IN_FLIGHT_PER_JOB
+
+    def test_extract_in_parallel_submits_before_the_end_of_the_walk(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+
+        submitted = []
+        # (location, number of submitted extractions) for each computed cost
+        costed = []
+
+        class RecordingExecutor(ThreadPoolExecutor):
+
+            def submit(self, fn, location, *args, **kwargs):
+                submitted.append(location)
+                return super().submit(fn, location, *args, **kwargs)
+
+        get_cost = extractcode.archive.get_extraction_cost
+
+        def recording_get_cost(location):
+            costed.append((location, len(submitted)))
+            return get_cost(location)
+
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        for i in range(20):
+            with open(os.path.join(test_dir, f'plain{i}.txt'), 'w') as out:
+                out.write('not an archive')
+
+        with mock.patch.object(
+            extractcode.archive,
+            'get_extraction_cost',
+            side_effect=recording_get_cost,
+        ):
+            with RecordingExecutor(max_workers=1) as executor:
+                result = list(extract.extract(
+                    test_dir, recurse=False, jobs=1, executor=executor))
+        check_no_error(result)
+
+        # the cost is only computed for the submitted candidates
+        assert sorted(submitted) == sorted(loc for loc, _ in costed)
+        # the first archives are submitted before the last one is found
+        assert costed[-1][1] > 0
+
+    def test_extract_async_is_the_same_as_parallel(self):
+        import asyncio
+
+        async def collect(location):
+            return [e async for e in extract.extract_async(location, recurse=True, jobs=2)]
+
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        result = asyncio.run(collect(test_dir))
+        check_no_error(result)
+
+        expected_dir = self.get_test_loc('extract/tree', copy=True)
+        expected = list(extract.extract(expected_dir, recurse=True, jobs=2))
+        assert sorted((e.source.replace(expected_dir, ''), e.done) for e in expected) == (
+            sorted((e.source.replace(test_dir, ''), e.done) for e in result))
+
+    def test_extract_async_stopped_early_leaves_no_staging_directories(self):
+        import asyncio
+
+        async def first(location):
+            xevents = extract.extract_async(location, recurse=True, jobs=2)
+            async for xevent in xevents:
+                await xevents.aclose()
+                return xevent
+
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        assert asyncio.run(first(test_dir))
+        staging = [
+            d for _, dirs, _ in os.walk(test_dir) for d in dirs
+            if '-staging-' in d
+        ]
+        assert [] == staging
+
+    def test_extract_async_cancelled_with_a_slow_consumer_leaves_no_staging_directories(self):
+        import asyncio
+
+        async def consume(location):
+            async for _xevent in extract.extract_async(location, recurse=True, jobs=2):
+                await asyncio.sleep(0.2)
+
+        async def cancel(location):
+            task = asyncio.create_task(consume(location))
+            await asyncio.sleep(0.6)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        test_dir = self.get_test_loc('extract', copy=True)
+        asyncio.run(cancel(test_dir))
+        staging = [
+            d for _, dirs, _ in os.walk(test_dir) for d in dirs
+            if '-staging-' in d
+        ]
+        assert [] == staging
+
+    def test_extract_skips_and_deletes_leftover_staging_directories(self):
+        for jobs in (None, 2):
+            test_dir = self.get_test_loc('extract/tree', copy=True)
+            # a staging directory left by a killed extraction
+            staging = extract.get_staging_dir(
+                os.path.join(test_dir, 'a', 'a.tar.gz-extract'))
+            fileutils.copyfile(
+                os.path.join(test_dir, 'b', 'b.tar.gz'),
+                os.path.join(staging, 'partial.tar.gz'),
+            )
+
+            result = list(extract.extract(test_dir, recurse=True, jobs=jobs))
+            check_no_error(result)
+            assert not any('-staging-' in e.source for e in result)
+            assert not os.path.exists(staging)
+
+    def test_extract_with_include_and_exclude_patterns(self):
+        test_dir = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        result = list(extract.extract(test_dir, include=('a/b/*',), exclude=('*/b.txt',)))
+        check_no_error(result)
+        check_files(test_dir + '-extract', ['a/b/a.txt'])
+
     def test_extract_tree_recursive_replace_originals(self):
         expected = (
             'a/a.txt',
@@ -400,6 +587,40 @@ class TestExtract(BaseArchiveTestCase):
         expected = Exception('gzip decompression failed')
         self.assertRaisesInstance(expected, libarchive2.extract, test_file, test_dir)
 
+    def test_extract_file_does_not_leave_staging_directories(self):
+        test_file = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        base = fileutils.parent_directory(test_file)
+        target = extractcode.get_extraction_path(test_file)
+        result = list(extract.extract_file(test_file, target))
+        check_no_error(result)
+        assert sorted(os.listdir(base)) == ['basic_non_nested.tar.gz', 'basic_non_nested.tar.gz-extract']
+
+    def test_extract_file_merges_in_an_existing_target(self):
+        test_file = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        target = extractcode.get_extraction_path(test_file)
+        fileutils.create_dir(os.path.join(target, 'a', 'b'))
+        with open(os.path.join(target, 'a', 'b', 'a.txt'), 'w') as o:
+            o.write('to be overwritten')
+        with open(os.path.join(target, 'other.txt'), 'w') as o:
+            o.write('to be kept')
+
+        result = list(extract.extract_file(test_file, target))
+        check_no_error(result)
+        expected = ['a/b/a.txt', 'a/b/b.txt', 'a/c/c.txt', 'other.txt']
+        check_files(target, expected)
+        with open(os.path.join(target, 'a', 'b', 'a.txt')) as i:
+            assert i.read() != 'to be overwritten'
+
+    def test_move_tree_renames_to_a_new_target(self):
+        source = self.get_temp_dir()
+        fileutils.create_dir(os.path.join(source, 'a'))
+        with open(os.path.join(source, 'a', 'a.txt'), 'w') as o:
+            o.write('a')
+        target = os.path.join(self.get_temp_dir(), 'target')
+        extractcode.move_tree(source, target)
+        assert not os.path.exists(source)
+        check_files(target, ['a/a.txt'])
+
     @pytest.mark.skipif(not on_linux, reason='Expectations are different on Windows and macOS')
     def test_extract_tree_with_corrupted_archives_linux(self):
         expected = (
@@ -488,6 +709,23 @@ class TestExtract(BaseArchiveTestCase):
         check_no_error(result)
         check_files(test_file, expected)
 
+    def test_extract_nested_tar_file_recurse_in_parallel_extracts_nested_archives_as_new_tasks(self):
+        test_file = self.get_test_loc('extract/nested/nested_tars.tar.gz', copy=True)
+        result = list(extract.extract(test_file, recurse=True, jobs=2))
+        check_no_error(result)
+        sources = sorted(
+            e.source.replace(fileutils.parent_directory(test_file), '')
+            for e in result if e.done
+        )
+        expected = [
+            'nested_tars.tar.gz',
+            'nested_tars.tar.gz-extract/b/a/a.tar.gz',
+            'nested_tars.tar.gz-extract/b/c/a.tar.gz',
+        ]
+        assert sources == expected
+        assert os.path.exists(
+            test_file + '-extract/b/c/a.tar.gz-extract/a/c/c.txt')
+
     def test_extract_nested_tar_file_shallow_only(self):
         test_dir = self.get_test_loc('extract/nested/nested_tars.tar.gz', copy=True)
         expected = [
@@ -13,7 +13,9 @@ from os.path import join
 
 from commoncode.testcase import FileBasedTesting
 from commoncode import fileutils
+from extractcode import is_selected
 from extractcode import new_name
+from extractcode import NameRegistry
 
 
 class TestNewName(FileBasedTesting):
@@ -89,3 +91,58 @@ class TestNewName(FileBasedTesting):
         assert not exists(renamed)
         result = fileutils.file_name(renamed)
         assert '_' == result
+
+    def test_new_name_with_registry_returns_same_names_as_listing(self):
+        test_dir = self.get_test_loc('new_name/ext', copy=True)
+        for name, expected in [
+            ('test.txt', 'test_3.txt'),
+            ('TEST.tXt', 'TEST_3.tXt'),
+            ('foo.txt', 'foo.txt'),
+        ]:
+            location = join(test_dir, name)
+            assert expected == fileutils.file_name(new_name(location))
+            renamed = new_name(location, registry=NameRegistry())
+            assert expected == fileutils.file_name(renamed)
+
+    def test_new_name_with_registry_registers_new_names(self):
+        test_dir = self.get_temp_dir()
+        registry = NameRegistry()
+        location = join(test_dir, 'a.txt')
+        results = [
+            fileutils.file_name(new_name(location, registry=registry))
+            for _ in range(4)
+        ]
+        assert ['a.txt', 'a_1.txt', 'a_2.txt', 'a_3.txt'] == results
+
+        location = join(test_dir, 'A.TXT')
+        assert 'A_4.TXT' == fileutils.file_name(new_name(location, registry=registry))
+
+    def test_name_registry_add_registers_parent_directories(self):
+        test_dir = self.get_temp_dir()
+        registry = NameRegistry()
+        assert 'a' == fileutils.file_name(new_name(join(test_dir, 'a'), registry=registry))
+        registry.add(join(test_dir, 'b', 'c'))
+        assert 'B_1' == fileutils.file_name(new_name(join(test_dir, 'B'), registry=registry))
+
+
+class TestIsSelected(FileBasedTesting):
+
+    def test_is_selected_without_patterns_selects_everything(self):
+        assert is_selected('a/b/c.txt')
+        assert is_selected('')
+
+    def test_is_selected_with_include_patterns(self):
+        include = ('*/package.json', 'META-INF/**', '*.spec')
+        assert is_selected('package/package.json', include=include)
+        assert is_selected('a/b/package.json', include=include)
+        assert is_selected('./META-INF/MANIFEST.MF', include=include)
+        assert is_selected('/foo/bar.spec', include=include)
+        assert is_selected('bar.spec', include=include)
+        assert not is_selected('package.json', include=include)
+        assert not is_selected('src/META-INF/MANIFEST.MF', include=include)
+        assert not is_selected('bar.SPEC', include=include)
+
+    def test_is_selected_with_exclude_patterns(self):
+        assert not is_selected('a/b/c.txt', exclude=('*.txt',))
+        assert is_selected('a/b/c.txt', exclude=('b/*',))
+        assert not is_selected('a/b/c.txt', include=('a/*',), exclude=('*/b/*',))
@@ -48,3 +48,28 @@ class TestExtractApi(BaseArchiveTestCase):
         ]
         assert expected_event == result
         check_files(target, expected)
+
+    def test_list_archive(self):
+        test_file = self.get_test_loc('api/doc.docx')
+        result = sorted(e.path for e in api.list_archive(test_file) if e.is_file)
+        expected = ['c/a/a.txt', 'c/b/a.txt', 'c/c/a.txt']
+        assert expected == result
+        assert not os.path.exists(extractcode.get_extraction_path(test_file))
+
+    def test_open_member(self):
+        test_file = self.get_test_loc('api/doc.docx')
+        with api.open_member(test_file, 'c/b/a.txt') as member:
+            assert member.read().startswith(b'bbbb')
+        assert not os.path.exists(extractcode.get_extraction_path(test_file))
+
+    def test_extract_archives_async(self):
+        import asyncio
+
+        async def collect(location):
+            return [e async for e in api.extract_archives_async(location, all_formats=True)]
+
+        test_dir = self.get_test_loc('api/doc.docx', copy=True)
+        result = asyncio.run(collect(test_dir))
+        assert [False, True] == [e.done for e in result]
+        assert not result[1].errors
+        check_files(extractcode.get_extraction_path(test_dir), ['c/a/a.txt', 'c/b/a.txt', 'c/c/a.txt'])
@@ -286,3 +286,42 @@ def test_extractcode_command_can_extract_nuget():
         print(result.stdout)
     assert 'ERROR extracting' not in result.stdout
     assert 'ERROR extracting' not in result.stderr
+
+
+def test_extractcode_command_can_list_without_extracting():
+    test_dir = test_env.get_test_loc('cli/extract', copy=True)
+    result = run_extract(['--list', test_dir], expected_rc=1)
+
+    assert not os.path.exists(os.path.join(test_dir, 'some.tar.gz-extract'))
+    assert 'tarred_gzipped.tgz:' in result.stdout
+    assert '           2 e/a/b.txt' in result.stdout
+    assert 'ERROR listing: broken.tar.gz: Unrecognized archive format' in result.stderr
+
+
+def test_extractcode_command_can_resume_with_a_journal():
+    test_dir = test_env.get_test_loc('cli/extract', copy=True)
+    journal = test_env.get_temp_file('journal')
+    run_extract(['--resume', '--journal', journal, test_dir], expected_rc=1)
+    assert os.path.exists(os.path.join(test_dir, 'some.tar.gz-extract'))
+    with open(journal) as inp:
+        journaled = inp.read()
+    assert 'some.tar.gz-extract' in journaled
+    assert 'broken.tar.gz-extract' not in journaled
+
+    result = run_extract(['--resume', '--journal', journal, test_dir], expected_rc=1)
+    assert 'ERROR extracting' in result.stderr
+    assert 'broken.tar.gz' in result.stderr
+    with open(journal) as inp:
+        assert journaled == inp.read()
+
+
+def test_extractcode_command_reports_extraction_cache_hits():
+    cache_dir = test_env.get_temp_dir()
+    test_dir = test_env.get_test_loc('cli/extract', copy=True)
+    result = run_extract(['--cache-dir', cache_dir, test_dir], expected_rc=1)
+    assert 'Extraction cache: 0 hits, 3 misses.' in result.stderr
+
+    test_dir = test_env.get_test_loc('cli/extract', copy=True)
+    result = run_extract(['--cache-dir', cache_dir, test_dir], expected_rc=1)
+    # the broken archive is never cached
+    assert 'Extraction cache: 2 hits, 1 misses.' in result.stderr
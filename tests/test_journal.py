@@ -0,0 +1,150 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/nexB/extractcode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+
+from commoncode import fileutils
+
+from extractcode_assert_utils import check_files
+from extractcode_assert_utils import check_no_error
+from extractcode_assert_utils import BaseArchiveTestCase
+
+from extractcode import extract
+from extractcode import journal
+
+
+class TestExtractionJournal(BaseArchiveTestCase):
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def test_journal_get_and_put(self):
+        test_dir = self.get_temp_dir()
+        journal_loc = os.path.join(test_dir, 'journal')
+        source = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        target = source + '-extract'
+
+        test_journal = journal.Journal(journal_loc)
+        assert test_journal.get(source, target) is None
+        test_journal.put(source, target, warnings=['some warning'])
+        # the target does not exist yet
+        assert test_journal.get(source, target) is None
+        os.mkdir(target)
+        assert ['some warning'] == test_journal.get(source, target)
+
+        # a journal is loaded from its file and a truncated line is ignored
+        with open(journal_loc, 'a') as out:
+            out.write('{"source": "')
+        assert ['some warning'] == journal.Journal(journal_loc).get(source, target)
+
+        # a modified source is stale
+        os.utime(source, ns=(1, 1))
+        assert journal.Journal(journal_loc).get(source, target) is None
+
+    def test_extract_with_journal_skips_journaled_archives(self):
+        test_dir = self.get_test_loc('extract/nested', copy=True)
+        journal_loc = journal.get_journal_location(test_dir)
+        expected = list(extract.extract(test_dir, recurse=True, journal=journal_loc))
+        check_no_error(expected)
+        expected_done = sorted(e.source for e in expected if e.done)
+
+        result = list(extract.extract(test_dir, recurse=True, journal=journal_loc))
+        assert all(e.done for e in result)
+        assert expected_done == sorted(e.source for e in result)
+
+    def test_extract_with_journal_extracts_again_incomplete_targets(self):
+        test_dir = self.get_temp_dir()
+        source = self.get_test_loc('extract/basic_non_nested.tar.gz', copy=True)
+        target = source + '-extract'
+        journal_loc = os.path.join(test_dir, 'journal')
+
+        # a partial target and a staging directory left by a killed process
+        os.makedirs(os.path.join(target, 'a', 'b'))
+        with open(os.path.join(target, 'a', 'b', 'a.txt'), 'w') as out:
+            out.write('partial')
+        staging = extract.get_staging_dir(target)
+
+        result = list(extract.extract(source, journal=journal_loc))
+        check_no_error(result)
+        assert 2 == len(result)
+        assert not os.path.exists(staging)
+        check_files(target, ['a/b/a.txt', 'a/b/b.txt', 'a/c/c.txt'])
+        with open(os.path.join(target, 'a', 'b', 'a.txt')) as inp:
+            assert 'partial' != inp.read()
+
+        result = list(extract.extract(source, journal=journal_loc))
+        assert [(source, target, True)] == [(e.source, e.target, e.done) for e in result]
+
+    def test_extract_parallel_with_journal_skips_journaled_archives(self):
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        journal_loc = os.path.join(self.get_temp_dir(), 'journal')
+        expected = list(extract.extract(test_dir, recurse=True, journal=journal_loc))
+        check_no_error(expected)
+        expected_done = sorted(e.source for e in expected if e.done)
+
+        result = list(extract.extract(
+            test_dir, recurse=True, jobs=2, journal=journal_loc))
+        assert all(e.done for e in result)
+        assert expected_done == sorted(e.source for e in result)
+
+    def test_extract_incremental_only_extracts_new_or_modified_archives(self):
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        manifests = journal.ManifestJournal(journal.get_manifests_location(test_dir))
+        result = list(extract.extract(test_dir, incremental=True))
+        check_no_error(result)
+        all_archives = sorted(e.source for e in result if e.done)
+        assert 3 == len(all_archives)
+        for archive in all_archives:
+            assert os.path.exists(manifests.get_manifest_location(archive + '-extract'))
+        # no manifest is stored in the extracted tree
+        assert not any(
+            f.endswith('.json') for _, _, files in os.walk(test_dir) for f in files)
+
+        # unchanged archives are skipped, even with a new modification time
+        changed = os.path.join(test_dir, 'a', 'a.tar.gz')
+        os.utime(changed, ns=(1, 1))
+        result = list(extract.extract(test_dir, incremental=True))
+        assert all(e.done for e in result)
+        assert all_archives == sorted(e.source for e in result)
+
+        # a modified archive is extracted again and the stale files are removed
+        stale = os.path.join(changed + '-extract', 'stale.txt')
+        with open(stale, 'w') as out:
+            out.write('stale')
+        with open(os.path.join(test_dir, 'b', 'b.tar.gz'), 'rb') as inp:
+            with open(changed, 'wb') as out:
+                out.write(inp.read())
+        result = list(extract.extract(test_dir, incremental=True))
+        check_no_error(result)
+        assert [changed] == [e.source for e in result if not e.done]
+        assert not os.path.exists(stale)
+
+        # the targets of deleted archives are removed
+        os.remove(changed)
+        result = list(extract.extract(test_dir, incremental=True))
+        check_no_error(result)
+        assert not os.path.exists(changed + '-extract')
+        assert not os.path.exists(manifests.get_manifest_location(changed + '-extract'))
+
+    def test_extract_incremental_deletes_the_manifests_of_removed_targets(self):
+        test_dir = self.get_test_loc('extract/tree', copy=True)
+        manifests_dir = journal.get_manifests_location(test_dir)
+        result = list(extract.extract(test_dir, incremental=True))
+        check_no_error(result)
+        assert 3 == len(os.listdir(manifests_dir))
+
+        # a target removed by hand
+        removed = os.path.join(test_dir, 'a', 'a.tar.gz-extract')
+        fileutils.delete(removed)
+        os.remove(os.path.join(test_dir, 'a', 'a.tar.gz'))
+        list(extract.extract(test_dir, incremental=True))
+        assert 2 == len(os.listdir(manifests_dir))
+
+        # targets replacing their archives
+        result = list(extract.extract(test_dir, incremental=True, replace_originals=True))
+        check_no_error(result)
+        assert [] == os.listdir(manifests_dir)
@@ -46,3 +46,90 @@ class TestExtractorTest(BaseArchiveTestCase):
         assert [] == result
         expected = ['c/a/a.txt', 'c/b/a.txt', 'c/c/a.txt']
         check_files(test_tgt_dir, expected)
+
+    def test_libarchive_extract_fd_can_extract_from_an_opened_file(self):
+        from extractcode.libarchive2 import extract_fd
+
+        test_file = self.get_test_loc('archive/relative_path/basic.zip')
+        test_dir = self.get_temp_dir()
+        with open(test_file, 'rb') as archive:
+            result = extract_fd(archive.fileno(), test_dir)
+        assert [] == result
+        expected = ['c/a/a.txt', 'c/b/a.txt', 'c/c/a.txt']
+        check_files(test_dir, expected)
+
+    def test_libarchive_extract_can_extract_sparse_files(self):
+        from extractcode.libarchive2 import extract
+
+        test_file = self.get_test_loc('archive/tar/sparse.tar')
+        test_dir = self.get_temp_dir()
+        result = list(extract(test_file, test_dir))
+        assert [] == result
+        with open(os.path.join(test_dir, 'sparse.bin'), 'rb') as extracted:
+            content = extracted.read()
+        assert 5 * 1024 * 1024 == len(content)
+        assert b'middle' == content[1024 * 1024:1024 * 1024 + 6]
+        assert b'end' == content[3 * 1024 * 1024:3 * 1024 * 1024 + 3]
+        assert 9 == len(content.replace(b'\0', b''))
+
+    def test_libarchive_entry_get_content_fills_holes_in_sparse_files(self):
+        from extractcode.libarchive2 import Archive
+
+        test_file = self.get_test_loc('archive/tar/sparse.tar')
+        with Archive(test_file) as archive:
+            entry = next(iter(archive))
+            content = b''.join(entry.get_content())
+        assert 5 * 1024 * 1024 == len(content)
+        assert 3 * 1024 * 1024 + 3 == len(content.rstrip(b'\0'))
+        assert b'middle' == content[1024 * 1024:1024 * 1024 + 6]
+
+    def test_libarchive_list_entries_can_skip_data(self):
+        from extractcode.libarchive2 import list_entries
+
+        test_file = self.get_test_loc('archive/tar/sparse.tar')
+        entries = list(list_entries(test_file, skip_data=True))
+        assert ['sparse.bin'] == [e.path for e in entries]
+        assert 5 * 1024 * 1024 == entries[0].size
+
+    def test_libarchive_extract_with_include_and_exclude_patterns(self):
+        from extractcode.libarchive2 import extract
+
+        test_file = self.get_test_loc('archive/relative_path/basic.zip')
+        test_dir = self.get_temp_dir()
+        result = extract(test_file, test_dir, include=('*/a.txt',), exclude=('c/b/*',))
+        assert [] == result
+        check_files(test_dir, ['c/a/a.txt', 'c/c/a.txt'])
+
+    def test_libarchive_extract_can_extract_from_a_memory_map(self):
+        from extractcode.libarchive2 import extract
+
+        test_file = self.get_test_loc('archive/relative_path/basic.zip')
+        test_dir = self.get_temp_dir()
+        result = extract(test_file, test_dir, use_mmap=True)
+        assert [] == result
+        expected = ['c/a/a.txt', 'c/b/a.txt', 'c/c/a.txt']
+        check_files(test_dir, expected)
+
+    def test_libarchive_archive_with_mmap_seeks_in_7z_and_releases_the_map(self):
+        from extractcode.libarchive2 import Archive
+
+        test_file = self.get_test_loc('archive/7z/z.7z')
+        with Archive(test_file) as archive:
+            expected = [(e.path, b''.join(e.get_content())) for e in archive]
+
+        archive = Archive(test_file, use_mmap=True)
+        with archive:
+            assert archive.mapped
+            result = [(e.path, b''.join(e.get_content())) for e in archive]
+        assert expected == result
+        assert archive.mapped is None
+
+    def test_libarchive_archive_with_mmap_falls_back_to_path_for_empty_files(self):
+        from extractcode.libarchive2 import Archive
+
+        test_file = os.path.join(self.get_temp_dir(), 'empty.zip')
+        with open(test_file, 'wb'):
+            pass
+        with Archive(test_file, use_mmap=True) as archive:
+            assert archive.mapped is None
+            assert [] == list(archive)
@@ -172,6 +172,14 @@ class TestSevenZipListEntries(TestSevenZip):
         self.check_results_with_expected_json(results, expected_loc, clean_dates=True, regen=False)
 
 
+    def test_list_entries_of_a_non_archive_returns_errors(self):
+        test_loc = self.get_test_loc('sevenzip/listings/cpio_relative.cpio.linux')
+        entries, errors = sevenzip.list_entries(test_loc)
+        assert [] == entries
+        assert 1 == len(errors)
+        assert 'Can not open the file as archive' in errors[0]
+
+
 class TestSevenParseListing(TestSevenZip):
 
     def check_parse_7z_listing(self, test_loc, regen=False):
@@ -229,6 +237,20 @@ class TestSevenParseListing(TestSevenZip):
     def test_parse_7z_listing_tbz_from_linux(self):
         self.check_parse_7z_listing('sevenzip/listings/tarred_bzipped.tar.bz2.listing', regen=False)
 
+    def test_iter_7z_listing_yields_entries_one_block_at_a_time(self):
+        test_loc = self.get_test_loc('sevenzip/listings/weird_names.7z_7zip_linux_listing.data')
+        expected = [e.to_dict(full=True) for e in sevenzip.parse_7z_listing(test_loc)]
+
+        def lines():
+            with open(test_loc, encoding='utf-8') as listing:
+                for line in listing:
+                    yield line
+
+        entries = sevenzip.iter_7z_listing(lines())
+        first = next(entries)
+        assert expected[0] == first.to_dict(full=True)
+        assert expected[1:] == [e.to_dict(full=True) for e in entries]
+
     def test_parse_7z_listing_txz_from_linux(self):
         self.check_parse_7z_listing('sevenzip/listings/texlive-core-patches-20.tar.xz.listing', regen=False)
 
@@ -293,3 +315,38 @@ class TestSevenZipFileByFile(TestSevenZip):
 
     def test_extract_file_by_file_weird_names_tar(self):
         self.check_extract_file_by_file('sevenzip/weird_names.tar', regen=False)
+
+    def test_get_batches_splits_entries_with_the_same_path_ignoring_case(self):
+        Entry = sevenzip.Entry
+        entries = [
+            Entry(path='a/b'),
+            Entry(path='a/B'),
+            Entry(path='a', is_file=False, is_dir=True),
+            Entry(path='A/b'),
+            Entry(path='a/c'),
+            Entry(path='../d'),
+            Entry(path='a/e\nf'),
+        ]
+        batches, singles = sevenzip.get_batches(entries)
+        batches = [[e.path for _, e in batch] for batch in batches]
+        expected = [
+            ['a/b', 'a/c'],
+            ['a/B'],
+            ['A/b'],
+        ]
+        assert expected == batches
+        assert [5, 6] == [i for i, _ in singles]
+
+    def test_extract_with_include_and_exclude_patterns(self):
+        test_loc = self.get_test_loc('sevenzip/special.tar')
+        target_dir = self.get_temp_dir()
+        sevenzip.extract(
+            test_loc,
+            target_dir,
+            include=('0-REGTYPE*',),
+            exclude=('*-TEXT',),
+        )
+        results = self.collect_extracted_path(target_dir)
+        assert 2 == len(results)
+        assert '/0-REGTYPE' == results[0]
+        assert results[1].startswith('/0-REGTYPE-VEEEERY_LONG_NAME')